@@ -0,0 +1,364 @@
+# <pep8 compliant>
+
+'''
+NumPy bulk decoding for the vertex & face sections of xmodel_bin files
+
+Instead of creating a Vertex / Face / FaceVertex object for every block,
+the block stream is scanned once to record the offset of each block, and
+the block contents are then gathered into contiguous structured arrays
+'''
+
+import struct
+from array import array
+
+import numpy as np
+
+# One record per vertex - the weights for a vertex are stored in
+#  weight_array[first_weight:first_weight + weight_count]
+VERTEX_DTYPE = np.dtype([
+    ('offset', '<f4', (3,)),
+    ('first_weight', '<u4'),
+    ('weight_count', '<u2'),
+])
+
+WEIGHT_DTYPE = np.dtype([
+    ('bone', '<i2'),
+    ('influence', '<f4'),
+])
+
+# One record per face. Normals & colors are kept in the packed form used by
+#  the file (shorts scaled by 32767 & bytes scaled by 255), so that no
+#  precision is lost when they're converted back to floats
+FACE_DTYPE = np.dtype([
+    ('mesh_id', '<u2'),
+    ('material_id', '<u2'),
+    ('vertex', '<u4', (3,)),
+    ('normal', '<i2', (3, 3)),
+    ('color', '<u1', (3, 4)),
+    ('uv', '<f4', (3, 2)),
+])
+
+# Total block size (including the hash) for each of the fixed size blocks
+#  that can appear in the vertex & face sections
+__block_sizes__ = {
+    0x8F03: 4,   # Vert info block marker
+    0xB097: 8,   # Vert32 info block marker
+    0x9383: 16,  # Vert offset block
+    0xEA46: 4,   # Vert weighted bones count
+    0xF1AB: 8,   # Vert bone weight info
+    0xBE92: 8,   # Number of faces block
+    0x562F: 4,   # Triangle info block
+    0x6711: 8,   # Triangle info (16) block
+    0x89EC: 8,   # Normal info
+    0x6DD8: 8,   # Color info
+}
+
+__UV_HASH__ = 0x1AD4
+
+__unpack_uint16__ = struct.Struct('<H').unpack_from
+
+
+def scan_blocks(view, pos, end=None):
+    '''
+    Walk the vertex & face blocks starting at pos, stopping at the first
+    block that isn't part of either section
+    Returns a tuple of (hashes, offsets, end) where hashes & offsets are
+    arrays with one entry per block, and end is the position of the first
+    block that wasn't scanned
+    '''
+    if end is None:
+        end = len(view)
+
+    hashes = array('H')
+    offsets = array('Q')
+    add_hash = hashes.append
+    add_offset = offsets.append
+    block_size = __block_sizes__.get
+    unpack = __unpack_uint16__
+
+    while pos + 2 <= end:
+        block_hash = unpack(view, pos)[0]
+        size = block_size(block_hash)
+        if size is None:
+            if block_hash != __UV_HASH__:
+                break
+            # Hash, layer count, and 2 floats per layer
+            size = 4 + 8 * unpack(view, pos + 2)[0]
+        add_hash(block_hash)
+        add_offset(pos)
+        pos += size
+
+    return hashes, offsets, pos
+
+
+def __gather__(data, offsets, dtype, count=1):
+    '''
+    Gather 'count' values of dtype from each of the given byte offsets
+    Returns an array with the shape (len(offsets), count)
+    '''
+    dtype = np.dtype(dtype)
+    index = offsets[:, None] + np.arange(dtype.itemsize * count)
+    return data[index].view(dtype).reshape(len(offsets), count)
+
+
+def __owners__(positions, owner_positions):
+    '''
+    Returns the index of the owner block (the closest preceding one) for
+    each of the given block positions
+    '''
+    return np.searchsorted(owner_positions, positions, side='right') - 1
+
+
+def __vertex_indices__(data, hashes, offsets):
+    '''
+    Read the vertex index from each of the given VERT / VERT32 blocks
+    '''
+    short = hashes == 0x8F03
+    indices = np.empty(len(offsets), np.int64)
+    indices[short] = __gather__(data, offsets[short] + 2, '<u2')[:, 0]
+    indices[~short] = __gather__(data, offsets[~short] + 4, '<u4')[:, 0]
+    return indices
+
+
+def __check_owners__(name, owner_name, offsets, owner_offsets, count=1):
+    '''
+    Make sure that every owner block is followed by exactly 'count' blocks
+    of the given type
+    '''
+    owners = __owners__(offsets, owner_offsets)
+    expected = np.repeat(np.arange(len(owner_offsets)), count)
+    if len(owners) != len(expected) or np.any(owners != expected):
+        raise ValueError("Expected %d %s block(s) per %s" %
+                         (count, name, owner_name))
+
+
+def load_geometry(buffer, pos, vert_count):
+    '''
+    Decode the vertex & face sections of an xmodel_bin
+    buffer is the decompressed file data, and pos is the position of the
+    first block after the vertex count block
+    Returns a tuple of (vertex_array, weight_array, face_array, end) where
+    end is the position of the first block after the face section
+    '''
+    view = memoryview(buffer)
+    try:
+        hashes, offsets, end = scan_blocks(view, pos)
+    finally:
+        view.release()
+
+    data = np.frombuffer(buffer, np.uint8)
+    hashes = np.frombuffer(hashes, '<u2')
+    offsets = np.frombuffer(offsets, np.uint64).astype(np.int64)
+
+    is_vert = (hashes == 0x8F03) | (hashes == 0xB097)
+    is_tri = (hashes == 0x562F) | (hashes == 0x6711)
+    face_section = np.flatnonzero(is_tri | (hashes == 0xBE92))
+    face_start = face_section[0] if len(face_section) else len(hashes)
+    in_faces = np.arange(len(hashes)) >= face_start
+
+    # Vertices
+    vert_mask = is_vert & ~in_faces
+    vert_offsets = offsets[vert_mask]
+    vert_ids = __vertex_indices__(data, hashes[vert_mask], vert_offsets)
+    if len(vert_ids) and (vert_ids.min() < 0 or vert_ids.max() >= vert_count):
+        raise ValueError("Vertex index out of range [0, %d)" % vert_count)
+
+    vertex_array = np.zeros(vert_count, VERTEX_DTYPE)
+
+    pos_offsets = offsets[(hashes == 0x9383) & ~in_faces]
+    owners = vert_ids[__owners__(pos_offsets, vert_offsets)]
+    vertex_array['offset'][owners] = __gather__(data, pos_offsets + 4,
+                                                '<f4', 3)
+
+    weight_offsets = offsets[(hashes == 0xF1AB) & ~in_faces]
+    owners = vert_ids[__owners__(weight_offsets, vert_offsets)]
+    order = np.argsort(owners, kind='stable')
+    weight_offsets = weight_offsets[order]
+    weight_array = np.empty(len(weight_offsets), WEIGHT_DTYPE)
+    weight_array['bone'] = __gather__(data, weight_offsets + 2, '<i2')[:, 0]
+    weight_array['influence'] = __gather__(data, weight_offsets + 4,
+                                           '<f4')[:, 0]
+
+    counts = np.bincount(owners, minlength=vert_count)
+    vertex_array['weight_count'] = counts
+    vertex_array['first_weight'] = np.cumsum(counts) - counts
+
+    # Faces
+    tri_mask = is_tri & in_faces
+    tri_hashes = hashes[tri_mask]
+    tri_offsets = offsets[tri_mask]
+    face_array = np.zeros(len(tri_offsets), FACE_DTYPE)
+
+    short = tri_hashes == 0x562F
+    info = __gather__(data, tri_offsets[short] + 2, '<u1', 2)
+    face_array['mesh_id'][short] = info[:, 0]
+    face_array['material_id'][short] = info[:, 1]
+    info = __gather__(data, tri_offsets[~short] + 4, '<u2', 2)
+    face_array['mesh_id'][~short] = info[:, 0]
+    face_array['material_id'][~short] = info[:, 1]
+
+    fv_mask = is_vert & in_faces
+    fv_offsets = offsets[fv_mask]
+    __check_owners__('vertex', 'face', fv_offsets, tri_offsets, 3)
+    face_count = len(tri_offsets)
+
+    fv_ids = __vertex_indices__(data, hashes[fv_mask], fv_offsets)
+    face_array['vertex'] = fv_ids.reshape(face_count, 3)
+
+    normal_offsets = offsets[hashes == 0x89EC]
+    __check_owners__('normal', 'face vertex', normal_offsets, fv_offsets)
+    face_array['normal'] = __gather__(data, normal_offsets + 2,
+                                      '<i2', 3).reshape(face_count, 3, 3)
+
+    color_offsets = offsets[(hashes == 0x6DD8) & in_faces]
+    __check_owners__('color', 'face vertex', color_offsets, fv_offsets)
+    face_array['color'] = __gather__(data, color_offsets + 4,
+                                     '<u1', 4).reshape(face_count, 3, 4)
+
+    # Only the first UV layer is used (same as XBlock.LoadUVBlock)
+    uv_offsets = offsets[hashes == __UV_HASH__]
+    __check_owners__('UV', 'face vertex', uv_offsets, fv_offsets)
+    face_array['uv'] = __gather__(data, uv_offsets + 4,
+                                  '<f4', 2).reshape(face_count, 3, 2)
+
+    return vertex_array, weight_array, face_array, end
+
+
+def __scatter__(out, starts, rows, lengths=None):
+    '''
+    Copy each row of bytes into out at the matching start position
+    If lengths is given, only the first lengths[i] bytes of row i are used
+    '''
+    index = starts[:, None] + np.arange(rows.shape[1])
+    if lengths is None:
+        out[index] = rows
+    else:
+        valid = np.arange(rows.shape[1]) < lengths[:, None]
+        out[index[valid]] = rows[valid]
+
+
+def __vertex_index_dtype__(use32):
+    if use32:
+        return [('hash', '<u2'), ('pad', '<u2'), ('index', '<u4')], 0xB097
+    return [('hash', '<u2'), ('index', '<u2')], 0x8F03
+
+
+def __as_short__(values):
+    '''
+    Vectorized xbin.__clamp_float_to_short__
+    '''
+    return np.clip(np.trunc(values * 32767), -32768, 32767).astype('<i2')
+
+
+def pack_vertex_blocks(mesh, vert_offset, use32):
+    '''
+    Pack the vertex blocks for an ArrayMesh
+    Produces the same bytes as writing every vertex with the XBlock.Write*
+    functions (vertex index, offset, weight count & weight blocks)
+    '''
+    index_fields, index_hash = __vertex_index_dtype__(use32)
+    header_dtype = np.dtype(index_fields + [
+        ('offset_hash', '<u2'), ('offset_pad', '<u2'), ('offset', '<f4', 3),
+        ('count_hash', '<u2'), ('count', '<i2'),
+    ])
+    weight_dtype = np.dtype([
+        ('hash', '<u2'), ('bone', '<i2'), ('influence', '<f4'),
+    ])
+
+    vert_count = mesh.vert_count
+    counts = np.diff(mesh.weight_offsets)
+
+    header = np.zeros(vert_count, header_dtype)
+    header['hash'] = index_hash
+    header['index'] = np.arange(vert_offset, vert_offset + vert_count)
+    header['offset_hash'] = 0x9383
+    header['offset'] = mesh.positions
+    header['count_hash'] = 0xEA46
+    header['count'] = counts
+
+    weights = np.zeros(len(mesh.weight_bones), weight_dtype)
+    weights['hash'] = 0xF1AB
+    weights['bone'] = mesh.weight_bones
+    weights['influence'] = mesh.weight_influences
+
+    sizes = header_dtype.itemsize + weight_dtype.itemsize * counts
+    starts = np.cumsum(sizes) - sizes
+    out = np.zeros(int(sizes.sum()), np.uint8)
+
+    __scatter__(out, starts,
+                header.view(np.uint8).reshape(vert_count, -1))
+
+    owners = mesh.weight_owners()
+    weight_starts = (starts[owners] + header_dtype.itemsize +
+                     weight_dtype.itemsize *
+                     (np.arange(len(owners)) - mesh.weight_offsets[owners]))
+    __scatter__(out, weight_starts,
+                weights.view(np.uint8).reshape(len(weights), -1))
+
+    return out.tobytes()
+
+
+def pack_face_blocks(mesh, vert_offset, use32):
+    '''
+    Pack the face blocks for an ArrayMesh
+    Produces the same bytes as writing every face with the XBlock.Write*
+    functions (face info block, then the vertex index, normal, color & uv
+    blocks for each of the 3 face vertices)
+    '''
+    index_fields, index_hash = __vertex_index_dtype__(use32)
+    face_vert_dtype = np.dtype(index_fields + [
+        ('normal_hash', '<u2'), ('normal', '<i2', 3),
+        ('color_hash', '<u2'), ('color_pad', '<u2'), ('color', '<u1', 4),
+        ('uv_hash', '<u2'), ('uv_layers', '<i2'), ('uv', '<f4', 2),
+    ])
+    info_dtype = np.dtype([
+        ('hash', '<u2'), ('mesh_id', '<u1'), ('material_id', '<u1'),
+    ])
+    info16_dtype = np.dtype([
+        ('hash', '<u2'), ('pad', '<u2'),
+        ('mesh_id', '<u2'), ('material_id', '<u2'),
+    ])
+
+    face_count = mesh.face_count
+    mesh_ids = mesh.face_mesh_ids
+    material_ids = mesh.face_material_ids
+
+    face_verts = np.zeros((face_count, 3), face_vert_dtype)
+    face_verts['hash'] = index_hash
+    face_verts['index'] = mesh.face_vertices + vert_offset
+    face_verts['normal_hash'] = 0x89EC
+    face_verts['normal'] = __as_short__(mesh.normals)
+    face_verts['color_hash'] = 0x6DD8
+    face_verts['color'] = np.clip(np.trunc(mesh.colors * 255), 0, 255)
+    face_verts['uv_hash'] = 0x1AD4
+    face_verts['uv_layers'] = 1
+    face_verts['uv'] = mesh.uvs
+
+    # Faces that reference a mesh or material past 255 use the 16 bit block
+    wide = (mesh_ids > 255) | (material_ids > 255)
+
+    info = np.zeros(face_count, info_dtype)
+    info['hash'] = 0x562F
+    info['mesh_id'] = np.where(wide, 0, mesh_ids)
+    info['material_id'] = np.where(wide, 0, material_ids)
+
+    info16 = np.zeros(face_count, info16_dtype)
+    info16['hash'] = 0x6711
+    info16['mesh_id'] = mesh_ids
+    info16['material_id'] = material_ids
+
+    info_bytes = np.zeros((face_count, info16_dtype.itemsize), np.uint8)
+    info_bytes[:, :info_dtype.itemsize] = info.view(np.uint8).reshape(
+        face_count, -1)
+    info_bytes[wide] = info16.view(np.uint8).reshape(face_count, -1)[wide]
+    info_sizes = np.where(wide, info16_dtype.itemsize, info_dtype.itemsize)
+
+    sizes = info_sizes + 3 * face_vert_dtype.itemsize
+    starts = np.cumsum(sizes) - sizes
+    out = np.zeros(int(sizes.sum()), np.uint8)
+
+    __scatter__(out, starts, info_bytes, info_sizes)
+    __scatter__(out, starts + info_sizes,
+                face_verts.view(np.uint8).reshape(face_count, -1))
+
+    return out.tobytes()
@@ -1,137 +1,683 @@
-try:
-    # Try to import the python-lz4 package
-    import lz4.block
+import struct
+from array import array
+from io import BytesIO
 
+try:
+    from six import byte2int
+    from six.moves import xrange
 except ImportError:
-    # If python-lz4 isn't present, fallback to using pure python
-    from io import BytesIO
+    xrange = range
+
+    # If we're running Python 3 or newer, we must
+    #  define byte2int differently than with Python 2
+    import sys
+    if sys.version_info[0] >= 3:
+        import operator
+        byte2int = operator.itemgetter(0)
+    else:
+        def byte2int(_bytes):
+            return ord(_bytes[0])
+
+
+class CorruptError(Exception):
+    pass
+
+
+# LZ4 block format limits
+#  See: https://github.com/lz4/lz4/blob/dev/doc/lz4_Block_format.md
+MIN_MATCH = 4
+LAST_LITERALS = 5  # The last 5 bytes of a block are always literals
+MF_LIMIT = 12  # The last match must start at least 12 bytes before the end
+MAX_DISTANCE = 0xFFFF
+SKIP_STRENGTH = 6  # Speed up the search when there are no matches around
+
+# Compression levels go from 1 (fastest) to 12 (best ratio)
+#  Level 1 is a greedy single-probe match finder, each level above that
+#  doubles the number of hash chain entries that are probed for a match
+MIN_LEVEL = 1
+MAX_LEVEL = 12
+DEFAULT_LEVEL = 1
+
+# Number of bytes BlockReader reads & decodes ahead at a time
+DEFAULT_CHUNK_SIZE = 0x10000
+
+
+def uncompress_bytewise(src, offset=4):
+    """uncompress a block of lz4 data.
+
+    This is the original pure Python decoder, which reads the input one byte
+    at a time and copies matches one byte at a time. It's kept around as a
+    reference implementation for testing & benchmarking uncompress_fast().
+
+    :param bytes src: lz4 compressed data (LZ4 Blocks)
+    :param int offset: offset that the uncompressed data starts at
+                       (Used to implicitly read the uncompressed data size)
+    :returns: uncompressed data
+    :rtype: bytearray
+
+    .. seealso:: http://cyan4973.github.io/lz4/lz4_Block_format.html
+    """
+    src = BytesIO(src)
+    if offset > 0:
+        src.read(offset)
+
+    dst = bytearray()
+    min_match_len = 4
+
+    def get_length(src, length):
+        """get the length of a lz4 variable length integer."""
+        if length != 0x0f:
+            return length
 
-    try:
-        from six import byte2int
-        from six.moves import xrange
-    except ImportError:
-        xrange = range
-
-        # If we're running Python 3 or newer, we must
-        #  define byte2int differently than with Python 2
-        import sys
-        if sys.version_info[0] >= 3:
-            import operator
-            byte2int = operator.itemgetter(0)
-        else:
-            def byte2int(_bytes):
-                return ord(_bytes[0])
+        while True:
+            read_buf = src.read(1)
+            if len(read_buf) != 1:
+                raise CorruptError("EOF at length read")
+            len_part = byte2int(read_buf)
 
-    class CorruptError(Exception):
-        pass
+            length += len_part
 
-    __support_mode__ = 'pure Python'
+            if len_part != 0xff:
+                break
 
-    def uncompress(src, offset=4):
-        """uncompress a block of lz4 data.
+        return length
 
-        :param bytes src: lz4 compressed data (LZ4 Blocks)
-        :param int offset: offset that the uncompressed data starts at
-                           (Used to implicitly read the uncompressed data size)
-        :returns: uncompressed data
-        :rtype: bytearray
+    while True:
+        # decode a block
+        read_buf = src.read(1)
+        if not read_buf:
+            raise CorruptError("EOF at reading literal-len")
+        token = byte2int(read_buf)
 
-        .. seealso:: http://cyan4973.github.io/lz4/lz4_Block_format.html
-        """
-        src = BytesIO(src)
-        if offset > 0:
-            src.read(offset)
-
-        # if we have the original size, we could pre-allocate the buffer with
-        # bytearray(original_size), but then we would have to use indexing
-        # instad of .append() and .extend()
-        dst = bytearray()
-        min_match_len = 4
-
-        def get_length(src, length):
-            """get the length of a lz4 variable length integer."""
-            if length != 0x0f:
-                return length
-
-            while True:
-                read_buf = src.read(1)
-                if len(read_buf) != 1:
-                    raise CorruptError("EOF at length read")
-                len_part = byte2int(read_buf)
-
-                length += len_part
-
-                if len_part != 0xff:
-                    break
+        literal_len = get_length(src, (token >> 4) & 0x0f)
 
-            return length
+        # copy the literal to the output buffer
+        read_buf = src.read(literal_len)
 
-        while True:
-            # decode a block
-            read_buf = src.read(1)
-            if not read_buf:
-                raise CorruptError("EOF at reading literal-len")
-            token = byte2int(read_buf)
+        if len(read_buf) != literal_len:
+            raise CorruptError("not literal data")
+        dst.extend(read_buf)
+
+        read_buf = src.read(2)
+        if not read_buf:
+            if token & 0x0f != 0:
+                raise CorruptError(
+                    "EOF, but match-len > 0: %u" % (token % 0x0f, ))
+            break
+
+        if len(read_buf) != 2:
+            raise CorruptError("premature EOF")
+
+        offset = byte2int([read_buf[0]]) | (byte2int([read_buf[1]]) << 8)
+
+        if offset == 0:
+            raise CorruptError("offset can't be 0")
+
+        match_len = get_length(src, (token >> 0) & 0x0f)
+        match_len += min_match_len
+
+        # append the sliding window of the previous literals
+        for _ in xrange(match_len):
+            dst.append(dst[-offset])
+
+    return dst
 
-            literal_len = get_length(src, (token >> 4) & 0x0f)
 
-            # copy the literal to the output buffer
-            read_buf = src.read(literal_len)
+def uncompress_fast(src, offset=4, uncompressed_size=None):
+    """uncompress a block of lz4 data.
 
-            if len(read_buf) != literal_len:
-                raise CorruptError("not literal data")
-            dst.extend(read_buf)
+    Indexes straight into a memoryview of the input instead of reading it
+    through a file object, writes into an output buffer that is allocated
+    once up front, and copies whole literal runs & non-overlapping matches
+    as slices.
 
-            read_buf = src.read(2)
-            if not read_buf:
+    :param bytes src: lz4 compressed data (LZ4 Blocks)
+    :param int offset: offset that the compressed data starts at. If it's
+                       4 or more, the 4 bytes before the offset are read as
+                       the uncompressed data size (as written by XBinIO)
+    :param int uncompressed_size: explicit uncompressed size, overrides
+                                  the size prefix
+    :returns: uncompressed data
+    :rtype: bytearray
+    """
+    src = memoryview(src)
+    src_len = len(src)
+
+    if uncompressed_size is None and offset >= 4:
+        uncompressed_size = struct.unpack_from('<I', src, offset - 4)[0]
+
+    if uncompressed_size is None:
+        # Without a known size we can't preallocate the output, so fall back
+        #  to the reference decoder instead
+        return uncompress_bytewise(src.tobytes(), offset)
+
+    dst = bytearray(uncompressed_size)
+    out = memoryview(dst)
+    ip = offset
+    op = 0
+
+    try:
+        while True:
+            token = src[ip]
+            ip += 1
+
+            # Literals
+            length = token >> 4
+            if length == 0x0f:
+                part = 0xff
+                while part == 0xff:
+                    part = src[ip]
+                    ip += 1
+                    length += part
+
+            if length:
+                end = ip + length
+                if end > src_len:
+                    raise CorruptError("not literal data")
+                out[op:op + length] = src[ip:end]
+                op += length
+                ip = end
+
+            # The last sequence only contains literals
+            if ip >= src_len:
                 if token & 0x0f != 0:
                     raise CorruptError(
-                        "EOF, but match-len > 0: %u" % (token % 0x0f, ))
+                        "EOF, but match-len > 0: %u" % (token & 0x0f, ))
                 break
 
-            if len(read_buf) != 2:
-                raise CorruptError("premature EOF")
+            match_offset = src[ip] | (src[ip + 1] << 8)
+            ip += 2
+            if match_offset == 0:
+                raise CorruptError("offset can't be 0")
+            if match_offset > op:
+                raise CorruptError("offset out of range: %u" % match_offset)
+
+            # Matches
+            length = token & 0x0f
+            if length == 0x0f:
+                part = 0xff
+                while part == 0xff:
+                    part = src[ip]
+                    ip += 1
+                    length += part
+            length += MIN_MATCH
+
+            start = op - match_offset
+            if length <= match_offset:
+                out[op:op + length] = out[start:start + length]
+            else:
+                # The match overlaps the bytes it produces, which means it's
+                #  really just the last match_offset bytes on repeat
+                pattern = dst[start:op]
+                count, remainder = divmod(length, match_offset)
+                out[op:op + length] = pattern * count + pattern[:remainder]
+            op += length
+
+    except IndexError:
+        raise CorruptError("premature EOF")
+    except ValueError:
+        # Slice assignment past the end of the preallocated buffer
+        raise CorruptError("decompressed data exceeds %u bytes" %
+                           uncompressed_size)
+    finally:
+        out.release()
+
+    if op != uncompressed_size:
+        raise CorruptError("expected %u decompressed bytes, got %u" %
+                           (uncompressed_size, op))
+
+    return dst
+
+
+class BlockReader(object):
+    """read-only file-like object that decodes a lz4 block incrementally.
+
+    Compressed data is pulled from the source file chunk_size bytes at a
+    time, and only the decoded bytes that haven't been read yet (plus the
+    64 KB of history that lz4 matches can refer back to) are kept around,
+    so memory use stays bounded no matter how big the block is.
+
+    Seeking forwards is always possible (it decodes up to the new position),
+    seeking backwards only works within the retained history.
+    """
+    __slots__ = ('file', 'name', 'size', 'chunk_size', 'dump_file',
+                 '_src', '_ip', '_eof', '_done',
+                 '_buf', '_base', '_pos', '_dumped',
+                 '_token', '_literals')
+
+    def __init__(self, file, uncompressed_size=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, dump_file=None):
+        """
+        :param file: file object positioned at the start of the lz4 block
+        :param int uncompressed_size: expected size of the decoded data
+        :param int chunk_size: number of bytes to read / decode at a time
+        :param dump_file: optional file object that receives a copy of all
+                          of the decoded data as it's produced
+        """
+        self.file = file
+        self.name = getattr(file, 'name', None)
+        self.size = uncompressed_size
+        self.chunk_size = max(int(chunk_size), 1)
+        self.dump_file = dump_file
 
-            offset = byte2int([read_buf[0]]) | (byte2int([read_buf[1]]) << 8)
+        self._src = b''  # Unconsumed compressed data
+        self._ip = 0
+        self._eof = False  # No more compressed data in the source file
+        self._done = False  # The whole block has been decoded
 
-            if offset == 0:
-                raise CorruptError("offset can't be 0")
+        self._buf = bytearray()  # Decoded window
+        self._base = 0  # Position of _buf[0] in the decoded data
+        self._pos = 0  # Read position in the decoded data
+        self._dumped = 0
+
+        # State of a partially decoded sequence
+        self._token = None
+        self._literals = 0
 
-            match_len = get_length(src, (token >> 0) & 0x0f)
-            match_len += min_match_len
+    def __enter__(self):
+        return self
 
-            # append the sliding window of the previous literals
-            for _ in xrange(match_len):
-                dst.append(dst[-offset])
+    def __exit__(self, *args):
+        self.close()
 
-        return dst
+    def readable(self):
+        return True
 
-    def compress(data):
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            self.__decode__(None)
+            data = bytes(self._buf[self._pos - self._base:])
+        else:
+            start = self._pos - self._base
+            end = start + size
+            if end > len(self._buf) and not self._done:
+                self.__decode__(size)
+                start = self._pos - self._base
+                end = start + size
+            data = bytes(self._buf[start:end])
+
+        self._pos += len(data)
+        if self._pos - self._base >= self.chunk_size + MAX_DISTANCE:
+            self.__compact__()
+        return data
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._pos
+        elif whence == 2:
+            if self.size is None:
+                self.__decode__(None)
+                offset += self._base + len(self._buf)
+            else:
+                offset += self.size
+        elif whence != 0:
+            raise ValueError("invalid whence (%r)" % whence)
+
+        if offset < self._base:
+            raise ValueError("can't seek to %d, the decode window starts "
+                             "at %d" % (offset, self._base))
+
+        ahead = offset - (self._base + len(self._buf))
+        if ahead > 0:
+            self._pos = self._base + len(self._buf)
+            self.__decode__(ahead)
+            offset = min(offset, self._base + len(self._buf))
+
+        self._pos = offset
+        if self._pos - self._base >= self.chunk_size + MAX_DISTANCE:
+            self.__compact__()
+        return self._pos
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        if self.dump_file is not None:
+            self.dump_file.close()
+            self.dump_file = None
+        self._src = b''
+        self._buf = bytearray()
+
+    @property
+    def closed(self):
+        return self.file is None
+
+    def __compact__(self):
+        '''
+        Drop decoded bytes that have been read and are too old to be
+        referenced by a match
         '''
-        Accepts a byte array as input - returns a LZ4 compatible (uncompressed)
-         byte array
+        buf = self._buf
+        keep_from = min(self._pos, self._base + len(buf) - MAX_DISTANCE)
+        drop = keep_from - self._base
+        if drop >= self.chunk_size:
+            self.__dump__()
+            del buf[:drop]
+            self._base += drop
+
+    def __dump__(self):
+        if self.dump_file is None:
+            return
+        start = self._dumped - self._base
+        if start < len(self._buf):
+            self.dump_file.write(self._buf[start:])
+            self._dumped = self._base + len(self._buf)
+
+    def __need__(self, count):
         '''
-        length = len(data)
-        if length > 15:
-            result = [15 << 4 | 0]  # Add the token
+        Make sure that at least 'count' compressed bytes are available,
+        returns False if the source file runs out first
+        '''
+        while len(self._src) - self._ip < count:
+            if self._eof:
+                return False
+            chunk = self.file.read(self.chunk_size)
+            if not chunk:
+                self._eof = True
+                continue
+            self._src = self._src[self._ip:] + chunk
+            self._ip = 0
+        return True
+
+    def __refill__(self, what):
+        if not self.__need__(len(self._src) - self._ip + 1):
+            raise CorruptError("EOF at reading %s" % what)
+
+    def __decode__(self, want):
+        '''
+        Decode sequences until there are at least 'want' unread bytes
+        (decoding at least chunk_size bytes ahead to keep the number of
+        calls down). If want is None, the rest of the block is decoded.
+        '''
+        buf = self._buf
+        if want is not None:
+            target = self._pos - self._base + max(want, self.chunk_size)
+
+        while not self._done and (want is None or len(buf) < target):
+            if self._token is None:
+                self.__read_token__()
+            elif self._literals:
+                self.__copy_literals__()
+            elif not self.__need__(1):
+                # The last sequence only contains literals
+                if self._token & 0x0f != 0:
+                    raise CorruptError("EOF, but match-len > 0: %u" %
+                                       (self._token & 0x0f, ))
+                self._done = True
+            else:
+                self.__copy_match__()
+
+        if self._done and self.size is not None:
+            decoded = self._base + len(buf)
+            if decoded != self.size:
+                raise CorruptError("expected %u decompressed bytes, got %u" %
+                                   (self.size, decoded))
+        self.__dump__()
+
+    def __read_token__(self):
+        while True:
+            src = self._src
+            ip = self._ip
+            try:
+                token = src[ip]
+                ip += 1
+                length = token >> 4
+                if length == 0x0f:
+                    part = 0xff
+                    while part == 0xff:
+                        part = src[ip]
+                        ip += 1
+                        length += part
+            except IndexError:
+                self.__refill__("literal-len")
+                continue
+
+            self._ip = ip
+            self._token = token
+            self._literals = length
+            return
+
+    def __copy_literals__(self):
+        if not self.__need__(1):
+            raise CorruptError("not literal data")
+        ip = self._ip
+        count = min(self._literals, len(self._src) - ip)
+        self._buf += memoryview(self._src)[ip:ip + count]
+        self._ip = ip + count
+        self._literals -= count
+
+    def __copy_match__(self):
+        while True:
+            src = self._src
+            ip = self._ip
+            try:
+                match_offset = src[ip] | (src[ip + 1] << 8)
+                ip += 2
+                length = self._token & 0x0f
+                if length == 0x0f:
+                    part = 0xff
+                    while part == 0xff:
+                        part = src[ip]
+                        ip += 1
+                        length += part
+            except IndexError:
+                self.__refill__("match")
+                continue
+            break
+
+        self._ip = ip
+        self._token = None
+        length += MIN_MATCH
+
+        buf = self._buf
+        start = len(buf) - match_offset
+        if match_offset == 0:
+            raise CorruptError("offset can't be 0")
+        if start < 0:
+            raise CorruptError("offset out of range: %u" % match_offset)
+
+        if length <= match_offset:
+            buf += buf[start:start + length]
+        else:
+            # Overlapping match, see uncompress_fast()
+            pattern = buf[start:]
+            count, remainder = divmod(length, match_offset)
+            buf += pattern * count + pattern[:remainder]
+
+
+def compress_literals(data):
+    '''
+    Accepts a byte array as input - returns a LZ4 compatible (uncompressed)
+     byte array
+    '''
+    length = len(data)
+    if length > 15:
+        result = [15 << 4 | 0]  # Add the token
+
+        # Add the literal size bytes
+        result.extend([255] * (int)((length - 15) / 255))
+        result.append((int)((length - 15) % 255))
+    else:  # length <= 15
+        result = [length << 4 | 0]  # Add the token
+        if length == 15:
+            result.append(0)  # Add the empty length byte
+
+    result.extend(data)
+    return bytearray(result)
+
+
+def __write_length__(dst, length):
+    """write the extra bytes of a lz4 variable length integer."""
+    dst.extend(b'\xff' * (length // 255))
+    dst.append(length % 255)
+
+
+def __write_sequence__(dst, literals, match_offset=0, match_len=0):
+    """write a single lz4 sequence, match_len=0 for the final sequence."""
+    literal_len = len(literals)
+    if match_len:
+        match_len -= MIN_MATCH
+        token = (min(literal_len, 0x0f) << 4) | min(match_len, 0x0f)
+    else:
+        token = min(literal_len, 0x0f) << 4
+    dst.append(token)
+    if literal_len >= 0x0f:
+        __write_length__(dst, literal_len - 0x0f)
+    dst.extend(literals)
+
+    if match_offset:
+        dst.append(match_offset & 0xff)
+        dst.append(match_offset >> 8)
+        if match_len >= 0x0f:
+            __write_length__(dst, match_len - 0x0f)
+
+
+def __match_length__(src, ref, ip, limit):
+    """
+    get the number of matching bytes at src[ref:] and src[ip:] (up to limit)
+    the first MIN_MATCH bytes are expected to already match
+    """
+    length = MIN_MATCH
+    step = 8
+    while length < limit:
+        size = min(step, limit - length)
+        a = ref + length
+        b = ip + length
+        if src[a:a + size] == src[b:b + size]:
+            length += size
+            step <<= 1
+            continue
+
+        # Binary search for the mismatch within the last chunk
+        low = 0
+        high = size - 1
+        while low < high:
+            mid = (low + high + 1) >> 1
+            if src[a:a + mid] == src[b:b + mid]:
+                low = mid
+            else:
+                high = mid - 1
+        return length + low
+
+    return limit
+
+
+def compress_matches(data, level=DEFAULT_LEVEL):
+    """compress data into a single lz4 block.
+
+    Finds matches with a hash chain keyed on the next 4 bytes. Every level
+    above 1 doubles the number of chain entries probed per position, and
+    also indexes the positions covered by each match so later matches can
+    refer back into them (slower, but a better ratio).
+
+    :param bytes data: data to compress
+    :param int level: compression level, from MIN_LEVEL to MAX_LEVEL
+    :returns: lz4 compressed data (without a size prefix)
+    :rtype: bytearray
+    """
+    src = bytes(data)
+    src_len = len(src)
+    view = memoryview(src)
+    dst = bytearray()
+
+    level = max(MIN_LEVEL, min(int(level), MAX_LEVEL))
+    max_attempts = 1 << (level - 1)
+
+    anchor = 0
+    if src_len > MF_LIMIT:
+        # Matches can't start past match_start_limit or end past match_limit
+        match_start_limit = src_len - MF_LIMIT
+        match_limit = src_len - LAST_LITERALS
+
+        head = {}
+        if max_attempts > 1:
+            # Only refs within MAX_DISTANCE are followed, so (like the
+            #  reference LZ4 HC) the chain only covers a window of
+            #  MAX_DISTANCE + 1 positions, indexed by pos & MAX_DISTANCE
+            chain = array('l', [-1]) * (MAX_DISTANCE + 1)
+        else:
+            chain = None
+
+        ip = 0
+        misses = 0
+        while ip <= match_start_limit:
+            key = src[ip:ip + MIN_MATCH]
+            ref = head.get(key, -1)
+            head[key] = ip
+            if chain is not None:
+                chain[ip & MAX_DISTANCE] = ref
+
+            match_len = 0
+            match_ref = -1
+            attempts = max_attempts
+            while ref >= 0 and ip - ref <= MAX_DISTANCE and attempts:
+                length = __match_length__(src, ref, ip, match_limit - ip)
+                if length > match_len:
+                    match_len = length
+                    match_ref = ref
+                if chain is None:
+                    break
+                ref = chain[ref & MAX_DISTANCE]
+                attempts -= 1
+
+            if not match_len:
+                misses += 1
+                ip += 1 + (misses >> SKIP_STRENGTH)
+                continue
+
+            # Extend the match backwards into the pending literals
+            while (ip > anchor and match_ref > 0 and
+                   src[ip - 1] == src[match_ref - 1]):
+                ip -= 1
+                match_ref -= 1
+                match_len += 1
+
+            __write_sequence__(dst, view[anchor:ip],
+                               ip - match_ref, match_len)
+
+            end = ip + match_len
+            if chain is not None:
+                # Index the positions inside the match too
+                for pos in range(ip + 1, min(end, match_start_limit + 1)):
+                    key = src[pos:pos + MIN_MATCH]
+                    chain[pos & MAX_DISTANCE] = head.get(key, -1)
+                    head[key] = pos
+
+            ip = anchor = end
+            misses = 0
+
+    __write_sequence__(dst, view[anchor:])
+    view.release()
+    return dst
+
 
-            # Add the literal size bytes
-            result.extend([255] * (int)((length - 15) / 255))
-            result.append((int)((length - 15) % 255))
-        else:  # length <= 15
-            result = [length << 4 | 0]  # Add the token
-            if length == 15:
-                result.append(0)  # Add the empty length byte
+try:
+    # Try to import the python-lz4 package
+    import lz4.block
+
+except ImportError:
+    # If python-lz4 isn't present, fallback to using pure python
+    __support_mode__ = 'pure Python'
 
-        result.extend(data)
-        return bytearray(result)
+    uncompress = uncompress_fast
+    compress = compress_matches
 
 else:
     # Use python-lz4 if present
     __support_mode__ = 'python-lz4'
 
-    def compress(data):
-        return lz4.block.compress(data, store_size=False)
+    def compress(data, level=DEFAULT_LEVEL):
+        if level <= MIN_LEVEL:
+            return lz4.block.compress(data, store_size=False)
+        return lz4.block.compress(data, mode='high_compression',
+                                  compression=min(level, MAX_LEVEL),
+                                  store_size=False)
 
     uncompress = lz4.block.decompress
 
@@ -0,0 +1,435 @@
+# <pep8 compliant>
+
+'''
+Fast XMODEL_EXPORT parser
+
+The whole file is read into memory & split into sections. The small
+sections (header, bones, objects & materials) are parsed line by line by
+dispatching on the leading keyword through a dict, while the vertex & face
+sections are parsed in bulk - every OFFSET / BONE / NORMAL / COLOR / UV line
+is collected with a single regex pass & the values are converted by NumPy
+in one go
+
+The result matches the state machine parser in xmodel.py
+(Model.LoadFile_Raw(fast=False)) for well formed files. Version 5 files
+don't have vertex colors, so their FaceVertex colors are None - ArrayMesh
+objects store them as white, like ArrayMesh.from_mesh()
+'''
+
+import re
+
+import numpy as np
+
+from .xmodel import (Bone, Material, Model, ArrayMesh,
+                     deserialize_image_string)
+
+# All of the patterns below match from the newline that precedes the line
+#  (instead of using ^ with re.MULTILINE) which lets re skip ahead to the
+#  next newline, making them several times faster on large files
+__SECTION_RE__ = re.compile(
+    r'\n[ \t]*(NUMVERTS32|NUMVERTS|NUMFACES|NUMOBJECTS|NUMMATERIALS)\b')
+
+# Vertex section
+__OFFSET_RE__ = re.compile(r'\n[ \t]*OFFSET[ \t]+([^\n]*)')
+__BONES_RE__ = re.compile(r'\n[ \t]*BONES[ \t]+(\S+)')
+__BONE_RE__ = re.compile(r'\n[ \t]*BONE[ \t]+([^\n]*)')
+
+# Face section
+__TRI_RE__ = re.compile(r'\n[ \t]*TRI(?:16)?[ \t]+(\S+[ \t]+\S+)')
+__VERT_RE__ = re.compile(r'\n[ \t]*VERT(?:32)?[ \t]+([^\n]*)')
+__NORMAL_RE__ = re.compile(r'\n[ \t]*NORMAL[ \t]+([^\n]*)')
+__COLOR_RE__ = re.compile(r'\n[ \t]*COLOR[ \t]+([^\n]*)')
+__UV_RE__ = re.compile(r'\n[ \t]*UV[ \t]+\S+[ \t]+(\S+[ \t]+\S+)')
+
+
+def __tokens__(line):
+    '''
+    Split a line into tokens, stripping any trailing commas
+    '''
+    return [token.rstrip(',') for token in line.split()]
+
+
+def __parse_lines__(text, handlers):
+    '''
+    Call handlers[keyword](tokens) for every line that starts with one of
+    the keywords in handlers
+    '''
+    get_handler = handlers.get
+    for line in text.splitlines():
+        tokens = __tokens__(line)
+        if not tokens:
+            continue
+        handler = get_handler(tokens[0])
+        if handler is not None:
+            handler(tokens)
+
+
+def __values__(strings, columns, name, dtype=np.float64):
+    '''
+    Convert the captured text for a set of lines into an array with the
+    shape (len(strings), columns)
+    '''
+    values = ' '.join(strings).replace(',', ' ').split()
+    if len(values) != len(strings) * columns:
+        raise ValueError("Expected %d value(s) per %s line" % (columns, name))
+    return np.array(values, dtype).reshape(len(strings), columns)
+
+
+def __check_count__(name, count, expected):
+    if count != expected:
+        raise ValueError("Expected %d %s line(s), found %d" %
+                         (expected, name, count))
+
+
+def __sections__(text):
+    '''
+    Returns a dict of {keyword: (start, end)} for the first line of each
+    of the section keywords, where start is the position of the newline
+    before the line & end is the position of the newline at the end of it
+    '''
+    sections = {}
+    for match in __SECTION_RE__.finditer(text):
+        keyword = match.group(1)
+        if keyword == 'NUMVERTS32':
+            keyword = 'NUMVERTS'
+        if keyword not in sections:
+            end = text.find('\n', match.end())
+            sections[keyword] = (match.start(),
+                                 len(text) if end == -1 else end)
+    return sections
+
+
+def __load_head__(model, text):
+    '''
+    Load the header & bone hierarchy
+    '''
+    state = {'is_model': False, 'has_version': False, 'cosmetics': 0,
+             'bones_read': 0, 'bone': None}
+
+    def LoadModel(tokens):
+        state['is_model'] = True
+
+    def LoadVersion(tokens):
+        if not state['is_model'] or state['has_version']:
+            return
+        state['has_version'] = True
+        model.version = int(tokens[1])
+        if model.version not in Model.supported_versions:
+            fmt = "Invalid model version: %d - must be one of %s"
+            vargs = (model.version, repr(Model.supported_versions))
+            raise ValueError(fmt % vargs)
+
+    def LoadBoneCount(tokens):
+        model.bones = [Bone(None)] * int(tokens[1])
+
+    def LoadCosmeticCount(tokens):
+        state['cosmetics'] = int(tokens[1])
+
+    def LoadBone(tokens):
+        bone_count = len(model.bones)
+        index = int(tokens[1])
+        if state['bones_read'] < bone_count:
+            # Bone info - BONE <index> <parent> "<name>"
+            cosmetic = (index >= (bone_count - state['cosmetics']))
+            model.bones[index] = Bone(tokens[3].strip('"'),
+                                      int(tokens[2]), cosmetic)
+            state['bones_read'] += 1
+        else:
+            # Start of the transform data for a bone
+            if index >= bone_count:
+                fmt = ("bone_count does not index bone_index -- "
+                       "%d not in [0, %d)")
+                raise ValueError(fmt % (index, bone_count))
+            state['bone'] = model.bones[index]
+
+    def LoadOffset(tokens):
+        state['bone'].offset = (float(tokens[1]),
+                                float(tokens[2]),
+                                float(tokens[3]))
+
+    def LoadMatrixRow(tokens):
+        row = 'XYZ'.index(tokens[0])
+        state['bone'].matrix[row] = (float(tokens[1]),
+                                     float(tokens[2]),
+                                     float(tokens[3]))
+
+    __parse_lines__(text, {
+        "MODEL": LoadModel,
+        "VERSION": LoadVersion,
+        "NUMBONES": LoadBoneCount,
+        "NUMCOSMETICS": LoadCosmeticCount,
+        "BONE": LoadBone,
+        "OFFSET": LoadOffset,
+        "X": LoadMatrixRow,
+        "Y": LoadMatrixRow,
+        "Z": LoadMatrixRow,
+    })
+
+
+def __load_verts__(mesh, text, vert_count):
+    offsets = __OFFSET_RE__.findall(text)
+    __check_count__('OFFSET', len(offsets), vert_count)
+    mesh.positions = __values__(offsets, 3, 'OFFSET')
+
+    counts = __BONES_RE__.findall(text)
+    __check_count__('BONES', len(counts), vert_count)
+    counts = __values__(counts, 1, 'BONES', np.int64)[:, 0]
+    mesh.weight_offsets = np.zeros(vert_count + 1, np.int64)
+    np.cumsum(counts, out=mesh.weight_offsets[1:])
+
+    weights = __BONE_RE__.findall(text)
+    __check_count__('BONE', len(weights), mesh.weight_offsets[-1])
+    weights = __values__(weights, 2, 'BONE')
+    mesh.weight_bones = weights[:, 0].astype(np.int32)
+    mesh.weight_influences = weights[:, 1].copy()
+
+
+def __strided_values__(lines, start, stride, keywords, columns):
+    '''
+    Parse every stride'th line (beginning with lines[start]) where each of
+    the lines is expected to be "<keyword> <value> ... <value>"
+    Returns an array with the shape (line count, columns), or None if any
+    of the lines don't match
+    '''
+    selected = lines[start::stride]
+    tokens = ' '.join(selected).replace(',', ' ').split()
+    width = columns + 1
+    if len(tokens) != len(selected) * width:
+        return None
+    if not set(tokens[0::width]) <= keywords:
+        return None
+    del tokens[0::width]
+    return np.array(tokens, np.float64).reshape(len(selected), columns)
+
+
+def __load_faces_strided__(mesh, text, face_count, version):
+    '''
+    Fast path for the standard face layout, where every face is a TRI line
+    followed by the same set of lines for each of its 3 verts
+    Returns False (without touching mesh) if the layout doesn't match
+    '''
+    lines = [line for line in text.split('\n')
+             if line and not line.isspace()]
+
+    if version == 5:
+        # VERT <index> <normal x y z> <u v>
+        vert_lines = ((('VERT', 'VERT32'), 6),)
+    else:
+        vert_lines = ((('VERT', 'VERT32'), 1),
+                      (('NORMAL',), 3),
+                      (('COLOR',), 4),
+                      (('UV',), 3))
+    stride = 1 + 3 * len(vert_lines)
+    if len(lines) != face_count * stride:
+        return False
+
+    tris = __strided_values__(lines, 0, stride, {'TRI', 'TRI16'}, 4)
+    if tris is None:
+        return False
+
+    results = []
+    for line_index, (keywords, columns) in enumerate(vert_lines):
+        per_vert = []
+        for vert_index in range(3):
+            start = 1 + vert_index * len(vert_lines) + line_index
+            values = __strided_values__(lines, start, stride,
+                                        set(keywords), columns)
+            if values is None:
+                return False
+            per_vert.append(values)
+        results.append(np.stack(per_vert, axis=1))
+
+    mesh.face_mesh_ids = tris[:, 0].astype(np.int32)
+    mesh.face_material_ids = tris[:, 1].astype(np.int32)
+    mesh.face_vertices = results[0][:, :, 0].astype(np.int64)
+    if version == 5:
+        mesh.normals = results[0][:, :, 1:4].copy()
+        mesh.uvs = results[0][:, :, 4:6].copy()
+        mesh.colors = np.ones((face_count, 3, 4))
+    else:
+        mesh.normals = results[1]
+        mesh.colors = results[2]
+        # Only the first UV layer is used
+        mesh.uvs = results[3][:, :, 1:3].copy()
+    return True
+
+
+def __load_faces__(mesh, text, face_count, version):
+    if __load_faces_strided__(mesh, text, face_count, version):
+        return
+
+    tris = __TRI_RE__.findall(text)
+    __check_count__('TRI', len(tris), face_count)
+    tris = __values__(tris, 2, 'TRI', np.int64)
+    mesh.face_mesh_ids = tris[:, 0].astype(np.int32)
+    mesh.face_material_ids = tris[:, 1].astype(np.int32)
+
+    verts = __VERT_RE__.findall(text)
+    __check_count__('VERT', len(verts), face_count * 3)
+
+    if version == 5:
+        # VERT <index> <normal x y z> <u v>
+        verts = __values__(verts, 6, 'VERT')
+        mesh.face_vertices = verts[:, 0].astype(np.int64).reshape(-1, 3)
+        mesh.normals = verts[:, 1:4].reshape(-1, 3, 3)
+        mesh.uvs = verts[:, 4:6].reshape(-1, 3, 2)
+        mesh.colors = np.ones((face_count, 3, 4))
+        return
+
+    mesh.face_vertices = __values__(verts, 1, 'VERT',
+                                    np.int64).reshape(-1, 3)
+
+    for name, regex, attr, columns in (('NORMAL', __NORMAL_RE__,
+                                        'normals', 3),
+                                       ('COLOR', __COLOR_RE__, 'colors', 4),
+                                       ('UV', __UV_RE__, 'uvs', 2)):
+        values = regex.findall(text)
+        __check_count__(name, len(values), face_count * 3)
+        setattr(mesh, attr,
+                __values__(values, columns, name).reshape(-1, 3, columns))
+
+
+def __load_tail__(model, text, split_meshes):
+    '''
+    Load the objects & materials
+    '''
+    version = model.version
+    state = {'material_count': None, 'material': None}
+
+    def LoadObjectCount(tokens):
+        if split_meshes:
+            model.meshes = [None] * int(tokens[1])
+
+    def LoadObject(tokens):
+        if split_meshes:
+            model.meshes[int(tokens[1])] = tokens[2].strip('"')
+
+    def LoadMaterialCount(tokens):
+        if state['material_count'] is None:
+            state['material_count'] = int(tokens[1])
+            model.materials = [None] * state['material_count']
+
+    def LoadMaterial(tokens):
+        index = int(tokens[1])
+        if version == 5:
+            # Legacy XModel materials don't explicitly have a name
+            #  field, so we simply auto-generate a name
+            name = "Material_%d" % index
+            material_type = "Lambert"
+            images = deserialize_image_string(tokens[2].strip('"'))
+        else:
+            name = tokens[2].strip('"')
+            material_type = tokens[3].strip('"')
+            images = deserialize_image_string(tokens[4].strip('"'))
+        material = Material(name, material_type, images)
+        model.materials[index] = material
+        state['material'] = material
+
+    def LoadProperty(attr, *types):
+        def Load(tokens):
+            setattr(state['material'], attr,
+                    tuple([t(v) for t, v in zip(types, tokens[1:])]))
+        return Load
+
+    def LoadPhong(tokens):
+        state['material'].phong = float(tokens[1])
+
+    f = float
+    handlers = {
+        "NUMOBJECTS": LoadObjectCount,
+        "OBJECT": LoadObject,
+        "NUMMATERIALS": LoadMaterialCount,
+        "MATERIAL": LoadMaterial,
+    }
+
+    # All of the properties below are only present in version 6
+    if version != 5:
+        handlers.update({
+            "COLOR": LoadProperty('color', f, f, f, f),
+            "TRANSPARENCY": LoadProperty('transparency', f, f, f, f),
+            "AMBIENTCOLOR": LoadProperty('color_ambient', f, f, f, f),
+            "INCANDESCENCE": LoadProperty('incandescence', f, f, f, f),
+            "COEFFS": LoadProperty('coeffs', f, f),
+            "GLOW": LoadProperty('glow', f, int),
+            "REFRACTIVE": LoadProperty('refractive', int, f),
+            "SPECULARCOLOR": LoadProperty('color_specular', f, f, f, f),
+            "REFLECTIVECOLOR": LoadProperty('color_reflective', f, f, f, f),
+            "REFLECTIVE": LoadProperty('reflective', int, f),
+            "BLINN": LoadProperty('blinn', f, f),
+            "PHONG": LoadPhong,
+        })
+
+    __parse_lines__(text, handlers)
+
+
+def load_model(model, path, split_meshes=True, array_meshes=False):
+    '''
+    Load an XMODEL_EXPORT file into model
+    If array_meshes is True, the meshes are ArrayMesh objects instead of
+    the usual Mesh objects
+    '''
+    with open(path, "r") as file:
+        # Every line (including the first) is preceded by a newline
+        text = '\n' + file.read()
+
+    sections = __sections__(text)
+    size = len(text)
+
+    def section_bounds(keyword, *next_keywords):
+        if keyword not in sections:
+            return None
+        start = sections[keyword][1]
+        ends = [sections[k][0] for k in next_keywords if k in sections]
+        return start, min([end for end in ends if end >= start] or [size])
+
+    def count(keyword):
+        start, end = sections[keyword]
+        return int(__tokens__(text[start:end])[1])
+
+    head_end = min([start for start, end in sections.values()] or [size])
+    __load_head__(model, text[:head_end])
+
+    default_mesh = ArrayMesh("$default")
+
+    bounds = section_bounds('NUMVERTS', 'NUMFACES', 'NUMOBJECTS',
+                            'NUMMATERIALS')
+    if bounds is not None:
+        __load_verts__(default_mesh, text[bounds[0]:bounds[1]],
+                       count('NUMVERTS'))
+
+    bounds = section_bounds('NUMFACES', 'NUMOBJECTS', 'NUMMATERIALS')
+    if bounds is not None:
+        __load_faces__(default_mesh, text[bounds[0]:bounds[1]],
+                       count('NUMFACES'), model.version)
+
+    if split_meshes and default_mesh.face_count:
+        face_vertices = default_mesh.face_vertices
+        if (face_vertices.min() < 0 or
+                face_vertices.max() >= default_mesh.vert_count):
+            raise ValueError("Face vertex index out of range [0, %d)" %
+                             default_mesh.vert_count)
+
+    tail_start = min([sections[k][0] for k in ('NUMOBJECTS', 'NUMMATERIALS')
+                      if k in sections] or [size])
+    model.meshes = []
+    model.materials = []
+    __load_tail__(model, text[tail_start:], split_meshes)
+
+    if split_meshes:
+        meshes = [default_mesh.submesh(mesh_index, name)
+                  for mesh_index, name in enumerate(model.meshes)]
+    else:
+        # Matches Mesh.__load_verts__, which always sets up the bone groups
+        default_mesh.bone_groups = [[] for bone in model.bones]
+        meshes = [default_mesh]
+
+    if not array_meshes:
+        if split_meshes:
+            for mesh in meshes:
+                mesh.generate_groups(len(model.bones), len(model.materials))
+        meshes = [mesh.to_mesh(model.version != 5) for mesh in meshes]
+
+    model.meshes = meshes
+    model.vertex_array = None
+    model.weight_array = None
+    model.face_array = None
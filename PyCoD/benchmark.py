@@ -0,0 +1,279 @@
+# <pep8 compliant>
+
+'''
+Benchmarks for the pure Python code paths in PyCoD
+
+Run them all with:
+    python -m pv_py_utils.PyCoD.benchmark
+'''
+
+import os
+import random
+import struct
+import tempfile
+from timeit import default_timer as timer
+
+from pv_py_utils.PyCoD import _lz4
+from pv_py_utils.PyCoD import xmodel
+
+
+def __time_call__(func, *args, **kwargs):
+    '''
+    Call func & return a tuple of (seconds taken, result)
+    '''
+    start = timer()
+    result = func(*args, **kwargs)
+    return timer() - start, result
+
+
+def __best_of__(repeat, func, *args, **kwargs):
+    '''
+    Call func 'repeat' times & return a tuple of (best time, last result)
+    '''
+    best = None
+    result = None
+    for _ in range(repeat):
+        elapsed, result = __time_call__(func, *args, **kwargs)
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def synthetic_xbin_payload(vert_count=50000, seed=0):
+    '''
+    Generate an uncompressed payload that looks roughly like the vertex &
+    face sections of an xmodel_bin file (offset blocks, weight blocks,
+    face vertex normal/color/uv blocks, etc.)
+    '''
+    rng = random.Random(seed)
+    chunks = []
+    for index in range(vert_count):
+        chunks.append(struct.pack('HxxI', 0xB097, index))
+        chunks.append(struct.pack('Hxxfff', 0x9383,
+                                  round(rng.uniform(-64, 64), 2),
+                                  round(rng.uniform(-64, 64), 2),
+                                  round(rng.uniform(0, 128), 2)))
+        chunks.append(struct.pack('Hh', 0xEA46, 1))
+        chunks.append(struct.pack('Hhf', 0xF1AB, rng.randint(0, 8), 1.0))
+
+    for index in range(vert_count // 3):
+        chunks.append(struct.pack('HBB', 0x562F, 0, 0))
+        for vert in range(3):
+            chunks.append(struct.pack('HxxI', 0xB097, index * 3 + vert))
+            chunks.append(struct.pack('Hhhh', 0x89EC, 0, 0, 32767))
+            chunks.append(struct.pack('HxxBBBB', 0x6DD8, 255, 255, 255, 255))
+            chunks.append(struct.pack('Hhff', 0x1AD4, 1,
+                                      round(rng.random(), 3),
+                                      round(rng.random(), 3)))
+    return b''.join(chunks)
+
+
+def __compress_sized__(data):
+    '''
+    Compress data the way XBinIO does (size prefix + LZ4 block)
+    '''
+    return struct.pack('I', len(data)) + bytes(_lz4.compress(data))
+
+
+def bench_lz4_uncompress(vert_count=50000, repeat=3):
+    '''
+    Compare the original byte-at-a-time LZ4 decoder with uncompress_fast()
+    Returns a dict of {name: best time in seconds}
+    '''
+    data = synthetic_xbin_payload(vert_count)
+    src = __compress_sized__(data)
+
+    results = {}
+    for name, func in (('bytewise', _lz4.uncompress_bytewise),
+                       ('fast', _lz4.uncompress_fast)):
+        elapsed, out = __best_of__(repeat, func, src)
+        if bytes(out) != data:
+            raise AssertionError("LZ4 decoder '%s' produced bad output" %
+                                 name)
+        results[name] = elapsed
+
+    print("LZ4 uncompress: %d bytes -> %d bytes (%s)" %
+          (len(src), len(data), _lz4.support_info))
+    for name, elapsed in results.items():
+        print("    %-10s %8.3f s  %8.2f MB/s" %
+              (name, elapsed, len(data) / elapsed / 1e6))
+    print("    speedup    %8.1fx" % (results['bytewise'] / results['fast']))
+    return results
+
+
+def bench_lz4_compress(vert_count=10000, levels=(1, 2, 4), repeat=1):
+    '''
+    Compare the literal-only LZ4 encoder with compress_matches() at a few
+    compression levels. Every result is checked against uncompress_fast()
+    Returns a dict of {name: (best time in seconds, compressed size)}
+    '''
+    data = synthetic_xbin_payload(vert_count)
+
+    encoders = [('literals', _lz4.compress_literals)]
+    for level in levels:
+        encoders.append(('level %d' % level,
+                         lambda d, level=level:
+                         _lz4.compress_matches(d, level)))
+
+    results = {}
+    for name, func in encoders:
+        elapsed, out = __best_of__(repeat, func, data)
+        if bytes(_lz4.uncompress_fast(out, 0, len(data))) != data:
+            raise AssertionError("LZ4 encoder '%s' produced bad output" %
+                                 name)
+        results[name] = (elapsed, len(out))
+
+    print("LZ4 compress: %d bytes" % len(data))
+    for name, (elapsed, size) in results.items():
+        print("    %-10s %8.3f s  %8.2f MB/s  %9d bytes (%5.1f%%)" %
+              (name, elapsed, len(data) / elapsed / 1e6,
+               size, 100.0 * size / len(data)))
+    return results
+
+
+def synthetic_model(vert_count=1000000, face_count=None, mesh_count=2,
+                    bone_count=16, seed=0):
+    '''
+    Generate a Model made of ArrayMesh objects with random verts, weights
+    and faces. By default there is one face per vertex
+    '''
+    import numpy as np
+
+    if face_count is None:
+        face_count = vert_count
+
+    rng = np.random.RandomState(seed)
+    model = xmodel.Model('synthetic')
+    model.version = 7
+
+    for index in range(bone_count):
+        bone = xmodel.Bone('bone_%d' % index, index - 1)
+        bone.offset = tuple(rng.uniform(-8, 8, 3).tolist())
+        bone.matrix = [(1.0, 0.0, 0.0), (0.0, 1.0, 0.0), (0.0, 0.0, 1.0)]
+        model.bones.append(bone)
+
+    for index in range(mesh_count):
+        verts = vert_count // mesh_count
+        faces = face_count // mesh_count
+
+        mesh = xmodel.ArrayMesh('mesh_%d' % index)
+        mesh.positions = rng.uniform(-64, 64, (verts, 3))
+        counts = rng.randint(1, 4, verts)
+        mesh.weight_offsets = np.zeros(verts + 1, np.int64)
+        np.cumsum(counts, out=mesh.weight_offsets[1:])
+        mesh.weight_bones = rng.randint(0, bone_count,
+                                        mesh.weight_offsets[-1])
+        mesh.weight_influences = 1.0 / np.repeat(counts, counts)
+
+        mesh.face_mesh_ids = np.full(faces, index, np.int32)
+        mesh.face_material_ids = np.zeros(faces, np.int32)
+        mesh.face_vertices = rng.randint(0, verts, (faces, 3))
+        mesh.normals = rng.uniform(-1, 1, (faces, 3, 3))
+        mesh.colors = rng.uniform(0, 1, (faces, 3, 4))
+        mesh.uvs = rng.uniform(0, 1, (faces, 3, 2))
+        model.meshes.append(mesh)
+
+    model.materials.append(xmodel.Material('default', 'Lambert',
+                                           {'color': 'default.tga'}))
+    return model
+
+
+def bench_xmodel_raw_load(vert_count=1000000, repeat=1):
+    '''
+    Compare the line by line XMODEL_EXPORT parser with the bulk parser in
+    _raw.py (building Mesh objects, and building ArrayMesh objects)
+    Returns a dict of {name: best time in seconds}
+    '''
+    model = synthetic_model(vert_count)
+    handle, path = tempfile.mkstemp(suffix='.xmodel_export')
+    os.close(handle)
+
+    try:
+        model.WriteFile_Raw(path)
+        size = os.path.getsize(path)
+
+        loaders = (
+            ('lines', lambda: xmodel.Model.FromFile_Raw(path, fast=False)),
+            ('fast', lambda: xmodel.Model.FromFile_Raw(path, fast=True)),
+            ('fast array', lambda: xmodel.Model.FromFile_Raw(
+                path, array_meshes=True)),
+        )
+
+        results = {}
+        for name, func in loaders:
+            elapsed, out = __best_of__(repeat, func)
+            counts = [(mesh.vert_count, mesh.face_count)
+                      for mesh in out.meshes]
+            if sum([c[1] for c in counts]) != model.meshes[0].face_count * \
+                    len(model.meshes):
+                raise AssertionError("XMODEL_EXPORT loader '%s' produced "
+                                     "bad output" % name)
+            results[name] = elapsed
+    finally:
+        os.remove(path)
+
+    print("XMODEL_EXPORT load: %d verts, %.1f MB" % (vert_count, size / 1e6))
+    for name, elapsed in results.items():
+        print("    %-10s %8.3f s  %8.2f MB/s  %6.1fx" %
+              (name, elapsed, size / elapsed / 1e6,
+               results['lines'] / elapsed))
+    return results
+
+
+def bench_xmodel_raw_write(vert_count=1000000, repeat=1):
+    '''
+    Compare the line by line XMODEL_EXPORT writer with the buffered writer
+    (for Mesh objects, and for ArrayMesh objects)
+    Returns a dict of {name: best time in seconds}
+    '''
+    array_model = synthetic_model(vert_count)
+    object_model = synthetic_model(vert_count)
+    object_model.meshes = [mesh.to_mesh() for mesh in object_model.meshes]
+
+    writers = (
+        ('lines', object_model, False),
+        ('buffered', object_model, True),
+        ('lines array', array_model, False),
+        ('buffered array', array_model, True),
+    )
+
+    handle, path = tempfile.mkstemp(suffix='.xmodel_export')
+    os.close(handle)
+
+    try:
+        results = {}
+        outputs = []
+        for name, model, buffered in writers:
+            elapsed, out = __best_of__(repeat, lambda: model.WriteFile_Raw(
+                path, buffered=buffered))
+            results[name] = elapsed
+            with open(path) as file:
+                # Skip the export timestamp
+                file.readline()
+                outputs.append(hash(file.read()))
+        size = os.path.getsize(path)
+    finally:
+        os.remove(path)
+
+    if len(set(outputs)) != 1:
+        raise AssertionError("XMODEL_EXPORT writers produced different "
+                             "output")
+
+    print("XMODEL_EXPORT write: %d verts, %.1f MB" %
+          (vert_count, size / 1e6))
+    for name, elapsed in results.items():
+        print("    %-14s %8.3f s  %8.2f MB/s  %6.1fx" %
+              (name, elapsed, size / elapsed / 1e6,
+               results['lines'] / elapsed))
+    return results
+
+
+def main():
+    bench_lz4_uncompress()
+    bench_lz4_compress()
+    bench_xmodel_raw_load()
+    bench_xmodel_raw_write()
+
+
+if __name__ == '__main__':
+    main()
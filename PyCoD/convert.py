@@ -0,0 +1,238 @@
+# <pep8 compliant>
+
+'''
+Batch conversion between the *_export & *_bin formats
+
+Convert every file in a directory tree with:
+    python -m pv_py_utils.PyCoD.convert <directory> [--to bin|export]
+'''
+
+import argparse
+import os
+from collections import namedtuple
+from concurrent.futures import (ProcessPoolExecutor, FIRST_COMPLETED,
+                                wait)
+from timeit import default_timer as timer
+
+from pv_py_utils.PyCoD.xmodel import Model
+from pv_py_utils.PyCoD.xanim import Anim
+
+# Maps each extension to the (format, asset class, extension) it converts to
+__CONVERSIONS__ = {
+    '.xmodel_export': ('bin', Model, '.xmodel_bin'),
+    '.xmodel_bin': ('export', Model, '.xmodel_export'),
+    '.xanim_export': ('bin', Anim, '.xanim_bin'),
+    '.xanim_bin': ('export', Anim, '.xanim_export'),
+}
+
+ConversionResult = namedtuple('ConversionResult', (
+    'source', 'target', 'seconds', 'source_size', 'target_size',
+    'skipped', 'error'))
+
+
+def target_path(path):
+    '''
+    Returns the path that the given *_export / *_bin file converts to, or
+    None if it isn't a supported file type
+    '''
+    root, ext = os.path.splitext(path)
+    conversion = __CONVERSIONS__.get(ext.lower())
+    if conversion is None:
+        return None
+    return root + conversion[2]
+
+
+def is_up_to_date(source, target):
+    '''
+    Returns True if target exists & is newer than source
+    '''
+    try:
+        return os.stat(target).st_mtime >= os.stat(source).st_mtime
+    except OSError:
+        return False
+
+
+def find_conversions(root, to=None, recursive=True):
+    '''
+    Walk root & return a sorted list of (source, target) pairs
+    to may be 'bin' or 'export' to only convert in one direction
+    '''
+    if to not in (None, 'bin', 'export'):
+        raise ValueError("Invalid conversion target: %r - must be one of "
+                         "None, 'bin' or 'export'" % (to,))
+
+    pairs = []
+    for directory, dirnames, filenames in os.walk(root):
+        if not recursive:
+            dirnames[:] = []
+        for filename in filenames:
+            ext = os.path.splitext(filename)[1].lower()
+            conversion = __CONVERSIONS__.get(ext)
+            if conversion is None or to not in (None, conversion[0]):
+                continue
+            source = os.path.join(directory, filename)
+            pairs.append((source, target_path(source)))
+    pairs.sort()
+    return pairs
+
+
+def convert_file(source, target, array_meshes=False):
+    '''
+    Convert a single file & return a ConversionResult
+    The output is written to a temporary file & then moved into place, so a
+    failed conversion never leaves a (newer) partial target behind
+    The target is given the same mtime as the source, so converting in both
+    directions doesn't convert the output back again on the next run
+    Exceptions are caught & stored as the error string of the result
+    '''
+    start = timer()
+    fmt, asset_type, _ = __CONVERSIONS__[os.path.splitext(source)[1].lower()]
+    temp = '%s.%d.tmp' % (target, os.getpid())
+    try:
+        if asset_type is Model and fmt == 'bin':
+            asset = Model.FromFile_Raw(source, fast=True,
+                                       array_meshes=array_meshes)
+        elif asset_type is Model:
+            asset = Model.FromFile_Bin(source, arrays=array_meshes)
+            if array_meshes:
+                asset.use_array_meshes()
+        elif fmt == 'bin':
+            asset = Anim.FromFile_Raw(source)
+        else:
+            asset = Anim.FromFile_Bin(source)
+
+        if fmt == 'bin':
+            asset.WriteFile_Bin(temp)
+        else:
+            asset.WriteFile_Raw(temp)
+        os.replace(temp, target)
+        stat = os.stat(source)
+        os.utime(target, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    except Exception as e:
+        if os.path.exists(temp):
+            os.remove(temp)
+        return ConversionResult(source, target, timer() - start,
+                                os.path.getsize(source), 0, False,
+                                '%s: %s' % (type(e).__name__, e))
+
+    return ConversionResult(source, target, timer() - start,
+                            os.path.getsize(source), os.path.getsize(target),
+                            False, None)
+
+
+def convert_files(pairs, workers=None, max_in_flight=None, force=False,
+                  array_meshes=False, callback=None):
+    '''
+    Convert each (source, target) pair using a ProcessPoolExecutor with
+    'workers' processes (defaults to os.cpu_count(), 1 converts in-process)
+    At most max_in_flight files (defaults to workers) are submitted at once,
+    which bounds the memory used by pending conversions
+    Targets that are newer than their source are skipped unless force is
+    True. callback(result) is called as each conversion finishes
+    Returns a list of ConversionResult in the order they finished
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if max_in_flight is None:
+        max_in_flight = workers
+
+    results = []
+
+    def finish(result):
+        results.append(result)
+        if callback is not None:
+            callback(result)
+
+    pending = []
+    for source, target in pairs:
+        if not force and is_up_to_date(source, target):
+            finish(ConversionResult(source, target, 0.0,
+                                    os.path.getsize(source),
+                                    os.path.getsize(target), True, None))
+        else:
+            pending.append((source, target))
+
+    if workers <= 1:
+        for source, target in pending:
+            finish(convert_file(source, target, array_meshes))
+        return results
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        for source, target in pending:
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight,
+                                       return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(future.result())
+            in_flight.add(executor.submit(convert_file, source, target,
+                                          array_meshes))
+        for future in wait(in_flight).done:
+            finish(future.result())
+
+    return results
+
+
+def convert_tree(root, to=None, recursive=True, **kwargs):
+    '''
+    Convert every supported file under root (see find_conversions() and
+    convert_files() for the arguments)
+    '''
+    return convert_files(find_conversions(root, to, recursive), **kwargs)
+
+
+def __print_result__(result):
+    if result.skipped:
+        print("    skipped  %s (up to date)" % result.target)
+    elif result.error is not None:
+        print("    FAILED   %s - %s" % (result.source, result.error))
+    else:
+        mb_per_sec = result.source_size / max(result.seconds, 1e-9) / 1e6
+        print("    %7.3f s %8.2f MB/s  %s -> %s" %
+              (result.seconds, mb_per_sec, result.source,
+               os.path.basename(result.target)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Convert xmodel / xanim files between the *_export & "
+                    "*_bin formats")
+    parser.add_argument('root', help="the directory to convert")
+    parser.add_argument('--to', choices=('bin', 'export'), default=None,
+                        help="only convert in one direction")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="the number of worker processes")
+    parser.add_argument('--max-in-flight', type=int, default=None,
+                        help="the maximum number of files being converted "
+                             "at once (defaults to --workers)")
+    parser.add_argument('--force', action='store_true',
+                        help="convert files even if the output is newer")
+    parser.add_argument('--no-recursive', dest='recursive',
+                        action='store_false',
+                        help="don't convert files in subdirectories")
+    parser.add_argument('--array-meshes', action='store_true',
+                        help="use ArrayMesh for models (lower memory use)")
+    args = parser.parse_args(argv)
+
+    start = timer()
+    results = convert_tree(args.root, args.to, args.recursive,
+                           workers=args.workers,
+                           max_in_flight=args.max_in_flight,
+                           force=args.force,
+                           array_meshes=args.array_meshes,
+                           callback=__print_result__)
+    elapsed = timer() - start
+
+    converted = [r for r in results if not r.skipped and r.error is None]
+    failed = [r for r in results if r.error is not None]
+    size = sum([r.source_size for r in converted])
+    print("Converted %d files (%.1f MB) in %.3f s - %.2f MB/s, "
+          "%d skipped, %d failed" %
+          (len(converted), size / 1e6, elapsed,
+           size / max(elapsed, 1e-9) / 1e6,
+           len(results) - len(converted) - len(failed), len(failed)))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -473,11 +473,12 @@ class Anim(XBinIO, object):
         anim.LoadFile_Raw(filepath)
         return anim
 
-    def LoadFile_Bin(self, path, is_compressed=True, dump=False):
+    def LoadFile_Bin(self, path, is_compressed=True, dump=False,
+                     stream=False):
         file = open(path, "rb")
 
         if is_compressed:
-            file = XBinIO.__decompress_internal__(file, dump)
+            file = XBinIO.__decompress_internal__(file, dump, stream)
 
         self.__xbin_loadfile_internal__(file, 'ANIM')
         file.close()
@@ -490,10 +491,12 @@ class Anim(XBinIO, object):
                                                      header_message)
 
     @staticmethod
-    def FromFile_Bin(filepath, is_compressed=True, dump=False):
+    def FromFile_Bin(filepath, is_compressed=True, dump=False, stream=False):
         '''
         Load from a XANIM_BIN file and return the resulting Anim()
+        If stream is True, the file is decompressed incrementally as it's
+        parsed, which keeps peak memory use down for very large anims
         '''
         anim = Anim()
-        anim.LoadFile_Bin(filepath, is_compressed, dump)
+        anim.LoadFile_Bin(filepath, is_compressed, dump, stream)
         return anim
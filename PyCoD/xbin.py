@@ -9,6 +9,10 @@ from . import _lz4 as lz4
 LOG_BLOCKS = False
 LZ4_VERBOSE = False
 
+# Speed / ratio trade-off used when writing x*_bin files
+#  See _lz4.MIN_LEVEL & _lz4.MAX_LEVEL
+LZ4_COMPRESSION_LEVEL = lz4.DEFAULT_LEVEL
+
 __LZ4_DISPLAY_SUPPORT_INFO__ = True
 
 
@@ -487,6 +491,276 @@ class XBlock(object):
         file.write(bytearray(0) * padding(end))
 
 
+# Precompiled structs used by XBlockReader
+__unpack_hash__ = struct.Struct('<H').unpack_from
+__unpack_int16__ = struct.Struct('<h').unpack_from
+__unpack_uint16__ = struct.Struct('<H').unpack_from
+__unpack_int32__ = struct.Struct('<i').unpack_from
+__unpack_int32x2__ = struct.Struct('<ii').unpack_from
+__unpack_float__ = struct.Struct('<f').unpack_from
+__unpack_vec2__ = struct.Struct('<ff').unpack_from
+__unpack_vec3__ = struct.Struct('<fff').unpack_from
+__unpack_vec4__ = struct.Struct('<ffff').unpack_from
+__unpack_short_vec3__ = struct.Struct('<hhh').unpack_from
+__unpack_weight__ = struct.Struct('<hf').unpack_from
+__unpack_uint8x2__ = struct.Struct('<BB').unpack_from
+__unpack_uint16x2__ = struct.Struct('<HH').unpack_from
+__unpack_uint8x4__ = struct.Struct('<BBBB').unpack_from
+
+
+class XBlockReader(object):
+    '''
+    Cursor based block reader for decompressed x*_bin data
+
+    Reads straight out of a memoryview of the buffer using precompiled
+    struct.Struct objects, instead of going through file.read() / seek()
+    All of the Load* methods mirror the XBlock.Load* functions, and expect
+    the cursor to be positioned just after the block's hash
+    '''
+    __slots__ = ('data', 'view', 'pos', 'size')
+
+    def __init__(self, data, pos=0):
+        self.data = data  # Kept around for bytes.find()
+        self.view = memoryview(data)
+        self.pos = pos
+        self.size = len(self.view)
+
+    def close(self):
+        self.view.release()
+        self.data = None
+
+    def tell(self):
+        return self.pos
+
+    def ReadHash(self):
+        '''
+        Read the next block hash, returns None at the end of the data
+        '''
+        pos = self.pos
+        if pos + 2 > self.size:
+            return None
+        self.pos = pos + 2
+        return __unpack_hash__(self.view, pos)[0]
+
+    def __string_at__(self, pos):
+        '''
+        Returns a tuple of (string, end) for the null terminated string at
+        pos, where end is the position after the null terminator
+        '''
+        end = self.data.find(b'\x00', pos)
+        if end == -1:
+            raise ValueError("Unterminated string at 0x%X" % pos)
+        return str(self.view[pos:end], 'utf-8'), end + 1
+
+    def LoadString(self):
+        string, self.pos = self.__string_at__(self.pos)
+        return string
+
+    def LoadString_Aligned(self):
+        start = self.pos
+        string, end = self.__string_at__(start)
+        self.pos = start + padded(end - start)
+        return string
+
+    def LoadInt16Block(self):
+        pos = self.pos
+        self.pos = pos + 2
+        return __unpack_int16__(self.view, pos)[0]
+
+    def LoadUInt16Block(self):
+        pos = self.pos
+        self.pos = pos + 2
+        return __unpack_uint16__(self.view, pos)[0]
+
+    def LoadInt32Block(self):
+        pos = self.pos
+        self.pos = pos + 6
+        return __unpack_int32__(self.view, pos + 2)[0]
+
+    def LoadCommentBlock(self):
+        start = self.pos - 2
+        string, end = self.__string_at__(start + 4)
+        self.pos = start + padded(end - start)
+        return string
+
+    def LoadBoneBlock(self):
+        start = self.pos - 2
+        index, parent = __unpack_int32x2__(self.view, start + 4)
+        string, end = self.__string_at__(start + 12)
+        self.pos = start + padded(end - start)
+        return (index, parent, string)
+
+    def LoadFloatBlock(self):
+        start = self.pos - 2
+        self.pos = start + 8
+        return __unpack_float__(self.view, start + 4)[0]
+
+    def LoadVec2Block(self):
+        start = self.pos - 2
+        self.pos = start + 12
+        return __unpack_vec2__(self.view, start + 4)
+
+    def LoadVec3Block(self):
+        start = self.pos - 2
+        self.pos = start + 16
+        return __unpack_vec3__(self.view, start + 4)
+
+    def LoadShortVec3Block(self):
+        pos = self.pos
+        self.pos = pos + 6
+        x, y, z = __unpack_short_vec3__(self.view, pos)
+        return (x / 32767.0, y / 32767.0, z / 32767.0)
+
+    def LoadVec4Block(self):
+        start = self.pos - 2
+        self.pos = start + 20
+        return __unpack_vec4__(self.view, start + 4)
+
+    def LoadVertexWeightBlock(self):
+        pos = self.pos
+        self.pos = pos + 6
+        return __unpack_weight__(self.view, pos)
+
+    def LoadTriangleBlock(self):
+        pos = self.pos
+        self.pos = pos + 2
+        return __unpack_uint8x2__(self.view, pos)
+
+    def LoadTriangle16Block(self):
+        pos = self.pos
+        self.pos = pos + 6
+        return __unpack_uint16x2__(self.view, pos + 2)
+
+    def LoadColorBlock(self):
+        pos = self.pos
+        self.pos = pos + 6
+        r, g, b, a = __unpack_uint8x4__(self.view, pos + 2)
+        return (r / 255.0, g / 255.0, b / 255.0, a / 255.0)
+
+    def LoadUVBlock(self):
+        pos = self.pos
+        layer_count = __unpack_int16__(self.view, pos)[0]
+        self.pos = pos + 2 + 8 * layer_count
+        # Technically there is support for additional UV layers
+        #  but we're only using the first one at the moment
+        return __unpack_vec2__(self.view, pos + 2)
+
+    def LoadObjectBlock(self):
+        start = self.pos - 2
+        index = __unpack_int16__(self.view, start + 2)[0]
+        string, end = self.__string_at__(start + 4)
+        self.pos = start + padded(end - start)
+        return (index, string)
+
+    def LoadMaterialBlock(self):
+        from .xmodel import deserialize_image_string
+        start = self.pos - 2
+        index = __unpack_int16__(self.view, start + 2)[0]
+        self.pos = start + 4
+        name = self.LoadString_Aligned()
+        _type = self.LoadString_Aligned()
+        imgs = deserialize_image_string(self.LoadString_Aligned())
+        self.pos = start + padded(self.pos - start)
+        return (index, name, _type, imgs)
+
+    def LoadNoteFrameBlock(self):
+        start = self.pos - 2
+        frame = __unpack_int32__(self.view, start + 4)[0]
+        string, end = self.__string_at__(start + 8)
+        self.pos = start + padded(end - start)
+        return (frame, string)
+
+    def SkipExtraData(self):
+        self.pos += 18
+
+
+class XBlockFileReader(object):
+    '''
+    Exposes the XBlockReader interface on top of a file object by calling
+    the XBlock.Load* functions. This is used for files that aren't held in
+    memory (uncompressed files or streamed decompression)
+    '''
+    __slots__ = ('file', )
+
+    def __init__(self, file):
+        self.file = file
+
+    def close(self):
+        self.file.close()
+
+    def tell(self):
+        return self.file.tell()
+
+    def ReadHash(self):
+        data = self.file.read(2)
+        if not data:
+            return None
+        return struct.unpack('H', data)[0]
+
+    def LoadString(self):
+        return XBlock.LoadString(self.file)
+
+    def LoadString_Aligned(self):
+        return XBlock.LoadString_Aligned(self.file)
+
+    def LoadInt16Block(self):
+        return XBlock.LoadInt16Block(self.file)
+
+    def LoadUInt16Block(self):
+        return XBlock.LoadUInt16Block(self.file)
+
+    def LoadInt32Block(self):
+        return XBlock.LoadInt32Block(self.file)
+
+    def LoadCommentBlock(self):
+        return XBlock.LoadCommentBlock(self.file)
+
+    def LoadBoneBlock(self):
+        return XBlock.LoadBoneBlock(self.file)
+
+    def LoadFloatBlock(self):
+        return XBlock.LoadFloatBlock(self.file)
+
+    def LoadVec2Block(self):
+        return XBlock.LoadVec2Block(self.file)
+
+    def LoadVec3Block(self):
+        return XBlock.LoadVec3Block(self.file)
+
+    def LoadShortVec3Block(self):
+        return XBlock.LoadShortVec3Block(self.file)
+
+    def LoadVec4Block(self):
+        return XBlock.LoadVec4Block(self.file)
+
+    def LoadVertexWeightBlock(self):
+        return XBlock.LoadVertexWeightBlock(self.file)
+
+    def LoadTriangleBlock(self):
+        return XBlock.LoadTriangleBlock(self.file)
+
+    def LoadTriangle16Block(self):
+        return XBlock.LoadTriangle16Block(self.file)
+
+    def LoadColorBlock(self):
+        return XBlock.LoadColorBlock(self.file)
+
+    def LoadUVBlock(self):
+        return XBlock.LoadUVBlock(self.file)
+
+    def LoadObjectBlock(self):
+        return XBlock.LoadObjectBlock(self.file)
+
+    def LoadMaterialBlock(self):
+        return XBlock.LoadMaterialBlock(self.file)
+
+    def LoadNoteFrameBlock(self):
+        return XBlock.LoadNoteFrameBlock(self.file)
+
+    def SkipExtraData(self):
+        return XBlock.SkipExtraData(self.file)
+
+
 class XBinIO(object):
     __slots__ = ('version', )
 
@@ -495,7 +769,13 @@ class XBinIO(object):
         return
 
     @staticmethod
-    def __decompress_internal__(file, dump=False):
+    def __decompress_internal__(file, dump=False, stream=False):
+        '''
+        Decompress an x*_bin file
+        If stream is True, the file is decoded incrementally while it's being
+        parsed (see _lz4.BlockReader) instead of all at once, so only a small
+        window of the decompressed data is ever held in memory
+        '''
         filepath = os.path.realpath(file.name)
         bin_magic = file.read(5)
 
@@ -506,27 +786,38 @@ class XBinIO(object):
         if LZ4_VERBOSE:
             print_lz4_support_info()
             print("LZ4: Decompressing File: '%s'" % os.path.basename(filepath))
+
+        dump_name = os.path.splitext(filepath)[0]
+
+        if stream:
+            uncompressed_size = struct.unpack('I', file.read(4))[0]
+            dump_file = open("%s.dump" % dump_name, "wb") if dump else None
+            return lz4.BlockReader(file, uncompressed_size,
+                                   dump_file=dump_file)
+
         data = lz4.uncompress(file.read())
         if LZ4_VERBOSE:
             print('LZ4: Done')
         file.close()
         if dump:
-            dump_name = os.path.splitext(filepath)[0]
             dump_file = open("%s.dump" % dump_name, "wb")
             dump_file.write(data)
             dump_file.close()
 
-        return BytesIO(data)
+        return XBlockReader(data)
 
     @staticmethod
-    def __compress_internal__(in_file, out_file, close_files=True):
+    def __compress_internal__(in_file, out_file, close_files=True,
+                              level=None):
+        if level is None:
+            level = LZ4_COMPRESSION_LEVEL
         if LZ4_VERBOSE:
             print_lz4_support_info()
-            print('LZ4: Encoding')
+            print('LZ4: Encoding (level %d)' % level)
         in_file.seek(0, os.SEEK_END)
         uncompressed_size = in_file.tell()
         in_file.seek(0, os.SEEK_SET)
-        compressed_data = lz4.compress(in_file.read())
+        compressed_data = lz4.compress(in_file.read(), level)
         if close_files:
             in_file.close()
         if LZ4_VERBOSE:
@@ -537,11 +828,15 @@ class XBinIO(object):
         if close_files:
             out_file.close()
 
-    def __xbin_loadfile_internal__(self, file, expected_type):
+    def __xbin_loadfile_internal__(self, file, expected_type, arrays=False):
         '''
         Load an x*_bin file
-        file is a handle to the file
+        file is either an XBlockReader (for data that's already in memory)
+         or a handle to the file
         target_type = 'ANIM' or 'MODEL'
+        If arrays is True, the vertex & face sections are decoded into
+         self.vertex_array, self.weight_array & self.face_array (see
+         _arrays.load_geometry) instead of the returned mesh
         '''
 
         from . import xmodel as XModel
@@ -557,70 +852,92 @@ class XBinIO(object):
                 self.active_frame = None
                 self.asset_type = None
 
+        if isinstance(file, (XBlockReader, XBlockFileReader)):
+            reader = file
+        else:
+            reader = XBlockFileReader(file)
+
+        # The array loader needs random access to the whole buffer
+        if arrays and not isinstance(reader, XBlockReader):
+            reader = XBlockReader(reader.file.read())
+        Reader = type(reader)
+
         state = LoadState()
         dummy_mesh = XModel.Mesh("$default")
 
         cosmetic_count = 0
 
-        def InitModel(file):
-            XBlock.LoadInt16Block(file)
+        def InitModel(reader):
+            reader.LoadInt16Block()
             state.asset_type = 'MODEL'
             if expected_type != state.asset_type:
                 raise TypeError("Found %s asset. Expected %s" %
                                 (state.asset_type, expected_type))
 
-        def InitAnim(file):
-            XBlock.LoadInt16Block(file)
+        def InitAnim(reader):
+            reader.LoadInt16Block()
             state.asset_type = 'ANIM'
             if expected_type != state.asset_type:
                 raise TypeError("Found %s asset. Expected %s" %
                                 (state.asset_type, expected_type))
 
-        def LoadVersion(file):
-            self.version = XBlock.LoadInt16Block(file)
+        def LoadVersion(reader):
+            self.version = reader.LoadInt16Block()
 
-        def LoadBoneCount(file):
-            self.bones = [None] * XBlock.LoadInt16Block(file)
+        def LoadBoneCount(reader):
+            self.bones = [None] * reader.LoadInt16Block()
 
-        def LoadCosmeticCount(file):
-            cosmetic_count = XBlock.LoadInt32Block(file)
+        def LoadCosmeticCount(reader):
+            cosmetic_count = reader.LoadInt32Block()
 
-        def LoadSBoneCount(file):
+        def LoadSBoneCount(reader):
             raise NotImplementedError("Siege models are not supported yet")
 
-        def LoadBoneInfo(file):
-            index, parent, name = XBlock.LoadBoneBlock(file)
+        def LoadBoneInfo(reader):
+            index, parent, name = reader.LoadBoneBlock()
             cosmetic = (index >= (len(self.bones) - cosmetic_count))
             self.bones[index] = XModel.Bone(name, parent, cosmetic)
 
-        def LoadBoneIndex(file):
-            index = XBlock.LoadInt16Block(file)
+        def LoadBoneIndex(reader):
+            index = reader.LoadInt16Block()
             bone = self.bones[index]
             bone.matrix = []
             state.active_thing = bone
 
-        def LoadOffset(file):
-            data = XBlock.LoadVec3Block(file)
+        def LoadOffset(reader):
+            data = reader.LoadVec3Block()
             state.active_thing.offset = data
             return data
 
-        def LoadBoneScale(file):
-            data = XBlock.LoadVec3Block(file)
+        def LoadBoneScale(reader):
+            data = reader.LoadVec3Block()
             state.active_thing.scale = data
 
-        def LoadBoneMatrix(file):
-            data = XBlock.LoadShortVec3Block(file)
+        def LoadBoneMatrix(reader):
+            data = reader.LoadShortVec3Block()
             state.active_thing.matrix.append(data)
             return data
 
-        def LoadVertexCount(file):
-            dummy_mesh.verts = [None] * XBlock.LoadUInt16Block(file)
+        def LoadVertexCount(reader):
+            dummy_mesh.verts = [None] * reader.LoadUInt16Block()
+
+        def LoadVertex32Count(reader):
+            dummy_mesh.verts = [None] * reader.LoadInt32Block()
+
+        def LoadVertexArrays(vert_count):
+            from . import _arrays
+            (self.vertex_array, self.weight_array,
+             self.face_array, reader.pos) = _arrays.load_geometry(
+                reader.data, reader.pos, vert_count)
+
+        def LoadVertexCountArrays(reader):
+            LoadVertexArrays(reader.LoadUInt16Block())
 
-        def LoadVertex32Count(file):
-            dummy_mesh.verts = [None] * XBlock.LoadInt32Block(file)
+        def LoadVertex32CountArrays(reader):
+            LoadVertexArrays(reader.LoadInt32Block())
 
-        def LoadVertexIndex(file):
-            index = XBlock.LoadUInt16Block(file)
+        def LoadVertexIndex(reader):
+            index = reader.LoadUInt16Block()
             if state.active_tri is None:
                 vertex = XModel.Vertex()
                 dummy_mesh.verts[index] = vertex
@@ -630,8 +947,8 @@ class XBinIO(object):
                 state.active_tri.indices.append(face_vert)
                 state.active_thing = face_vert
 
-        def LoadVertex32Index(file):
-            index = XBlock.LoadInt32Block(file)
+        def LoadVertex32Index(reader):
+            index = reader.LoadInt32Block()
             if state.active_tri is None:
                 vertex = XModel.Vertex()
                 dummy_mesh.verts[index] = vertex
@@ -641,120 +958,120 @@ class XBinIO(object):
                 state.active_tri.indices.append(face_vert)
                 state.active_thing = face_vert
 
-        def LoadVertexWeightCount(file):
-            # state.active_thing.weights = [None] * XBlock.LoadInt16Block(file)
-            XBlock.LoadInt16Block(file)
+        def LoadVertexWeightCount(reader):
+            # state.active_thing.weights = [None] * reader.LoadInt16Block()
+            reader.LoadInt16Block()
             state.active_thing.weights = []
 
-        def LoadVertexWeight(file):
+        def LoadVertexWeight(reader):
             state.active_thing.weights.append(
-                XBlock.LoadVertexWeightBlock(file))
+                reader.LoadVertexWeightBlock())
 
-        def LoadTriCount(file):
-            XBlock.LoadInt32Block(file)
+        def LoadTriCount(reader):
+            reader.LoadInt32Block()
             dummy_mesh.faces = []
 
-        def LoadTriInfo(file):
-            object_index, material_index = XBlock.LoadTriangleBlock(file)
+        def LoadTriInfo(reader):
+            object_index, material_index = reader.LoadTriangleBlock()
             tri = XModel.Face(object_index, material_index)
             tri.indices = []
             dummy_mesh.faces.append(tri)
             state.active_tri = tri
 
-        def LoadTri16Info(file):
-            object_index, material_index = XBlock.LoadTriangle16Block(file)
+        def LoadTri16Info(reader):
+            object_index, material_index = reader.LoadTriangle16Block()
             tri = XModel.Face(object_index, material_index)
             tri.indices = []
             dummy_mesh.faces.append(tri)
             state.active_tri = tri
 
-        def LoadTriVertNormal(file):
-            state.active_thing.normal = XBlock.LoadShortVec3Block(file)
+        def LoadTriVertNormal(reader):
+            state.active_thing.normal = reader.LoadShortVec3Block()
 
-        def LoadTriVertColor(file):
-            state.active_thing.color = XBlock.LoadColorBlock(file)
+        def LoadTriVertColor(reader):
+            state.active_thing.color = reader.LoadColorBlock()
 
-        def LoadTriVertUV(file):
-            state.active_thing.uv = XBlock.LoadUVBlock(file)
+        def LoadTriVertUV(reader):
+            state.active_thing.uv = reader.LoadUVBlock()
 
-        def LoadObjectCount(file):
-            self.meshes = [None] * XBlock.LoadInt16Block(file)
+        def LoadObjectCount(reader):
+            self.meshes = [None] * reader.LoadInt16Block()
 
-        def LoadObjectInfo(file):
-            index, name = XBlock.LoadObjectBlock(file)
+        def LoadObjectInfo(reader):
+            index, name = reader.LoadObjectBlock()
             self.meshes[index] = XModel.Mesh(name)
 
-        def LoadMaterialCount(file):
-            self.materials = [None] * XBlock.LoadInt16Block(file)
+        def LoadMaterialCount(reader):
+            self.materials = [None] * reader.LoadInt16Block()
 
-        def LoadMaterialInfo(file):
-            index, name, _type, images = XBlock.LoadMaterialBlock(file)
+        def LoadMaterialInfo(reader):
+            index, name, _type, images = reader.LoadMaterialBlock()
             material = XModel.Material(name, _type, images)
             self.materials[index] = material
             state.active_thing = material
 
-        def LoadMaterialTransparency(file):
-            state.active_thing.transparency = XBlock.LoadVec4Block(file)
+        def LoadMaterialTransparency(reader):
+            state.active_thing.transparency = reader.LoadVec4Block()
 
-        def LoadMaterialAmbientColor(file):
-            state.active_thing.color_ambient = XBlock.LoadVec4Block(file)
+        def LoadMaterialAmbientColor(reader):
+            state.active_thing.color_ambient = reader.LoadVec4Block()
 
-        def LoadMaterialIncandescence(file):
-            state.active_thing.incandescence = XBlock.LoadVec4Block(file)
+        def LoadMaterialIncandescence(reader):
+            state.active_thing.incandescence = reader.LoadVec4Block()
 
-        def LoadMaterialCoeffs(file):
-            state.active_thing.coeffs = XBlock.LoadVec2Block(file)
+        def LoadMaterialCoeffs(reader):
+            state.active_thing.coeffs = reader.LoadVec2Block()
 
-        def LoadMaterialGlow(file):
-            state.active_thing.glow = XBlock.LoadVec2Block(file)
+        def LoadMaterialGlow(reader):
+            state.active_thing.glow = reader.LoadVec2Block()
 
-        def LoadMaterialRefractive(file):
-            state.active_thing.refractive = XBlock.LoadVec2Block(file)
+        def LoadMaterialRefractive(reader):
+            state.active_thing.refractive = reader.LoadVec2Block()
 
-        def LoadMaterialSpecularColor(file):
-            state.active_thing.color_specular = XBlock.LoadVec4Block(file)
+        def LoadMaterialSpecularColor(reader):
+            state.active_thing.color_specular = reader.LoadVec4Block()
 
-        def LoadMaterialReflectiveColor(file):
-            state.active_thing.color_reflective = XBlock.LoadVec4Block(file)
+        def LoadMaterialReflectiveColor(reader):
+            state.active_thing.color_reflective = reader.LoadVec4Block()
 
-        def LoadMaterialReflective(file):
-            state.active_thing.reflective = XBlock.LoadVec2Block(file)
+        def LoadMaterialReflective(reader):
+            state.active_thing.reflective = reader.LoadVec2Block()
 
-        def LoadMaterialBlinn(file):
-            state.active_thing.blinn = XBlock.LoadVec2Block(file)
+        def LoadMaterialBlinn(reader):
+            state.active_thing.blinn = reader.LoadVec2Block()
 
-        def LoadMaterialPhong(file):
-            state.active_thing.phong = XBlock.LoadFloatBlock(file)
+        def LoadMaterialPhong(reader):
+            state.active_thing.phong = reader.LoadFloatBlock()
 
         # Animation
-        def LoadPartCount(file):
-            self.parts = [None] * XBlock.LoadInt16Block(file)
+        def LoadPartCount(reader):
+            self.parts = [None] * reader.LoadInt16Block()
 
-        def LoadPartInfo(file):
-            index, name = XBlock.LoadObjectBlock(file)
+        def LoadPartInfo(reader):
+            index, name = reader.LoadObjectBlock()
             self.parts[index] = XAnim.PartInfo(name)
 
-        def LoadPartIndex(file):
-            index = XBlock.LoadInt16Block(file)
+        def LoadPartIndex(reader):
+            index = reader.LoadInt16Block()
             frame_part = XAnim.FramePart(matrix=[])
             state.active_frame.parts[index] = frame_part
             state.active_thing = frame_part
             return index
 
-        def LoadFramerate(file):
-            self.framerate = XBlock.LoadInt16Block(file)
+        def LoadFramerate(reader):
+            self.framerate = reader.LoadInt16Block()
 
-        def LoadFrameCount(file):
-            XBlock.LoadInt32Block(file)
+        def LoadFrameCount(reader):
+            reader.LoadInt32Block()
 
-        def LoadFrameIndex(file):
-            frame = XAnim.Frame(XBlock.LoadInt32Block(file))
+        def LoadFrameIndex(reader):
+            frame = XAnim.Frame(reader.LoadInt32Block())
             frame.parts = [None] * len(self.parts)
             state.active_frame = frame
             self.frames.append(frame)
             return frame.frame
 
-        def LoadNotetracksBegin(file):
+        def LoadNotetracksBegin(reader):
             # Activate a dummy frame, as notetracks sometimes contain part
             # indices.
             # If the active_frame isn't reset, the bone data for
@@ -762,14 +1079,14 @@ class XBinIO(object):
             dummy_frame = XAnim.Frame(-1)
             dummy_frame.parts = [None] * len(self.parts)
             state.active_frame = dummy_frame
-            XBlock.LoadInt16Block(file)
+            reader.LoadInt16Block()
 
-        def LoadNoteFrame(file):
-            frame, string = XBlock.LoadNoteFrameBlock(file)
+        def LoadNoteFrame(reader):
+            frame, string = reader.LoadNoteFrameBlock()
             self.notes.append(XAnim.Note(frame, string))
 
         hashmap = {
-            0xC355: ("Comment block", XBlock.LoadCommentBlock),
+            0xC355: ("Comment block", Reader.LoadCommentBlock),
             0x46C8: ("Model identification block", InitModel),
             0x7AAC: ("Animation block", InitAnim),
             0x24D1: ("Version block", LoadVersion),
@@ -825,9 +1142,9 @@ class XBinIO(object):
             0xC723: ("Frame block", LoadFrameIndex),
 
             0xC7F3: ("Notetrack section block", LoadNotetracksBegin),
-            0x9016: ("NumTracks block", XBlock.LoadInt16Block),
-            0x7A6C: ("NumKeys block", XBlock.LoadInt16Block),
-            0x4643: ("Notetrack block", XBlock.LoadInt16Block),
+            0x9016: ("NumTracks block", Reader.LoadInt16Block),
+            0x7A6C: ("NumKeys block", Reader.LoadInt16Block),
+            0x4643: ("Notetrack block", Reader.LoadInt16Block),
             0x1675: ("Note frame block", LoadNoteFrame),
 
             # Misc (Unimplemented)
@@ -838,15 +1155,18 @@ class XBinIO(object):
             0xA65B: ("NUMIKPITCHLAYERS", None),
             0x1D7D: ("IKPITCHLAYER", None),
             0xA58B: ("ROTATION", None),
-            0x6EEE: ("EXTRA", XBlock.SkipExtraData)
+            0x6EEE: ("EXTRA", Reader.SkipExtraData)
         }
 
+        if arrays:
+            hashmap[0x950D] = ("Number of verts", LoadVertexCountArrays)
+            hashmap[0x2AEC] = ("Number of verts32", LoadVertex32CountArrays)
+
         # Read all blocks
-        data = file.read(2)
-        while data:
-            block_hash = struct.unpack('H', data)[0]
+        block_hash = reader.ReadHash()
+        while block_hash is not None:
             if block_hash in hashmap:
-                offset = file.tell()
+                offset = reader.tell()
                 data = hashmap[block_hash]
                 if data[1] is None:
                     raise NotImplementedError(
@@ -856,14 +1176,14 @@ class XBinIO(object):
                     if LOG_BLOCKS:
                         print("Loading Block: '%s' at 0x%X" %
                               (data[0], offset))
-                    val = data[1](file)
+                    val = data[1](reader)
                     if LOG_BLOCKS:
                         print("        Data: %s" % repr(val))
 
                 # Read the next block hash
-                data = file.read(2)
+                block_hash = reader.ReadHash()
             else:
-                offset = file.tell() - 2
+                offset = reader.tell() - 2
                 raise ValueError("Unknown Block Hash 0x%X at 0x%X" %
                                  (block_hash, offset))
 
@@ -874,8 +1194,12 @@ class XBinIO(object):
     def __xbin_writefile_model_internal__(self, filepath, version=7,
                                           extended_features=True,
                                           header_message=""):
+        from . import xmodel as XModel
         model = self
 
+        if any(isinstance(mesh, XModel.ArrayMesh) for mesh in model.meshes):
+            from . import _arrays
+
         real_file = open(filepath, "wb")
         file = BytesIO()
         if header_message != '':
@@ -906,11 +1230,12 @@ class XBinIO(object):
         vert_offsets = [0]
         for mesh in model.meshes:
             prev_index = len(vert_offsets) - 1
-            vert_offsets.append(vert_offsets[prev_index] + len(mesh.verts))
+            vert_offsets.append(vert_offsets[prev_index] + mesh.vert_count)
 
         vert_count = vert_offsets[len(vert_offsets) - 1]
 
-        if version == 7 and vert_count > 0xFFFF:
+        use_vert32 = version == 7 and vert_count > 0xFFFF
+        if use_vert32:
             WriteVertexCountBlock = XBlock.WriteVertex32Count
             WriteVertexIndexBlock = XBlock.WriteVertex32Index
         else:
@@ -920,6 +1245,10 @@ class XBinIO(object):
         WriteVertexCountBlock(file, vert_count)
         for mesh_index, mesh in enumerate(model.meshes):
             vert_offset = vert_offsets[mesh_index]
+            if isinstance(mesh, XModel.ArrayMesh):
+                file.write(_arrays.pack_vertex_blocks(mesh, vert_offset,
+                                                      use_vert32))
+                continue
             for vert_index, vert in enumerate(mesh.verts):
                 WriteVertexIndexBlock(file, vert_index + vert_offset)
                 XBlock.WriteOffsetBlock(file, vert.offset)
@@ -928,10 +1257,14 @@ class XBinIO(object):
                     XBlock.WriteVertexWeightBlock(file, weight)
 
         # Faces
-        face_count = sum([len(mesh.faces) for mesh in model.meshes])
+        face_count = sum([mesh.face_count for mesh in model.meshes])
         XBlock.WriteMetaInt32Block(file, 0xBE92, face_count)
         for mesh_index, mesh in enumerate(model.meshes):
             vert_offset = vert_offsets[mesh_index]
+            if isinstance(mesh, XModel.ArrayMesh):
+                file.write(_arrays.pack_face_blocks(mesh, vert_offset,
+                                                    use_vert32))
+                continue
             for face in mesh.faces:
                 XBlock.WriteFaceInfoBlock(file, face)
                 for i in range(3):
@@ -6,6 +6,12 @@ from math import sqrt
 
 import re
 
+try:
+    import numpy
+except ImportError:
+    # NumPy is only needed for ArrayMesh & LazyMesh
+    numpy = None
+
 from pv_py_utils.PyCoD.xbin import XBinIO, validate_version
 
 
@@ -402,9 +408,586 @@ class Mesh(object):
 
         return lines_read
 
+    @property
+    def vert_count(self):
+        return len(self.verts)
+
+    @property
+    def face_count(self):
+        return len(self.faces)
+
+    def normalize_weights(self):
+        for vert in self.verts:
+            vert.weights = __normalized__(vert.weights)
+
+    def remap_bones(self, bone_map):
+        for vert in self.verts:
+            vert.weights = [(bone_map[old_index], weight)
+                            for old_index, weight in vert.weights]
+
+    def save_verts(self, file, vert_offset, vert_tok_suffix="",
+                   buffered=False):
+        '''
+        If buffered is True, the verts are formatted in chunks of
+        __WRITE_CHUNK_SIZE__ with a single write() per chunk
+        '''
+        if not buffered:
+            for vert_index, vert in enumerate(self.verts):
+                vert.save(file, vert_index + vert_offset, vert_tok_suffix)
+            return
+
+        templates = __VertTemplates__(vert_tok_suffix)
+        for start in range(0, len(self.verts), __WRITE_CHUNK_SIZE__):
+            chunk = self.verts[start:start + __WRITE_CHUNK_SIZE__]
+            values = []
+            for vert_index, vert in enumerate(chunk, start + vert_offset):
+                values.append(vert_index)
+                values.extend(vert.offset)
+                values.append(len(vert.weights))
+                for weight in vert.weights:
+                    values.extend(weight)
+            fmt = "".join([templates[len(vert.weights)] for vert in chunk])
+            file.write(fmt % tuple(values))
+
+    def save_faces(self, file, version, vert_offset, vert_tok_suffix="",
+                   buffered=False):
+        '''
+        If buffered is True, the faces are formatted in chunks of
+        __WRITE_CHUNK_SIZE__ with a single write() per chunk
+        '''
+        if not buffered:
+            for face in self.faces:
+                face.save(file, version, vert_offset, vert_tok_suffix)
+            return
+
+        tri, tri16 = __face_templates__(version, vert_tok_suffix)
+        for start in range(0, len(self.faces), __WRITE_CHUNK_SIZE__):
+            chunk = self.faces[start:start + __WRITE_CHUNK_SIZE__]
+            values = []
+            for face in chunk:
+                values.append(face.mesh_id)
+                values.append(face.material_id)
+                for index in face.indices:
+                    values.append(index.vertex + vert_offset)
+                    values.extend(__clamp_normal__(index.normal))
+                    if version != 5:
+                        values.extend(index.color)
+                    values.extend(index.uv)
+            if version >= 7:
+                fmt = "".join([tri16 if (face.mesh_id > 255 or
+                                         face.material_id > 255) else tri
+                               for face in chunk])
+            else:
+                fmt = tri * len(chunk)
+            file.write(fmt % tuple(values))
+
+    def to_array_mesh(self):
+        return ArrayMesh.from_mesh(self)
+
+
+class ArrayMesh(object):
+    '''
+    A compact struct-of-arrays alternative to Mesh
+
+    Vertex data:
+        positions          - float64 (vert_count, 3)
+        weight_offsets     - int64 (vert_count + 1) - the weights for vert i
+                             are weight_bones / weight_influences
+                             [weight_offsets[i]:weight_offsets[i + 1]]
+        weight_bones       - int32 (weight_count)
+        weight_influences  - float64 (weight_count)
+
+    Face data:
+        face_mesh_ids      - int32 (face_count)
+        face_material_ids  - int32 (face_count)
+        face_vertices      - int64 (face_count, 3)
+        normals            - float64 (face_count, 3, 3)
+        colors             - float64 (face_count, 3, 4)
+        uvs                - float64 (face_count, 3, 2)
+
+    bone_groups & material_groups are left empty until generate_groups() is
+    called, as they'd take up more memory than the rest of the mesh
+    Requires NumPy
+    '''
+    __slots__ = ('name', 'positions',
+                 'weight_offsets', 'weight_bones', 'weight_influences',
+                 'face_mesh_ids', 'face_material_ids', 'face_vertices',
+                 'normals', 'colors', 'uvs',
+                 'bone_groups', 'material_groups')
+
+    def __init__(self, name, vert_count=0, weight_count=0, face_count=0):
+        if numpy is None:
+            raise ImportError("ArrayMesh requires NumPy")
+
+        self.name = name
+
+        self.positions = numpy.zeros((vert_count, 3))
+        self.weight_offsets = numpy.zeros(vert_count + 1, numpy.int64)
+        self.weight_bones = numpy.zeros(weight_count, numpy.int32)
+        self.weight_influences = numpy.zeros(weight_count)
+
+        self.face_mesh_ids = numpy.zeros(face_count, numpy.int32)
+        self.face_material_ids = numpy.zeros(face_count, numpy.int32)
+        self.face_vertices = numpy.zeros((face_count, 3), numpy.int64)
+        self.normals = numpy.zeros((face_count, 3, 3))
+        self.colors = numpy.ones((face_count, 3, 4))
+        self.uvs = numpy.zeros((face_count, 3, 2))
+
+        self.bone_groups = []
+        self.material_groups = []
+
+    @property
+    def vert_count(self):
+        return len(self.positions)
+
+    @property
+    def face_count(self):
+        return len(self.face_vertices)
+
+    def weight_owners(self):
+        '''
+        Returns the index of the vertex that each weight belongs to
+        '''
+        return numpy.repeat(numpy.arange(self.vert_count),
+                            numpy.diff(self.weight_offsets))
+
+    @staticmethod
+    def from_mesh(mesh):
+        '''
+        Create an ArrayMesh from a Mesh
+        '''
+        verts = mesh.verts
+        faces = mesh.faces
+
+        weight_counts = [len(vert.weights) for vert in verts]
+        weights = [weight for vert in verts for weight in vert.weights]
+
+        result = ArrayMesh(mesh.name)
+        result.positions = numpy.array([vert.offset for vert in verts],
+                                       numpy.float64).reshape(-1, 3)
+        result.weight_offsets = numpy.zeros(len(verts) + 1, numpy.int64)
+        numpy.cumsum(weight_counts, out=result.weight_offsets[1:])
+        if weights:
+            bones, influences = zip(*weights)
+        else:
+            bones, influences = (), ()
+        result.weight_bones = numpy.array(bones, numpy.int32)
+        result.weight_influences = numpy.array(influences, numpy.float64)
+
+        result.face_mesh_ids = numpy.array([face.mesh_id for face in faces],
+                                           numpy.int32)
+        result.face_material_ids = numpy.array(
+            [face.material_id for face in faces], numpy.int32)
+
+        indices = [ind for face in faces for ind in face.indices]
+        face_count = len(faces)
+        result.face_vertices = numpy.array(
+            [ind.vertex for ind in indices],
+            numpy.int64).reshape(face_count, 3)
+        result.normals = numpy.array(
+            [ind.normal for ind in indices],
+            numpy.float64).reshape(face_count, 3, 3)
+        # Version 5 files don't have vertex colors
+        result.colors = numpy.array(
+            [ind.color if ind.color is not None else (1.0, 1.0, 1.0, 1.0)
+             for ind in indices],
+            numpy.float64).reshape(face_count, 3, 4)
+        result.uvs = numpy.array(
+            [ind.uv for ind in indices],
+            numpy.float64).reshape(face_count, 3, 2)
+
+        return result
+
+    @staticmethod
+    def from_arrays(name, vertex_array, weight_array, face_array,
+                    mesh_index=None):
+        '''
+        Create an ArrayMesh from the structured arrays created by
+        Model.LoadFile_Bin(arrays=True)
+        If mesh_index isn't None, only the faces for that mesh are used, and
+        the verts are renumbered in the order they're first used by a face
+        (the same order as Model.__generate_meshes__)
+        '''
+        if mesh_index is None:
+            source_ids = numpy.arange(len(vertex_array))
+            face_vertices = face_array['vertex'].astype(numpy.int64)
+        else:
+            face_array = face_array[face_array['mesh_id'] == mesh_index]
+            source_ids, face_vertices = __renumber_verts__(
+                face_array['vertex'])
+
+        vertex_array = vertex_array[source_ids]
+        counts = vertex_array['weight_count'].astype(numpy.int64)
+        weight_offsets = numpy.zeros(len(vertex_array) + 1, numpy.int64)
+        numpy.cumsum(counts, out=weight_offsets[1:])
+        weight_ids = (numpy.repeat(vertex_array['first_weight'] -
+                                   weight_offsets[:-1], counts) +
+                      numpy.arange(weight_offsets[-1]))
+        weight_array = weight_array[weight_ids]
+
+        result = ArrayMesh(name)
+        result.positions = vertex_array['offset'].astype(numpy.float64)
+        result.weight_offsets = weight_offsets
+        result.weight_bones = weight_array['bone'].astype(numpy.int32)
+        result.weight_influences = weight_array['influence'].astype(
+            numpy.float64)
+
+        result.face_mesh_ids = face_array['mesh_id'].astype(numpy.int32)
+        result.face_material_ids = face_array['material_id'].astype(
+            numpy.int32)
+        result.face_vertices = face_vertices
+        result.normals = face_array['normal'] / 32767.0
+        result.colors = face_array['color'] / 255.0
+        result.uvs = face_array['uv'].astype(numpy.float64)
+        return result
+
+    def submesh(self, mesh_index, name):
+        '''
+        Create a new ArrayMesh from the faces with the given mesh id
+        The verts are renumbered in the order they're first used by a face
+        (the same order as Model.__generate_meshes__)
+        '''
+        faces = self.face_mesh_ids == mesh_index
+        source_ids, face_vertices = __renumber_verts__(
+            self.face_vertices[faces])
+
+        counts = numpy.diff(self.weight_offsets)[source_ids]
+        weight_offsets = numpy.zeros(len(source_ids) + 1, numpy.int64)
+        numpy.cumsum(counts, out=weight_offsets[1:])
+        weight_ids = (numpy.repeat(self.weight_offsets[source_ids] -
+                                   weight_offsets[:-1], counts) +
+                      numpy.arange(weight_offsets[-1]))
+
+        result = ArrayMesh(name)
+        result.positions = self.positions[source_ids]
+        result.weight_offsets = weight_offsets
+        result.weight_bones = self.weight_bones[weight_ids]
+        result.weight_influences = self.weight_influences[weight_ids]
+
+        result.face_mesh_ids = self.face_mesh_ids[faces]
+        result.face_material_ids = self.face_material_ids[faces]
+        result.face_vertices = face_vertices
+        result.normals = self.normals[faces]
+        result.colors = self.colors[faces]
+        result.uvs = self.uvs[faces]
+        return result
+
+    def generate_groups(self, bone_count, material_count):
+        '''
+        Build bone_groups & material_groups the same way that
+        Model.__generate_meshes__ does
+        '''
+        bone_groups = [[] for i in range(bone_count)]
+        owners = self.weight_owners().tolist()
+        for vert_id, bone_id, weight in zip(owners,
+                                            self.weight_bones.tolist(),
+                                            self.weight_influences.tolist()):
+            bone_groups[bone_id].append((vert_id, weight))
+
+        material_groups = [[] for i in range(material_count)]
+        for material_id, vert_ids in zip(self.face_material_ids.tolist(),
+                                         self.face_vertices.tolist()):
+            material_groups[material_id].extend(vert_ids)
+
+        self.bone_groups = [list(set(group)) for group in bone_groups]
+        self.material_groups = [list(set(group))
+                                for group in material_groups]
+
+    def to_mesh(self, colors=True):
+        '''
+        Create a Mesh (with the usual Vertex / Face objects) from this mesh
+        If colors is False, the FaceVertex colors are left as None (like
+        version 5 files, which don't have vertex colors)
+        '''
+        mesh = Mesh(self.name)
+        self.__fill_mesh__(mesh, colors)
+        return mesh
+
+    def __fill_mesh__(self, mesh, colors=True):
+        weight_offsets = self.weight_offsets.tolist()
+        weights = list(zip(self.weight_bones.tolist(),
+                           self.weight_influences.tolist()))
+        mesh.verts = list(map(Vertex, __tuples__(self.positions),
+                              [weights[first:last] for first, last
+                               in zip(weight_offsets, weight_offsets[1:])]))
+
+        face_verts = list(map(FaceVertex,
+                              self.face_vertices.ravel().tolist(),
+                              __tuples__(self.normals.reshape(-1, 3)),
+                              (__tuples__(self.colors.reshape(-1, 4))
+                               if colors else [None] * self.face_vertices.size),
+                              __tuples__(self.uvs.reshape(-1, 2))))
+        faces = list(map(Face, self.face_mesh_ids.tolist(),
+                         self.face_material_ids.tolist()))
+        for index, face in enumerate(faces):
+            face.indices = face_verts[index * 3:index * 3 + 3]
+        mesh.faces = faces
+
+        mesh.bone_groups = self.bone_groups
+        mesh.material_groups = self.material_groups
+
+    def normalize_weights(self):
+        owners = self.weight_owners()
+        lengths = numpy.sqrt(numpy.bincount(owners,
+                                            self.weight_influences ** 2,
+                                            minlength=self.vert_count))
+        self.weight_influences = self.weight_influences / lengths[owners]
+
+    def remap_bones(self, bone_map):
+        self.weight_bones = numpy.asarray(bone_map,
+                                          numpy.int32)[self.weight_bones]
+
+    def save_verts(self, file, vert_offset, vert_tok_suffix="",
+                   buffered=False):
+        '''
+        Write the verts in the same format as Vertex.save()
+        If buffered is True, the values for each chunk of verts are
+        interleaved into a single array & formatted with one % operation
+        '''
+        if buffered:
+            self.__save_verts_buffered__(file, vert_offset, vert_tok_suffix)
+            return
+
+        offsets = self.positions.tolist()
+        weight_offsets = self.weight_offsets.tolist()
+        weights = list(zip(self.weight_bones.tolist(),
+                           self.weight_influences.tolist()))
+        for vert_index, offset in enumerate(offsets):
+            first = weight_offsets[vert_index]
+            last = weight_offsets[vert_index + 1]
+            file.write("VERT%s %d\n" %
+                       (vert_tok_suffix, vert_index + vert_offset))
+            file.write("OFFSET %f %f %f\n" % tuple(offset))
+            file.write("BONES %d\n" % (last - first))
+            for weight in weights[first:last]:
+                file.write("BONE %d %f\n" % weight)
+            file.write("\n")
+
+    def save_faces(self, file, version, vert_offset, vert_tok_suffix="",
+                   buffered=False):
+        '''
+        Write the faces in the same format as Face.save()
+        If buffered is True, each chunk of faces is formatted with one %
+        operation over a (face_count, columns) array
+        '''
+        if buffered:
+            self.__save_faces_buffered__(file, version, vert_offset,
+                                         vert_tok_suffix)
+            return
+
+        clamped = __clamp_normals__(self.normals).tolist()
+        for mesh_id, material_id, vert_ids, normals, colors, uvs in zip(
+                self.face_mesh_ids.tolist(), self.face_material_ids.tolist(),
+                (self.face_vertices + vert_offset).tolist(), clamped,
+                self.colors.tolist(), self.uvs.tolist()):
+            if version >= 7 and (mesh_id > 255 or material_id > 255):
+                token = "TRI16"
+            else:
+                token = "TRI"
+            file.write("%s %d %d %d %d\n" %
+                       (token, mesh_id, material_id, 0, 0))
+            for vert_id, normal, color, uv in zip(vert_ids, normals,
+                                                  colors, uvs):
+                if version == 5:
+                    file.write("VERT %d %f %f %f %f %f\n" %
+                               tuple([vert_id] + normal + uv))
+                else:
+                    file.write("VERT%s %d\n" % (vert_tok_suffix, vert_id))
+                    file.write("NORMAL %f %f %f\n" % tuple(normal))
+                    file.write("COLOR %f %f %f %f\n" % tuple(color))
+                    file.write("UV 1 %f %f\n\n" % tuple(uv))
+            file.write("\n")
+
+    def __save_verts_buffered__(self, file, vert_offset, vert_tok_suffix):
+        templates = __VertTemplates__(vert_tok_suffix)
+        weight_offsets = self.weight_offsets
+        for start in range(0, self.vert_count, __WRITE_CHUNK_SIZE__):
+            end = min(start + __WRITE_CHUNK_SIZE__, self.vert_count)
+            first = weight_offsets[start]
+            last = weight_offsets[end]
+            counts = numpy.diff(weight_offsets[start:end + 1])
+
+            # Each vert takes 5 values (index, offset xyz, weight count)
+            #  followed by 2 values (bone, influence) per weight
+            rows = numpy.arange(end - start)
+            heads = rows * 5 + (weight_offsets[start:end] - first) * 2
+            values = numpy.empty((end - start) * 5 + (last - first) * 2)
+            values[heads] = rows + start + vert_offset
+            values[heads + 1] = self.positions[start:end, 0]
+            values[heads + 2] = self.positions[start:end, 1]
+            values[heads + 3] = self.positions[start:end, 2]
+            values[heads + 4] = counts
+
+            owners = numpy.repeat(rows, counts)
+            weights = (owners + 1) * 5 + numpy.arange(last - first) * 2
+            values[weights] = self.weight_bones[first:last]
+            values[weights + 1] = self.weight_influences[first:last]
+
+            fmt = "".join([templates[count] for count in counts.tolist()])
+            file.write(fmt % tuple(values.tolist()))
+
+    def __save_faces_buffered__(self, file, version, vert_offset,
+                                vert_tok_suffix):
+        tri, tri16 = __face_templates__(version, vert_tok_suffix)
+        for start in range(0, self.face_count, __WRITE_CHUNK_SIZE__):
+            end = min(start + __WRITE_CHUNK_SIZE__, self.face_count)
+            mesh_ids = self.face_mesh_ids[start:end]
+            material_ids = self.face_material_ids[start:end]
+            vertices = self.face_vertices[start:end] + vert_offset
+            normals = __clamp_normals__(self.normals[start:end])
+
+            columns = [mesh_ids, material_ids]
+            for i in range(3):
+                columns.append(vertices[:, i])
+                columns.append(normals[:, i])
+                if version != 5:
+                    columns.append(self.colors[start:end, i])
+                columns.append(self.uvs[start:end, i])
+            values = numpy.column_stack(columns).astype(numpy.float64)
+
+            if version >= 7:
+                wide = (mesh_ids > 255) | (material_ids > 255)
+                fmt = "".join(numpy.where(wide, tri16, tri).tolist())
+            else:
+                fmt = tri * (end - start)
+            file.write(fmt % tuple(values.ravel().tolist()))
+
+
+# The number of verts / faces formatted per write() by the buffered writer
+__WRITE_CHUNK_SIZE__ = 16384
+# The file buffer size used by the buffered writer
+__WRITE_BUFFER_SIZE__ = 1 << 20
+
+
+class __VertTemplates__(dict):
+    '''
+    Maps a vertex's weight count to the % format string used to write it
+    '''
+
+    def __init__(self, vert_tok_suffix):
+        self.head = ("VERT%s %%d\nOFFSET %%f %%f %%f\nBONES %%d\n" %
+                     vert_tok_suffix)
+
+    def __missing__(self, weight_count):
+        template = self.head + "BONE %d %f\n" * weight_count + "\n"
+        self[weight_count] = template
+        return template
+
+
+def __face_templates__(version, vert_tok_suffix):
+    '''
+    Returns the (TRI, TRI16) % format strings for a whole face
+    Every value is formatted with %d or %f, so it's safe to pass them as
+    floats (%d truncates)
+    '''
+    if version == 5:
+        vert = "VERT %d %f %f %f %f %f\n"
+    else:
+        vert = ("VERT%s %%d\nNORMAL %%f %%f %%f\nCOLOR %%f %%f %%f %%f\n"
+                "UV 1 %%f %%f\n\n" % vert_tok_suffix)
+    verts = vert * 3 + "\n"
+    return ("TRI %d %d 0 0\n" + verts, "TRI16 %d %d 0 0\n" + verts)
+
+
+def __tuples__(values):
+    '''
+    Convert a 2D array into a list of tuples (one per row)
+    '''
+    return list(zip(*values.T.tolist()))
+
+
+def __renumber_verts__(face_vertices):
+    '''
+    Renumber the verts used by the given faces in the order they're first
+    used. Returns a tuple of (source_ids, face_vertices) where source_ids
+    maps each new vert id to the original one
+    '''
+    unique, first, inverse = numpy.unique(face_vertices,
+                                          return_index=True,
+                                          return_inverse=True)
+    order = first.argsort(kind='stable')
+    rank = order.argsort(kind='stable')
+    return unique[order], rank[inverse.ravel()].reshape(-1, 3)
+
+
+def __clamp_normals__(normals):
+    '''
+    Vectorized __clamp_normal__ for an array of normals
+    '''
+    normals = numpy.clip(normals, -1.0, 1.0)
+    zero = numpy.abs(normals).sum(axis=-1) == 0
+    normals[zero] = (0.0, 0.0, 1.0)
+    return normals
+
+
+class LazyMesh(Mesh):
+    '''
+    A Mesh that builds its verts, faces, bone_groups & material_groups from
+    the vertex_array / weight_array / face_array of its Model the first time
+    any of them are accessed (see Model.LoadFile_Bin(arrays=True))
+    mesh_index is the index of the mesh in model.meshes, or None if the mesh
+    holds the geometry for the entire (unsplit) model
+    '''
+    __slots__ = ('model', 'mesh_index')
+
+    def __init__(self, name, model, mesh_index=None):
+        self.name = name
+        self.model = model
+        self.mesh_index = mesh_index
+
+    def to_array_mesh(self):
+        '''
+        Create an ArrayMesh straight from the model's arrays (without
+        building the object graph)
+        '''
+        model = self.model
+        if model is None:
+            return ArrayMesh.from_mesh(self)
+
+        return ArrayMesh.from_arrays(self.name, model.vertex_array,
+                                     model.weight_array, model.face_array,
+                                     self.mesh_index)
+
+    def __materialize__(self):
+        model = self.model
+        if model is None:
+            return
+        array_mesh = self.to_array_mesh()
+        if self.mesh_index is not None:
+            array_mesh.generate_groups(len(model.bones),
+                                       len(model.materials))
+        self.model = None
+        array_mesh.__fill_mesh__(self)
+
+    @property
+    def is_materialized(self):
+        return self.model is None
+
+
+def __lazy_mesh_property__(slot):
+    '''
+    Wrap one of Mesh's slots so that it materializes the LazyMesh on access
+    '''
+    def getter(self):
+        self.__materialize__()
+        return slot.__get__(self)
+
+    def setter(self, value):
+        self.__materialize__()
+        slot.__set__(self, value)
+
+    return property(getter, setter)
+
+
+for __slot__ in ('verts', 'faces', 'bone_groups', 'material_groups'):
+    setattr(LazyMesh, __slot__,
+            __lazy_mesh_property__(getattr(Mesh, __slot__)))
+del __slot__
+
 
 class Model(XBinIO, object):
-    __slots__ = ('name', 'bones', 'meshes', 'materials')
+    __slots__ = ('name', 'bones', 'meshes', 'materials',
+                 'vertex_array', 'weight_array', 'face_array')
     supported_versions = [5, 6, 7]
 
     def __init__(self, name='$model'):
@@ -415,6 +998,12 @@ class Model(XBinIO, object):
         self.meshes = []
         self.materials = []
 
+        # Structured arrays containing the raw vertex & face data
+        #  These are only set when loading with LoadFile_Bin(arrays=True)
+        self.vertex_array = None
+        self.weight_array = None
+        self.face_array = None
+
     def __load_header__(self, file):
         lines_read = 0
         state = 0
@@ -679,10 +1268,28 @@ class Model(XBinIO, object):
         Normalize the bone weights for all verts (in all meshes)
         """
         for mesh in self.meshes:
-            for vert in mesh.verts:
-                vert.weights = __normalized__(vert.weights)
+            mesh.normalize_weights()
+
+    def use_array_meshes(self):
+        '''
+        Replace every mesh with an equivalent ArrayMesh, which takes up a
+        fraction of the memory used by the Vertex / Face objects
+        LazyMesh objects are converted straight from the model's arrays
+        (which are released afterwards) without building the object graph
+        '''
+        self.meshes = [mesh if isinstance(mesh, ArrayMesh)
+                       else mesh.to_array_mesh() for mesh in self.meshes]
+        self.vertex_array = None
+        self.weight_array = None
+        self.face_array = None
+
+    def LoadFile_Raw(self, path, split_meshes=True, fast=False,
+                     array_meshes=False):
+        if array_meshes or (fast and numpy is not None):
+            from . import _raw
+            _raw.load_model(self, path, split_meshes, array_meshes)
+            return
 
-    def LoadFile_Raw(self, path, split_meshes=True):
         file = open(path, "r")
         # file automatically keeps track of what line its on across calls
         self.__load_header__(file)
@@ -709,7 +1316,14 @@ class Model(XBinIO, object):
     def WriteFile_Raw(self, path, version=None,
                       header_message="",
                       extended_features=True,
-                      strict=False):
+                      strict=False,
+                      buffered=True):
+        '''
+        Write the model to an XMODEL_EXPORT file
+        If buffered is True (the default), the vert & face sections are
+        formatted in bulk and written in large chunks - the output is
+        identical to the unbuffered (one write per line) writer
+        '''
         # If there is no current version, fallback to the argument
         version = validate_version(self, version)
 
@@ -723,7 +1337,7 @@ class Model(XBinIO, object):
         vert_offsets = [0]
         for mesh in self.meshes:
             prev_index = len(vert_offsets) - 1
-            vert_offsets.append(vert_offsets[prev_index] + len(mesh.verts))
+            vert_offsets.append(vert_offsets[prev_index] + mesh.vert_count)
 
         vert_count = vert_offsets[len(vert_offsets) - 1]
 
@@ -734,7 +1348,10 @@ class Model(XBinIO, object):
             if version < 7:
                 assert vert_count <= 0xFFFF
 
-        file = open(path, "w")
+        if buffered:
+            file = open(path, "w", buffering=__WRITE_BUFFER_SIZE__)
+        else:
+            file = open(path, "w")
         file.write("// Export time: %s\n\n" % strftime("%a %b %d %H:%M:%S %Y"))
 
         if header_message != '':
@@ -774,9 +1391,7 @@ class Model(XBinIO, object):
 
                 # Rebuild the weight tables for all vertices
                 for mesh in self.meshes:
-                    for vert in mesh.verts:
-                        vert.weights = [(bone_map[old_index], weight)
-                                        for old_index, weight in vert.weights]
+                    mesh.remap_bones(bone_map)
 
         # Write the actual bone info
         for bone_index, bone in enumerate(self.bones):
@@ -800,17 +1415,15 @@ class Model(XBinIO, object):
         vert_tok_suffix = "32" if version == 7 and vert_count > 0xFFFF else ""
         file.write("NUMVERTS%s %d\n" % (vert_tok_suffix, vert_count))
         for mesh_index, mesh in enumerate(self.meshes):
-            vert_offset = vert_offsets[mesh_index]
-            for vert_index, vert in enumerate(mesh.verts):
-                vert.save(file, vert_index + vert_offset, vert_tok_suffix)
+            mesh.save_verts(file, vert_offsets[mesh_index], vert_tok_suffix,
+                            buffered)
 
         # Faces
-        face_count = sum([len(mesh.faces) for mesh in self.meshes])
+        face_count = sum([mesh.face_count for mesh in self.meshes])
         file.write("NUMFACES %d\n" % face_count)
         for mesh_index, mesh in enumerate(self.meshes):
-            vert_offset = vert_offsets[mesh_index]
-            for face in mesh.faces:
-                face.save(file, version, vert_offset, vert_tok_suffix)
+            mesh.save_faces(file, version, vert_offsets[mesh_index],
+                            vert_tok_suffix, buffered)
 
         # Meshes
         file.write("NUMOBJECTS %d\n" % len(self.meshes))
@@ -827,24 +1440,41 @@ class Model(XBinIO, object):
         file.close()
 
     @staticmethod
-    def FromFile_Raw(filepath, split_meshes=True):
+    def FromFile_Raw(filepath, split_meshes=True, fast=False,
+                     array_meshes=False):
         '''
         Load from an XMODEL_EXPORT file and return the resulting Model()
+        If fast is True (and NumPy is available), the file is loaded with the
+        bulk parser in _raw.py instead of the line by line parser
+        If array_meshes is True, the meshes are loaded as ArrayMesh objects
+        (always with the bulk parser)
         '''
         model = Model()
-        model.LoadFile_Raw(filepath, split_meshes)
+        model.LoadFile_Raw(filepath, split_meshes, fast, array_meshes)
         return model
 
     def LoadFile_Bin(self, path, split_meshes=True,
-                     is_compressed=True, dump=False):
+                     is_compressed=True, dump=False, stream=False,
+                     arrays=False):
         file = open(path, "rb")
 
         if is_compressed:
-            file = XBinIO.__decompress_internal__(file, dump)
+            file = XBinIO.__decompress_internal__(file, dump, stream)
 
-        default_mesh = self.__xbin_loadfile_internal__(file, 'MODEL')
+        self.vertex_array = None
+        self.weight_array = None
+        self.face_array = None
 
-        if split_meshes:
+        default_mesh = self.__xbin_loadfile_internal__(file, 'MODEL', arrays)
+
+        if arrays:
+            # The object graph is only built if someone touches mesh.verts
+            if split_meshes:
+                self.meshes = [LazyMesh(mesh.name, self, mesh_index)
+                               for mesh_index, mesh in enumerate(self.meshes)]
+            else:
+                self.meshes = [LazyMesh(default_mesh.name, self)]
+        elif split_meshes:
             self.__generate_meshes__(default_mesh)
         else:
             self.meshes = [default_mesh]
@@ -861,10 +1491,18 @@ class Model(XBinIO, object):
 
     @staticmethod
     def FromFile_Bin(filepath, split_meshes=True,
-                     is_compressed=True, dump=False):
+                     is_compressed=True, dump=False, stream=False,
+                     arrays=False):
         '''
         Load from an XMODEL_BIN file and return the resulting Model()
+        If stream is True, the file is decompressed incrementally as it's
+        parsed, which keeps peak memory use down for very large models
+        If arrays is True, the vertex & face data is decoded with NumPy into
+        model.vertex_array, model.weight_array & model.face_array, and the
+        meshes are LazyMesh objects that only build their verts & faces
+        when they're first accessed
         '''
         model = Model()
-        model.LoadFile_Bin(filepath, split_meshes, is_compressed, dump)
+        model.LoadFile_Bin(filepath, split_meshes, is_compressed, dump,
+                           stream, arrays)
         return model
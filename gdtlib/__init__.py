@@ -1 +1,5 @@
-from pv_py_utils.gdtlib.xasset import *
\ No newline at end of file
+from pv_py_utils.gdtlib.xasset import *
+from pv_py_utils.gdtlib.parser import *
+from pv_py_utils.gdtlib.workspace import *
+from pv_py_utils.gdtlib.diff import *
+from pv_py_utils.gdtlib.pack import *
@@ -0,0 +1,213 @@
+"""
+## GDT Diff - prov3ntus
+
+Structural diff & merge of GDTs, e.g. to merge a regenerated GDT into a hand-edited one:
+```
+diff = diff_gdts( 'hand_edited.gdt', 'regenerated.gdt' )
+print( diff.added, diff.removed, diff.changed )
+
+merged, diff = merge_gdts( 'hand_edited.gdt', 'regenerated.gdt' )
+write_gdt( 'hand_edited.gdt', merged.assets.values() )
+```
+Either side can be a GDT path, a `GDT`, a `GDTIndex` or a list of XAssets.
+
+Both sides are indexed by asset name, so diffing / merging GDTs is linear in the number of assets.
+"""
+
+from pv_py_utils import *
+from pv_py_utils.gdtlib.parser import GDTEntry, GDTIndex, iter_entries, load_gdt_index
+
+
+
+class AssetDiff():
+	"""
+	The differences between two versions of an asset
+
+	`name` | The name of the asset
+
+	`old_header`, `new_header` | The ( type, parent ) of each version. They're only different if the asset changed type or parent
+
+	`added` | key -> value of the properties only in the new version
+
+	`removed` | key -> value of the properties only in the old version
+
+	`changed` | key -> ( old value, new value ) of the properties in both versions with different values
+	"""
+	__slots__ = ( 'name', 'old_header', 'new_header', 'added', 'removed', 'changed' )
+
+	def __init__( self, name: str, old_header: tuple[ str, str ], new_header: tuple[ str, str ] ) -> None:
+		self.name = name
+		self.old_header = old_header
+		self.new_header = new_header
+		self.added: dict[ str, str ] = {}
+		self.removed: dict[ str, str ] = {}
+		self.changed: dict[ str, tuple[ str, str ] ] = {}
+
+	def header_changed( self ) -> bool:
+		return self.old_header != self.new_header
+
+	def __bool__( self ):
+		return bool( self.added or self.removed or self.changed or self.header_changed() )
+
+	def __repr__( self ):
+		return f'AssetDiff({self.name}, +{len( self.added )} -{len( self.removed )} ~{len( self.changed )} properties{", header changed" if self.header_changed() else ""})'
+
+
+
+class GDTDiff():
+	"""
+	The differences between two GDTs
+
+	`added` | Names of the assets only in the new GDT (in the new GDT's order)
+
+	`removed` | Names of the assets only in the old GDT (in the old GDT's order)
+
+	`changed` | name -> `AssetDiff` of the assets in both GDTs that are different (in the old GDT's order)
+	"""
+
+	def __init__( self ) -> None:
+		self.added: list[ str ] = []
+		self.removed: list[ str ] = []
+		self.changed: dict[ str, AssetDiff ] = {}
+
+	def __bool__( self ):
+		return bool( self.added or self.removed or self.changed )
+
+	def __repr__( self ):
+		return f'GDTDiff(+{len( self.added )} -{len( self.removed )} ~{len( self.changed )} assets)'
+
+
+
+def as_index( source ) -> GDTIndex:
+	"""
+	Returns a `GDTIndex` for a GDT path, a `GDT`, a `GDTIndex` or an iterable of XAssets
+	"""
+	if isinstance( source, GDTIndex ):
+		return source
+	if type( source ) is str:
+		return load_gdt_index( source )
+	if isinstance( getattr( source, 'index', undefined ), GDTIndex ):
+		return source.index
+
+	raw = '\n'.join( asset.GenerateGDTAsset() for asset in source )
+	return GDTIndex( iter_entries( [ '{\n' ] + raw.splitlines( keepends=true ) + [ '\n}\n' ], keep_lines=true ) )
+
+def _properties( index: GDTIndex, entry: GDTEntry, resolve: bool ) -> dict[ str, str ]:
+	# Typed assets don't inherit anything, so only child assets need resolving
+	return index.resolve( entry.name ) if resolve and entry.is_child() else entry.properties
+
+def diff_asset( name: str, old: dict[ str, str ], new: dict[ str, str ], old_header: tuple[ str, str ] = undefined, new_header: tuple[ str, str ] = undefined ) -> AssetDiff | None:
+	"""
+	Compares the properties ( & headers ) of two versions of an asset
+
+	Returns an `AssetDiff`, or `None` if they're the same
+	"""
+	if old == new and old_header == new_header:
+		return undefined
+
+	diff = AssetDiff( name, old_header, new_header )
+	for key, value in new.items():
+		if key not in old:
+			diff.added[ key ] = value
+		elif old[ key ] != value:
+			diff.changed[ key ] = ( old[ key ], value )
+	for key, value in old.items():
+		if key not in new:
+			diff.removed[ key ] = value
+
+	return diff if diff else undefined
+
+def _compare( old: GDTIndex, new: GDTIndex, resolve: bool, merged: GDTIndex = undefined, prefer: str = 'new', remove_assets: bool = false, remove_properties: bool = false ) -> GDTDiff:
+	"""
+	Diffs `old` against `new` in a single pass over each, optionally building the merged GDT into `merged` as it goes
+	"""
+	result = GDTDiff()
+
+	for name, entry in old.assets.items():
+		new_entry = new.assets.get( name )
+		if new_entry is undefined:
+			result.removed.append( name )
+			if merged is not undefined and not remove_assets:
+				merged.add( entry.copy() )
+			continue
+
+		diff = diff_asset( name, _properties( old, entry, resolve ), _properties( new, new_entry, resolve ), ( entry.type, entry.parent ), ( new_entry.type, new_entry.parent ) )
+		if diff is not undefined:
+			result.changed[ name ] = diff
+
+		if merged is undefined:
+			continue
+
+		# Merge only the asset's own properties, so inherited ones aren't written into (& stop being inherited by) child assets
+		if resolve and ( entry.is_child() or new_entry.is_child() ):
+			diff = diff_asset( name, entry.properties, new_entry.properties, ( entry.type, entry.parent ), ( new_entry.type, new_entry.parent ) )
+
+		if diff is undefined:
+			merged.add( entry.copy() )
+		elif diff.header_changed():
+			# The asset changed type / parent, so the properties of one version don't apply to the other
+			merged.add( new_entry.copy() if prefer == 'new' else entry.copy() )
+		else:
+			merged_entry = entry.copy()
+			updates = dict( diff.added )
+			if prefer == 'new':
+				updates.update( { key: values[ 1 ] for key, values in diff.changed.items() } )
+			merged_entry.set_properties( updates )
+			if remove_properties:
+				merged_entry.remove_properties( diff.removed )
+			merged.add( merged_entry )
+
+	for name, new_entry in new.assets.items():
+		if name not in old.assets:
+			result.added.append( name )
+			if merged is not undefined:
+				merged.add( new_entry.copy() )
+
+	return result
+
+def diff_gdts( old, new, resolve: bool = true ) -> GDTDiff:
+	"""
+	Returns a `GDTDiff` of the assets that were added, removed & changed between two GDTs
+
+	### @params
+	`old`, `new` | A GDT path, a `GDT`, a `GDTIndex` or an iterable of XAssets
+
+	`resolve` | Compare the properties that child assets inherit from their parents too, rather than only their own properties
+	"""
+	return _compare( as_index( old ), as_index( new ), resolve )
+
+def merge_gdts( old, new, prefer: str = 'new', remove_assets: bool = false, remove_properties: bool = false, resolve: bool = true ) -> tuple[ GDTIndex, GDTDiff ]:
+	"""
+	Merges `new` into `old` & returns a tuple of the ( merged `GDTIndex`, `GDTDiff` ), building both in a single pass
+
+	Neither GDT is modified. The merged GDT keeps the order (& formatting) of `old`, followed by the assets only in `new`
+
+	### @params
+	`old`, `new` | A GDT path, a `GDT`, a `GDTIndex` or an iterable of XAssets
+
+	`prefer` | Which value to keep when a property is in both GDTs with different values, 'new' or 'old'.
+	Assets that changed type / parent are kept as they are in the preferred GDT (the conflict is still reported in the diff)
+
+	`remove_assets` | Drop assets that aren't in `new` (by default they're kept, e.g. hand-made assets)
+
+	`remove_properties` | Drop properties that aren't in `new` (by default they're kept, e.g. hand-added properties)
+
+	`resolve` | Report the properties that child assets inherit from their parents too (see `diff_gdts()`). 
+	The merge itself always works on each asset's own properties
+	"""
+	if prefer not in ( 'new', 'old' ):
+		raise ValueError( f"Invalid merge preference: {prefer!r} - must be 'new' or 'old'" )
+
+	merged = GDTIndex()
+	diff = _compare( as_index( old ), as_index( new ), resolve, merged, prefer, remove_assets, remove_properties )
+	return merged, diff
+
+
+
+__all__ = [
+	'AssetDiff',
+	'GDTDiff',
+	'diff_asset',
+	'diff_gdts',
+	'merge_gdts'
+	]
@@ -0,0 +1,192 @@
+"""
+## Material Pack Builder - prov3ntus
+
+Turns a folder of textures into XImages & XMaterials in a GDT in one go:
+```
+pack = build_material_pack( 'C:/.../Black Ops III/texture_assets/pv_bricks', 'C:/.../source_data/pv_bricks.gdt' )
+print( pack.summary() )
+```
+Textures are grouped into materials by their base name, e.g. "bricks_01_c.png", "bricks_01_n.png" &
+"bricks_01_g.png" become the images of the material "bricks_01" (see `XImage.Semantics` for the suffixes).
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from timeit import default_timer as timer
+from typing import Callable
+from pv_py_utils import *
+from pv_py_utils.gdtlib.xasset import GDT, XImage, XMaterial
+
+# Image file types that are picked up by build_material_pack()
+IMAGE_EXTENSIONS = ( '.png', '.tga', '.tif', '.tiff', '.dds', '.jpg', '.jpeg', '.bmp' )
+
+# Semantic suffixes (e.g. '_c') that textures are grouped by
+SEMANTIC_SUFFIXES = tuple( _suffix for _suffix in XImage.Semantics if _suffix != 'default' )
+
+
+
+class MaterialPack():
+	"""
+	The result of `build_material_pack()`
+
+	`images` | The XImages that were built, in file name order
+
+	`materials` | The XMaterials that were built, in name order
+
+	`skipped` | Paths of the image files that weren't used (no semantic suffix, or unreadable)
+
+	`added` | The number of assets added to the GDT (assets that already exist in it are skipped)
+
+	`timings` | Stage -> seconds taken ( 'scan', 'probe', 'build', 'write' )
+	"""
+
+	def __init__( self ) -> None:
+		self.images: list[ XImage ] = []
+		self.materials: list[ XMaterial ] = []
+		self.skipped: list[ str ] = []
+		self.added = 0
+		self.timings: dict[ str, float ] = {}
+
+	def summary( self ) -> str:
+		"""Returns a readable summary of the pack & how long each stage took"""
+		_stages = ', '.join( f'{_stage} {_seconds:.3f}s' for _stage, _seconds in self.timings.items() )
+		return ( f'{len( self.materials )} materials & {len( self.images )} images built, {self.added} assets added to the GDT, '
+			f'{len( self.skipped )} files skipped - {sum( self.timings.values() ):.3f}s ({_stages})' )
+
+	def __repr__( self ):
+		return f'MaterialPack({len( self.materials )} materials, {len( self.images )} images, {self.added} added)'
+
+
+
+def scan_textures( texture_dir: str, recursive: bool = false ) -> tuple[ dict[ str, list[ str ] ], list[ str ] ]:
+	"""
+	Scans a folder for textures & groups them by base name
+
+	Returns a tuple of ( base name -> sorted list of image paths, list of the image paths without a semantic suffix )
+	"""
+	groups: dict[ str, list[ str ] ] = {}
+	ungrouped: list[ str ] = []
+	dirs = [ texture_dir ]
+
+	while dirs:
+		with os.scandir( dirs.pop() ) as entries:
+			for entry in entries:
+				if entry.is_dir():
+					if recursive:
+						dirs.append( entry.path )
+					continue
+
+				_name, _ext = os.path.splitext( entry.name )
+				if _ext.lower() not in IMAGE_EXTENSIONS:
+					continue
+
+				_suffix = '_' + _name.split( '_' )[ -1 ]
+				if '_' not in _name or _suffix not in SEMANTIC_SUFFIXES:
+					ungrouped.append( entry.path )
+					continue
+
+				groups.setdefault( _name.removesuffix( _suffix ), [] ).append( entry.path )
+
+	for _paths in groups.values():
+		_paths.sort()
+	ungrouped.sort()
+	return groups, ungrouped
+
+def _probe_texture( _path: str ) -> None:
+	# Everything XImage & XMaterial need from the file, so they only hit the cache
+	if image.probe( _path ).has_alpha:
+		image.alpha_usage( _path )
+
+def build_material_pack(
+		texture_dir: str,
+		gdt: GDT | str,
+		recursive: bool = false,
+		image_prefix: str = '',
+		material_prefix: str = '',
+		workers: int = undefined,
+		save: bool = true,
+		progress: bool = true,
+		callback: Callable[ [ str, int, int ], None ] = undefined
+	) -> MaterialPack:
+	"""
+	Builds an XImage for every texture in a folder & an XMaterial for each group of textures, then adds them all to a GDT
+
+	### @params
+	`texture_dir` | The folder of textures
+
+	`gdt` | The GDT (or path to the GDT) to add the assets to
+
+	`recursive` | Include textures in subfolders too
+
+	`image_prefix`, `material_prefix` | Prepended to the name of each XImage (the file name) / XMaterial (the base name)
+
+	`workers` | The number of threads used to probe the images
+
+	`save` | Save the GDT once all the assets are added
+
+	`progress` | Show a progress bar while probing the images & print the summary at the end
+
+	`callback` | Called with ( stage, done, total ) as images are probed & assets are built
+	"""
+	pack = MaterialPack()
+	_start = timer()
+
+	groups, pack.skipped = scan_textures( texture_dir, recursive )
+	paths = [ _path for _base in sorted( groups ) for _path in groups[ _base ] ]
+	pack.timings[ 'scan' ] = timer() - _start
+
+	# Probe every image once (on the thread pool), so building the assets below doesn't touch the files again
+	_start = timer()
+	unreadable = set()
+	with ThreadPoolExecutor( max_workers=workers ) as pool:
+		futures = { pool.submit( _probe_texture, _path ): _path for _path in paths }
+		for _done, future in enumerate( as_completed( futures ), 1 ):
+			try:
+				future.result()
+			except ( OSError, ValueError ) as e:
+				log.warning( f'build_material_pack(): Skipping unreadable image {futures[ future ]} - {e}' )
+				unreadable.add( futures[ future ] )
+
+			if progress:
+				console.progress_bar( _done, len( paths ), prefix='Probing images ', length=50, max_update_freq=10 )
+			if callback is not undefined:
+				callback( 'probe', _done, len( paths ) )
+	pack.timings[ 'probe' ] = timer() - _start
+
+	_start = timer()
+	for _done, _base in enumerate( sorted( groups ), 1 ):
+		_ximages = []
+		for _path in groups[ _base ]:
+			if _path in unreadable:
+				pack.skipped.append( _path )
+				continue
+			_ximages.append( XImage( image_prefix + pathlib.get_file_name( _path ), _path ) )
+
+		if _ximages:
+			pack.images += _ximages
+			pack.materials.append( XMaterial( material_prefix + _base, _ximages ) )
+
+		if callback is not undefined:
+			callback( 'build', _done, len( groups ) )
+	pack.timings[ 'build' ] = timer() - _start
+
+	# Every asset goes into the GDT in one batch & is written with a single save
+	_start = timer()
+	if type( gdt ) is str:
+		gdt = GDT( gdt )
+	pack.added = gdt.NewAssets( pack.images + pack.materials )
+	if save:
+		gdt.save_gdt()
+	pack.timings[ 'write' ] = timer() - _start
+
+	if progress:
+		console.log( pack.summary() )
+	return pack
+
+
+
+__all__ = [
+	'MaterialPack',
+	'scan_textures',
+	'build_material_pack'
+	]
@@ -0,0 +1,675 @@
+"""
+## GDT Parser - prov3ntus
+
+Single pass GDT parser. Builds an in-memory index of every asset in a GDT, so lookups don't need to rescan the file.
+
+A GDT looks like this:
+```
+{
+	"i_example_c" ( "image.gdf" )
+	{
+		"baseImage" "texture_assets\\example_c.png"
+	}
+	"i_example_n" [ "i_example_c" ]
+	{
+		"baseImage" "texture_assets\\example_n.png"
+	}
+}
+```
+Assets with `( "<type>.gdf" )` are typed assets, assets with `[ "<parent>" ]` are child assets, which inherit the type & any non-overridden properties of their parent.
+"""
+
+import gc, hashlib, marshal, os, tempfile
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+from pv_py_utils.stdlib import true, false, undefined
+
+# Bump this whenever GDTEntry / GDTIndex change, so old index caches are ignored
+INDEX_CACHE_VERSION = 1
+
+# Buffer size used when streaming GDTs from / to disk (see iter_assets() & write_gdt())
+STREAM_BUFFER_SIZE = 1 << 20
+
+
+
+class GDTEntry():
+	"""
+	A single parsed asset in a GDT
+
+	`name` | The name of the asset
+
+	`type` | The asset's .gdf type, or `None` if the asset is a child (see `GDTIndex.get_type()`)
+
+	`parent` | The name of the parent asset, or `None` if the asset isn't a child
+
+	`start`, `end` | The line span of the asset in the GDT (the header line & the closing '}' line, inclusive)
+
+	`properties` | A dict of the asset's own key/value pairs (excluding inherited ones)
+
+	`lines` | The raw lines of the asset (header to closing '}'), or `None` if they should be generated from `properties`
+	"""
+	__slots__ = ( 'name', 'type', 'parent', 'start', 'end', 'properties', 'lines' )
+
+	def __init__( self, name: str, asset_type: str = undefined, parent: str = undefined, start: int = 0, end: int = 0, properties: dict[ str, str ] = None, lines: list[ str ] = None ) -> None:
+		self.name = name
+		self.type = asset_type
+		self.parent = parent
+		self.start = start
+		self.end = end
+		self.properties = properties if properties is not None else {}
+		self.lines = lines
+
+	def is_child( self ) -> bool:
+		return self.parent is not undefined
+
+	def header( self ) -> str:
+		"""Returns the header line of the asset, e.g. `\t"name" ( "image.gdf" )\n`"""
+		if self.is_child():
+			return f'\t"{self.name}" [ "{self.parent}" ]\n'
+		return f'\t"{self.name}" ( "{self.type}" )\n'
+
+	def set_parent( self, parent: str | None, asset_type: str = undefined ) -> None:
+		"""
+		Makes the asset a child of `parent` (or a typed asset of `asset_type` if `parent` is `None`) & updates its header line
+		"""
+		self.parent = parent
+		self.type = asset_type if parent is undefined else undefined
+		if self.lines:
+			self.lines[ 0 ] = self.header()
+
+	def remove_properties( self, keys: Iterable[ str ] ) -> None:
+		"""Removes properties (& their lines) from the asset"""
+		keys = { key for key in keys if key in self.properties }
+		if not keys:
+			return
+
+		for key in keys:
+			del self.properties[ key ]
+
+		if self.lines:
+			# The header, '{' & '}' lines never parse as properties
+			self.lines = [ line for line in self.lines if ( parse_property( line.strip() ) or ( undefined, ) )[ 0 ] not in keys ]
+
+	def set_properties( self, properties: dict[ str, str ] ) -> None:
+		"""Sets properties of the asset, updating their lines in place (new properties are added before the closing '}')"""
+		if not properties:
+			return
+
+		self.properties.update( properties )
+		if not self.lines:
+			return
+
+		missing = dict( properties )
+		for idx, line in enumerate( self.lines ):
+			kvp = parse_property( line.strip() )
+			if kvp is not undefined and kvp[ 0 ] in properties:
+				indent = line[ : len( line ) - len( line.lstrip() ) ]
+				self.lines[ idx ] = f'{indent}"{kvp[ 0 ]}" "{properties[ kvp[ 0 ] ]}"\n'
+				missing.pop( kvp[ 0 ], undefined )
+
+		if missing:
+			close = len( self.lines ) - 1
+			while close > 0 and self.lines[ close ].strip() != '}':
+				close -= 1
+			self.lines[ close:close ] = [ f'\t\t"{key}" "{value}"\n' for key, value in missing.items() ]
+
+	def copy( self ) -> 'GDTEntry':
+		"""Returns a copy of the entry that can be edited without affecting this one"""
+		return GDTEntry( self.name, self.type, self.parent, self.start, self.end, dict( self.properties ), list( self.lines ) if self.lines is not undefined else undefined )
+
+	def size( self ) -> int:
+		"""Returns the size of the asset in the GDT, in bytes"""
+		return sum( len( line ) for line in self.to_lines() )
+
+	def to_lines( self ) -> list[ str ]:
+		"""Returns the lines of the asset in GDT format (each ending with a new line)"""
+		if self.lines is undefined:
+			return [ self.header(), '\t{\n' ] + [ f'\t\t"{key}" "{value}"\n' for key, value in self.properties.items() ] + [ '\t}\n' ]
+
+		if self.lines and not self.lines[ -1 ].endswith( '\n' ):
+			self.lines[ -1 ] += '\n'
+		return self.lines
+
+	def __repr__( self ):
+		if self.is_child():
+			return f'GDTEntry({self.name} [ {self.parent} ], lines {self.start}-{self.end})'
+		return f'GDTEntry({self.name} ( {self.type} ), lines {self.start}-{self.end})'
+
+
+
+def parse_header( line: str ) -> tuple[ str, str, str ] | None:
+	"""
+	Parses an asset header line, e.g. `"name" ( "image.gdf" )` or `"name" [ "parent" ]`
+
+	Returns a tuple of ( name, type, parent ) where one of type / parent is `None`, or `None` if the line isn't a header
+	"""
+	parts = line.split( '"' )
+	# [ '\t', 'name', ' ( ', 'image.gdf', ' )\n' ]
+	if len( parts ) != 5:
+		return undefined
+
+	bracket = parts[ 2 ].strip()
+	if bracket == '(':
+		return parts[ 1 ], parts[ 3 ], undefined
+	if bracket == '[':
+		return parts[ 1 ], undefined, parts[ 3 ]
+	return undefined
+
+def parse_property( line: str ) -> tuple[ str, str ] | None:
+	"""
+	Parses a property line, e.g. `"key" "value"`
+
+	Returns a tuple of ( key, value ), or `None` if the line isn't a property
+	"""
+	parts = line.split( '"' )
+	# [ '\t\t', 'key', ' ', 'value', '\n' ]
+	if len( parts ) == 5 and parts[ 2 ].strip() == '':
+		return parts[ 1 ], parts[ 3 ]
+	# Unquoted / empty values, e.g. `"key" ""` that got mangled to `"key"`
+	if len( parts ) == 3:
+		return parts[ 1 ], ''
+	return undefined
+
+def iter_entries( lines: Iterable[ str ], keep_lines: bool = false ) -> Iterator[ GDTEntry ]:
+	"""
+	Yields a `GDTEntry` for each asset in `lines` (any iterable of lines, e.g. an open file) in a single pass
+
+	`keep_lines` | Store the raw lines of each asset in `GDTEntry.lines`, so the GDT can be written back out as it was
+	"""
+	entry: GDTEntry = undefined
+	depth = 0
+
+	for idx, line in enumerate( lines ):
+		stripped = line.strip()
+		if not stripped:
+			continue
+
+		if keep_lines and entry is not undefined:
+			entry.lines.append( line )
+
+		if stripped == '{':
+			depth += 1
+			continue
+
+		if stripped == '}':
+			depth -= 1
+			if entry is not undefined and depth == 1:
+				entry.end = idx
+				yield entry
+				entry = undefined
+			continue
+
+		if depth == 1:
+			header = parse_header( stripped )
+			if header is not undefined:
+				entry = GDTEntry( header[ 0 ], header[ 1 ], header[ 2 ], idx, idx, lines=[ line ] if keep_lines else undefined )
+		elif depth == 2 and entry is not undefined:
+			kvp = parse_property( stripped )
+			if kvp is not undefined:
+				entry.properties[ kvp[ 0 ] ] = kvp[ 1 ]
+
+def iter_headers( lines: Iterable[ str ] ) -> Iterator[ GDTEntry ]:
+	"""
+	Yields a `GDTEntry` (without properties) for each asset in `lines`, only parsing the asset header lines
+	"""
+	depth = 0
+
+	for idx, line in enumerate( lines ):
+		stripped = line.strip()
+		if stripped == '{':
+			depth += 1
+		elif stripped == '}':
+			depth -= 1
+		elif depth == 1 and stripped:
+			header = parse_header( stripped )
+			if header is not undefined:
+				yield GDTEntry( header[ 0 ], header[ 1 ], header[ 2 ], idx, idx )
+
+def iter_assets( gdt_path: str, types: str | Iterable[ str ] = undefined, keep_lines: bool = false, buffering: int = STREAM_BUFFER_SIZE ) -> Iterator[ GDTEntry ]:
+	"""
+	Streams the assets of a GDT from disk, yielding a `GDTEntry` for each one, without loading the whole GDT into memory
+
+	### @params
+	`gdt_path` | Path to the GDT
+
+	`types` | Only yield assets of these .gdf types, e.g. `'image'` or `( 'material.gdf', 'image.gdf' )`. 
+	Child assets are matched by the type of their parents
+
+	`keep_lines` | Store the raw lines of each asset in `GDTEntry.lines` (e.g. to write them back out with `write_gdt()`)
+
+	`buffering` | Size of the read buffer, in bytes
+
+	Only the names & types of the assets read so far are kept to match child assets. If a child asset is found before 
+	its parent, the asset headers of the GDT are scanned once to look up its type
+	"""
+	if types is undefined:
+		with open( gdt_path, buffering=buffering ) as f:
+			yield from iter_entries( f, keep_lines )
+		return
+
+	if type( types ) is str:
+		types = ( types, )
+	types = { _type.removesuffix( '.gdf' ) + '.gdf' for _type in types }
+
+	known: dict[ str, str | None ] = {}
+	headers: GDTIndex = undefined
+
+	with open( gdt_path, buffering=buffering ) as f:
+		for entry in iter_entries( f, keep_lines ):
+			if not entry.is_child():
+				asset_type = entry.type
+			elif entry.parent in known:
+				asset_type = known[ entry.parent ]
+			else:
+				if headers is undefined:
+					with open( gdt_path, buffering=buffering ) as header_file:
+						headers = GDTIndex( iter_headers( header_file ) )
+				asset_type = headers.get_type( entry.name )
+
+			known[ entry.name ] = asset_type
+			if asset_type in types:
+				yield entry
+
+def write_gdt( gdt_path: str, entries: Iterable[ GDTEntry ], buffering: int = STREAM_BUFFER_SIZE ) -> int:
+	"""
+	Streams `entries` (e.g. from `iter_assets()`) to a new GDT at `gdt_path` & returns the number of assets written
+
+	The GDT is written to a temporary file first & then moved into place, so `gdt_path` can be the GDT the entries are read from
+	"""
+	handle, temp_path = tempfile.mkstemp( suffix='.tmp', dir=os.path.dirname( os.path.abspath( gdt_path ) ) )
+	count = 0
+
+	try:
+		with open( handle, 'w', buffering=buffering ) as f:
+			f.write( '{\n' )
+			for entry in entries:
+				f.writelines( entry.to_lines() )
+				count += 1
+			f.write( '}\n' )
+		# mkstemp() files are only readable by the owner, so keep the GDT's permissions
+		if os.path.exists( gdt_path ):
+			os.chmod( temp_path, os.stat( gdt_path ).st_mode & 0o7777 )
+		os.replace( temp_path, gdt_path )
+	except BaseException:
+		if os.path.exists( temp_path ):
+			os.remove( temp_path )
+		raise
+
+	return count
+
+
+
+class GDTIndex():
+	"""
+	Index of all the assets in a GDT
+
+	`assets` | name -> `GDTEntry`, in file order
+
+	`children` | parent name -> list of the names of its direct children
+
+	Resolved (inherited) properties & types are cached per asset. The cache is invalidated along the affected subtree 
+	whenever an asset is added, removed or re-parented. If you edit `GDTEntry.properties` directly, call `invalidate()`
+	"""
+
+	def __init__( self, entries: Iterable[ GDTEntry ] = () ) -> None:
+		self.assets: dict[ str, GDTEntry ] = {}
+		self.children: dict[ str, list[ str ] ] = {}
+		self.__resolved: dict[ str, dict[ str, str ] ] = {}
+		self.__types: dict[ str, str | None ] = {}
+
+		for entry in entries:
+			self.add( entry )
+
+	def __len__( self ):
+		return len( self.assets )
+
+	def to_rows( self ) -> list[ tuple ]:
+		"""Returns the index as a list of plain tuples (one per entry, in `GDTEntry.__init__()` argument order)"""
+		return [ ( e.name, e.type, e.parent, e.start, e.end, e.properties, e.lines ) for e in self.assets.values() ]
+
+	@staticmethod
+	def from_rows( rows: Iterable[ tuple ] ) -> 'GDTIndex':
+		"""Builds an index from the output of `to_rows()`"""
+		index = GDTIndex()
+		assets = index.assets
+		children = index.children
+
+		for row in rows:
+			entry = GDTEntry( *row )
+			assets[ entry.name ] = entry
+			if entry.parent is not undefined:
+				children.setdefault( entry.parent, [] ).append( entry.name )
+
+		return index
+
+	def __contains__( self, name: str ):
+		return name in self.assets
+
+	def get( self, name: str ) -> GDTEntry | None:
+		return self.assets.get( name )
+
+	def add( self, entry: GDTEntry ) -> None:
+		"""Adds an entry to the index (replacing any existing asset with the same name)"""
+		if entry.name in self.assets:
+			self.remove( entry.name )
+
+		self.assets[ entry.name ] = entry
+		if entry.is_child():
+			self.children.setdefault( entry.parent, [] ).append( entry.name )
+
+		# Existing children may already reference this asset by name
+		self.invalidate( entry.name )
+
+	def remove( self, name: str ) -> GDTEntry | None:
+		"""
+		Removes an asset from the index & returns its entry
+
+		Children of the asset are left in the index (they still reference it by name, like they would in APE)
+		"""
+		self.invalidate( name )
+		entry = self.assets.pop( name, undefined )
+		if entry is not undefined and entry.is_child():
+			self.__unlink_child( entry )
+		return entry
+
+	def __unlink_child( self, entry: GDTEntry ) -> None:
+		siblings = self.children.get( entry.parent, [] )
+		if entry.name in siblings:
+			siblings.remove( entry.name )
+		if not siblings:
+			self.children.pop( entry.parent, undefined )
+
+	def set_parent( self, name: str, parent: str | None, asset_type: str = undefined ) -> None:
+		"""
+		Re-parents an asset in the index (see `GDTEntry.set_parent()`), keeping the children map up to date
+		"""
+		self.invalidate( name )
+		entry = self.assets[ name ]
+		if entry.is_child():
+			self.__unlink_child( entry )
+
+		# Update the entry in place, so the asset keeps its position in the GDT
+		entry.set_parent( parent, asset_type )
+		if entry.is_child():
+			self.children.setdefault( entry.parent, [] ).append( name )
+
+	def parents( self, name: str ) -> list[ str ]:
+		"""Returns the chain of parents of an asset, nearest first (stops on missing parents & cycles)"""
+		chain = []
+		seen = { name }
+		entry = self.assets.get( name )
+
+		while entry is not undefined and entry.is_child() and entry.parent not in seen:
+			chain.append( entry.parent )
+			seen.add( entry.parent )
+			entry = self.assets.get( entry.parent )
+
+		return chain
+
+	def descendants( self, name: str ) -> list[ str ]:
+		"""Returns the names of all of the children of an asset, recursively"""
+		out = []
+		seen = { name }
+		stack = [ name ]
+
+		while stack:
+			for child in self.children.get( stack.pop(), () ):
+				if child in seen:
+					continue
+				seen.add( child )
+				out.append( child )
+				stack.append( child )
+
+		return out
+
+	def invalidate( self, name: str ) -> None:
+		"""Drops the cached resolved properties (& type) of an asset & all of its descendants"""
+		if not self.__resolved and not self.__types:
+			return
+
+		for asset in [ name ] + self.descendants( name ):
+			self.__resolved.pop( asset, undefined )
+			self.__types.pop( asset, undefined )
+
+	def __resolve( self, name: str ) -> dict[ str, str ]:
+		# Walk up the parent chain until we hit an asset that's already been resolved
+		chain: list[ GDTEntry ] = []
+		seen = set()
+		base = {}
+		asset = name
+
+		while asset not in seen:
+			seen.add( asset )
+			cached = self.__resolved.get( asset )
+			if cached is not undefined:
+				base = cached
+				break
+
+			entry = self.assets.get( asset )
+			if entry is undefined:
+				break
+
+			chain.append( entry )
+			if not entry.is_child():
+				break
+			asset = entry.parent
+
+		# Then resolve back down the chain, caching each asset along the way
+		for entry in reversed( chain ):
+			properties = dict( entry.properties )
+			for key, value in base.items():
+				properties.setdefault( key, value )
+			self.__resolved[ entry.name ] = properties
+			base = properties
+
+		return base if chain or name in self.__resolved else {}
+
+	def resolve( self, name: str ) -> dict[ str, str ]:
+		"""
+		Returns the properties of an asset, including any that it inherits (& doesn't override) from its parents
+
+		Results are memoized, so resolving every asset in a GDT is linear in the number of assets
+		"""
+		return dict( self.__resolve( name ) )
+
+	def resolve_all( self ) -> dict[ str, dict[ str, str ] ]:
+		"""Returns a dict of name -> resolved properties for every asset in the index"""
+		return { name: self.resolve( name ) for name in self.assets }
+
+	def get_type( self, name: str ) -> str | None:
+		"""Returns the .gdf type of an asset, following the parent chain for child assets"""
+		chain = []
+		seen = set()
+		asset_type = undefined
+		asset = name
+
+		while asset not in seen:
+			seen.add( asset )
+			if asset in self.__types:
+				asset_type = self.__types[ asset ]
+				break
+
+			entry = self.assets.get( asset )
+			if entry is undefined:
+				break
+
+			chain.append( asset )
+			if not entry.is_child():
+				asset_type = entry.type
+				break
+			asset = entry.parent
+
+		# Every asset along the chain has the same type (or None for orphaned / cyclic chains)
+		for asset in chain:
+			self.__types[ asset ] = asset_type
+
+		return asset_type
+
+	def asset_types( self, gdf_types: Iterable[ str ] = () ) -> dict[ str, list[ str ] ]:
+		"""
+		Returns a dict of .gdf type -> sorted list of asset names (including child assets)
+
+		`gdf_types` | Types to always include in the dict, even if there aren't any assets of that type
+		"""
+		types: dict[ str, list[ str ] ] = { _type: [] for _type in gdf_types }
+
+		for name in self.assets:
+			_type = self.get_type( name )
+			if _type is undefined:
+				continue
+			types.setdefault( _type, [] ).append( name )
+
+		for _type in types:
+			types[ _type ].sort()
+
+		return types
+
+
+
+def parse_gdt( lines: Iterable[ str ], keep_lines: bool = false ) -> GDTIndex:
+	"""
+	Parses the lines of a GDT in a single pass & returns a `GDTIndex` of its assets
+	"""
+	return GDTIndex( iter_entries( lines, keep_lines ) )
+
+def serialize_gdt( entries: Iterable[ GDTEntry ] ) -> str:
+	"""
+	Returns the text of a GDT containing `entries` & updates the line span of each entry to match
+	"""
+	out = [ '{\n' ]
+	line_count = 1
+
+	for entry in entries:
+		lines = entry.to_lines()
+		entry.start = line_count
+		entry.end = line_count + len( lines ) - 1
+		line_count += len( lines )
+		out += lines
+
+	out.append( '}\n' )
+	return ''.join( out )
+
+
+
+@contextmanager
+def _gc_paused():
+	"""
+	Pauses the garbage collector while building large indexes
+
+	Parsing a GDT allocates hundreds of thousands of objects that all stay alive, so the collector's 
+	passes over them are wasted (& can take up a third of the load time)
+	"""
+	enabled = gc.isenabled()
+	gc.disable()
+	try:
+		yield
+	finally:
+		if enabled:
+			gc.enable()
+
+def content_hash( data: str ) -> str:
+	"""Returns the hash of the contents of a GDT, used to validate index caches"""
+	return hashlib.blake2b( data.encode( 'utf-8', 'surrogatepass' ), digest_size=16 ).hexdigest()
+
+def read_index_cache( cache_path: str ) -> dict | None:
+	"""
+	Reads an index cache written by `write_index_cache()`
+
+	Returns a dict with the 'path', 'mtime_ns', 'size', 'hash' & 'index' of the cached GDT, or `None` if 
+	the cache doesn't exist, is from an older version of the parser / Python, or can't be read
+	"""
+	try:
+		with open( cache_path, 'rb' ) as f:
+			cache = marshal.loads( f.read() )
+	except ( OSError, EOFError, ValueError, TypeError ):
+		return undefined
+
+	if type( cache ) is not dict or cache.get( 'version' ) != ( INDEX_CACHE_VERSION, marshal.version ):
+		return undefined
+
+	try:
+		cache[ 'index' ] = GDTIndex.from_rows( cache.pop( 'rows' ) )
+	except ( KeyError, TypeError ):
+		return undefined
+	return cache
+
+def write_index_cache( cache_path: str, index: GDTIndex, gdt_path: str, stat: os.stat_result, digest: str ) -> bool:
+	"""
+	Writes the index of a GDT to `cache_path`, keyed by the GDT's path, mtime, size & content hash
+
+	The cache is written to a temporary file first & then moved into place. Returns false if the cache couldn't be written
+	"""
+	# marshal is much faster than pickle for plain data, but its format can change between Python versions
+	cache = {
+		'version': ( INDEX_CACHE_VERSION, marshal.version ),
+		'path': os.path.abspath( gdt_path ),
+		'mtime_ns': stat.st_mtime_ns,
+		'size': stat.st_size,
+		'hash': digest,
+		'rows': index.to_rows()
+	}
+
+	try:
+		handle, temp_path = tempfile.mkstemp( suffix='.tmp', dir=os.path.dirname( os.path.abspath( cache_path ) ) )
+	except OSError:
+		return false
+
+	try:
+		with open( handle, 'wb' ) as f:
+			f.write( marshal.dumps( cache ) )
+		os.replace( temp_path, cache_path )
+	except OSError:
+		if os.path.exists( temp_path ):
+			os.remove( temp_path )
+		return false
+
+	return true
+
+def load_gdt_index( gdt_path: str, cache_path: str = None ) -> GDTIndex:
+	"""
+	Parses a GDT into a `GDTIndex` (keeping the raw lines of each asset)
+
+	If `cache_path` is given, the index is loaded from the cache when the GDT is unchanged:
+	- If the GDT's path, mtime & size match the cache, the file isn't even read
+	- Otherwise, if the content hash matches (e.g. the file was only touched), the cached index is reused
+	- Otherwise the GDT is parsed & the cache is updated
+	"""
+	if cache_path is undefined:
+		with open( gdt_path ) as f, _gc_paused():
+			return parse_gdt( f.readlines(), keep_lines=true )
+
+	stat = os.stat( gdt_path )
+	with _gc_paused():
+		cache = read_index_cache( cache_path )
+	if cache is not undefined and cache[ 'path' ] != os.path.abspath( gdt_path ):
+		cache = undefined
+
+	if cache is not undefined and cache[ 'mtime_ns' ] == stat.st_mtime_ns and cache[ 'size' ] == stat.st_size:
+		return cache[ 'index' ]
+
+	with open( gdt_path ) as f:
+		data = f.read()
+	digest = content_hash( data )
+
+	if cache is not undefined and cache[ 'hash' ] == digest:
+		index = cache[ 'index' ]
+	else:
+		with _gc_paused():
+			index = parse_gdt( data.splitlines( keepends=true ), keep_lines=true )
+
+	write_index_cache( cache_path, index, gdt_path, stat, digest )
+	return index
+
+
+
+__all__ = [
+	'GDTEntry',
+	'GDTIndex',
+	'parse_gdt',
+	'serialize_gdt',
+	'load_gdt_index',
+	'iter_entries',
+	'iter_headers',
+	'iter_assets',
+	'write_gdt'
+	]
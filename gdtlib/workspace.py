@@ -0,0 +1,213 @@
+"""
+## GDT Workspace - prov3ntus
+
+Indexes every GDT in a directory tree (e.g. `Black Ops III/source_data`), so you can find which GDT defines
+an asset, or whether an asset name collides across GDTs, without opening each GDT.
+
+```
+ws = GDTWorkspace( 'C:/.../Black Ops III/source_data' )
+ws.find( 'mtl_example' )	# -> ( 'C:/.../example.gdt', 'material.gdf' )
+ws.duplicates()				# -> { 'i_example_c': [ ( 'a.gdt', 'image.gdf' ), ( 'b.gdt', 'image.gdf' ) ] }
+ws.refresh()				# Re-parses only the GDTs that changed on disk
+```
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from pv_py_utils import *
+from pv_py_utils.gdtlib.parser import GDTIndex, _gc_paused, iter_entries
+
+
+
+def _read_gdt( gdt_path: str ) -> tuple[ str, str ]:
+	"""Reads a GDT from disk (run on the I/O thread pool)"""
+	with open( gdt_path ) as f:
+		return gdt_path, f.read()
+
+def _parse_gdt_assets( data: str ) -> list[ tuple[ str, str | None ] ]:
+	"""
+	Parses the text of a GDT & returns a list of ( name, .gdf type ) for each asset, in file order (run on the parsing process pool)
+
+	Assets defined more than once in the GDT are listed once per definition, so they're reported as duplicates
+	"""
+	with _gc_paused():
+		entries = list( iter_entries( data.splitlines() ) )
+		index = GDTIndex( entries )
+		return [ ( entry.name, index.get_type( entry.name ) ) for entry in entries ]
+
+
+
+class GDTWorkspace():
+	"""
+	Index of the assets in every GDT under a directory
+
+	`root` | The directory to scan for .gdt files
+
+	`recursive` | Scan subdirectories of `root` too
+
+	`workers` | The number of processes used to parse GDTs (defaults to `os.cpu_count()`). 1 parses in-process
+
+	`io_workers` | The number of threads used to stat & read GDTs (defaults to `ThreadPoolExecutor`'s default)
+
+	`files` | GDT path -> ( mtime_ns, size ) of every indexed GDT
+
+	`assets` | GDT path -> list of ( name, .gdf type ) in the GDT, in file order
+	"""
+
+	def __init__( self, root: str, recursive: bool = true, workers: int = undefined, io_workers: int = undefined ) -> None:
+		self.root = root
+		self.recursive = recursive
+		self.workers = workers if workers is not undefined else ( os.cpu_count() or 1 )
+		self.io_workers = io_workers
+
+		self.files: dict[ str, tuple[ int, int ] ] = {}
+		self.assets: dict[ str, list[ tuple[ str, str | None ] ] ] = {}
+		# name -> list of ( GDT path, .gdf type ), one per definition
+		self.__locations: dict[ str, list[ tuple[ str, str | None ] ] ] = {}
+
+		self.refresh()
+
+	def __len__( self ):
+		return len( self.__locations )
+
+	def __contains__( self, name: str ):
+		return name in self.__locations
+
+	def __repr__( self ):
+		return f'GDTWorkspace({self.root}, {len( self.files )} GDTs, {len( self.__locations )} assets)'
+
+	def find_gdts( self ) -> list[ str ]:
+		"""Returns a sorted list of the paths of every .gdt file under `root`"""
+		paths = []
+		for directory, dirnames, filenames in os.walk( self.root ):
+			if not self.recursive:
+				dirnames[:] = []
+			for filename in filenames:
+				if filename.lower().endswith( '.gdt' ):
+					paths.append( os.path.join( directory, filename ) )
+		paths.sort()
+		return paths
+
+	def refresh( self ) -> tuple[ list[ str ], list[ str ], list[ str ] ]:
+		"""
+		Re-scans `root` & re-parses every GDT that's new or whose mtime / size has changed since the last scan
+
+		Returns a tuple of the ( added, changed, removed ) GDT paths
+		"""
+		with ThreadPoolExecutor( max_workers=self.io_workers ) as io_pool:
+			paths = self.find_gdts()
+			stats = { path: stat for path, stat in zip( paths, io_pool.map( self.__stat, paths ) ) if stat is not undefined }
+
+			added = [ path for path in stats if path not in self.files ]
+			changed = [ path for path in stats if path in self.files and self.files[ path ] != stats[ path ] ]
+			removed = [ path for path in self.files if path not in stats ]
+
+			for path in changed + removed:
+				self.__remove_gdt( path )
+
+			for path, assets in self.__parse( io_pool, added + changed ):
+				self.__add_gdt( path, stats[ path ], assets )
+
+		if added or changed or removed:
+			log.info( f'GDTWorkspace: {len( added )} added, {len( changed )} changed, {len( removed )} removed GDTs in {self.root}' )
+		return added, changed, removed
+
+	@staticmethod
+	def __stat( path: str ) -> tuple[ int, int ] | None:
+		try:
+			stat = os.stat( path )
+		except OSError:
+			return undefined
+		return stat.st_mtime_ns, stat.st_size
+
+	def __parse( self, io_pool: ThreadPoolExecutor, paths: list[ str ] ):
+		"""Yields ( path, assets ) for each GDT in `paths` as it's parsed. GDTs that can't be read are logged & skipped"""
+		if not paths:
+			return
+
+		reads = [ io_pool.submit( _read_gdt, path ) for path in paths ]
+
+		if self.workers <= 1:
+			for future in as_completed( reads ):
+				if ( result := self.__result( future ) ) is not undefined:
+					yield result[ 0 ], _parse_gdt_assets( result[ 1 ] )
+			return
+
+		with ProcessPoolExecutor( max_workers=self.workers ) as parse_pool:
+			parses = {}
+			# Each GDT is handed to the process pool as soon as it's been read
+			for future in as_completed( reads ):
+				if ( result := self.__result( future ) ) is not undefined:
+					parses[ parse_pool.submit( _parse_gdt_assets, result[ 1 ] ) ] = result[ 0 ]
+			for future in as_completed( parses ):
+				yield parses[ future ], future.result()
+
+	@staticmethod
+	def __result( future ) -> tuple[ str, str ] | None:
+		try:
+			return future.result()
+		except ( OSError, UnicodeDecodeError ) as e:
+			log.warning( f'GDTWorkspace: Could not read GDT - {e}' )
+			return undefined
+
+	def __add_gdt( self, path: str, stat: tuple[ int, int ], assets: list[ tuple[ str, str | None ] ] ) -> None:
+		self.files[ path ] = stat
+		self.assets[ path ] = assets
+		for name, asset_type in assets:
+			locations = self.__locations.setdefault( name, [] )
+			locations.append( ( path, asset_type ) )
+			if len( locations ) > 1:
+				# Keep duplicates in path order, so find() doesn't depend on which GDT was parsed first
+				locations.sort( key=lambda location: location[ 0 ] )
+
+	def __remove_gdt( self, path: str ) -> None:
+		del self.files[ path ]
+		for name, _ in self.assets.pop( path ):
+			locations = self.__locations.get( name )
+			if locations is undefined:
+				continue
+			locations[:] = [ location for location in locations if location[ 0 ] != path ]
+			if not locations:
+				del self.__locations[ name ]
+
+	def find( self, name: str ) -> tuple[ str, str | None ] | None:
+		"""
+		Returns ( GDT path, .gdf type ) of the GDT that defines the asset `name`, or `None` if no GDT does
+
+		If the asset is defined in more than one GDT, the first GDT (by path) is returned. See `find_all()`
+		"""
+		locations = self.__locations.get( name )
+		return locations[ 0 ] if locations else undefined
+
+	def find_all( self, name: str ) -> list[ tuple[ str, str | None ] ]:
+		"""Returns a list of ( GDT path, .gdf type ) for every definition of the asset `name`"""
+		return list( self.__locations.get( name, () ) )
+
+	def get_type( self, name: str ) -> str | None:
+		"""Returns the .gdf type of the asset `name`, or `None` if no GDT defines it"""
+		location = self.find( name )
+		return location[ 1 ] if location is not undefined else undefined
+
+	def duplicates( self ) -> dict[ str, list[ tuple[ str, str | None ] ] ]:
+		"""
+		Returns a dict of name -> list of ( GDT path, .gdf type ) for every asset that's defined more than once,
+		either in different GDTs or more than once in the same GDT
+		"""
+		return { name: list( locations ) for name, locations in self.__locations.items() if len( locations ) > 1 }
+
+	def names( self, gdf_type: str = undefined ) -> list[ str ]:
+		"""
+		Returns a sorted list of every asset name in the workspace
+
+		`gdf_type` | Only return assets of this type, e.g. 'material.gdf' (or 'material')
+		"""
+		if gdf_type is undefined:
+			return sorted( self.__locations )
+		gdf_type = gdf_type.removesuffix( '.gdf' ) + '.gdf'
+		return sorted( name for name, locations in self.__locations.items() if any( location[ 1 ] == gdf_type for location in locations ) )
+
+
+
+__all__ = [
+	'GDTWorkspace'
+	]
@@ -12,9 +12,13 @@ Currently supported XAssets:
 \- pv
 """
 
-import os
+import os, stat, tempfile
+from functools import lru_cache
 from math import log2
+from typing import Iterable
 from pv_py_utils import *
+from pv_py_utils.gdtlib.parser import GDTIndex, content_hash, iter_entries, load_gdt_index, serialize_gdt, write_index_cache
+from pv_py_utils.gdtlib.diff import GDTDiff, diff_gdts, merge_gdts
 
 VERBOSE_LOG = false
 
@@ -24,6 +28,7 @@ TODO:
 - Hierarchy images of the same material to the diffuse image
 
 - If attempting to write a duplicate asset, compare properties to the one in the GDT and (ask to) update
+	- GDT.Diff() & GDT.Merge() can do this now, NewAssets() still just skips duplicates
 
 - GDT.Delete() leaves a tab where it deletes the asset
 
@@ -58,6 +63,13 @@ mw4_semantics = {
 }
 
 
+# Relative to the package (not the CWD), so the templates can be found wherever pv_py_utils is imported from
+TEMPLATES_DIR = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'templates' )
+
+# Cache of .gdf type -> template text (see XAsset.get_template())
+_templates: dict[ str, str ] = {}
+
+
 
 class XAsset():
 
@@ -89,6 +101,18 @@ class XAsset():
 	def save_to( self, _gdt ):
 		_gdt.NewAsset( self )
 
+	def get_template( self ) -> str:
+		"""
+		Returns the GDT template for this asset's type (from gdtlib/templates)
+
+		Templates are read from disk the first time they're used & then cached
+		"""
+		template = _templates.get( self.type )
+		if template is undefined:
+			with open( os.path.join( TEMPLATES_DIR, self.type ) ) as f:
+				template = _templates[ self.type ] = f.read()
+		return template
+
 
 
 
@@ -166,8 +190,7 @@ class XModel( XAsset ):
 	
 
 	def GenerateGDTAsset( self ) -> list[ str ]:
-		with open( f'pv_py_utils\\gdtlib\\templates\\{ self.type }' ) as f:
-			data = f.read()
+		data = self.get_template()
 		
 		lod_paths = list( self.LODs.values() )
 
@@ -227,6 +250,9 @@ class XImage( XAsset ):
 		Please ensure that the image's file name is suffixed correctly (e.g. "i_bricks_worn_white_c" AND NOT "i_bricks_worn_white")
 
 		XImage will default to the semantic "2d" (like APE does) if there is no suffix.
+
+		`no_mip_maps` & `compression_method` depend on the image's dimensions, so the image is only opened 
+		the first time either of them is used (e.g. by `GenerateGDTAsset()`), not when the XImage is created.
 		"""
 		#if not image_name.startswith( 'i_' ) and image_name != '':
 		#	image_name = 'i_' + image_name
@@ -234,7 +260,8 @@ class XImage( XAsset ):
 		super().__init__( image_name, 'image' )
 		self.path = file_path
 		self.pbr_type = XImage.Semantics[ 'default' ]
-		self.no_mip_maps = 0
+		self.__no_mip_maps = undefined
+		self.__compression_method = undefined
 
 		if self.name == '' or self.path == '':
 			return
@@ -268,24 +295,74 @@ class XImage( XAsset ):
 					self.pbr_type = _type
 					break
 
-		self.compression_method = self.get_compression_method()[0]
+	def __resolve_image( self ) -> None:
+		"""Works out `no_mip_maps` & `compression_method` from the image's dimensions (keeping either if it's been set already)"""
+		no_mip_maps = 0
+		compression_method = self.get_compression_method()[0]
 
 		# Image dimension checks
-		for _dim in image.get_dimensions( self.path ):
-			if not _dim:
-				break
-				
-			if not log2( _dim ).is_integer():
-				self.no_mip_maps = 1 # Disable mipMaps
-				if _dim % 4 != 0:
-					self.compression_method = self.get_compression_method()[ -1 ] # Diable compression
-				
-				break
-		
+		if self.name != '' and self.path != '':
+			for _dim in image.get_dimensions( self.path ):
+				if not _dim:
+					break
+					
+				if not log2( _dim ).is_integer():
+					no_mip_maps = 1 # Disable mipMaps
+					if _dim % 4 != 0:
+						compression_method = self.get_compression_method()[ -1 ] # Diable compression
+					
+					break
+
+		if self.__no_mip_maps is undefined:
+			self.__no_mip_maps = no_mip_maps
+		if self.__compression_method is undefined:
+			self.__compression_method = compression_method
+
+	@property
+	def no_mip_maps( self ) -> int:
+		if self.__no_mip_maps is undefined:
+			self.__resolve_image()
+		return self.__no_mip_maps
+
+	@no_mip_maps.setter
+	def no_mip_maps( self, value: int ) -> None:
+		self.__no_mip_maps = value
+
+	@property
+	def compression_method( self ) -> str:
+		if self.__compression_method is undefined:
+			self.__resolve_image()
+		return self.__compression_method
+
+	@compression_method.setter
+	def compression_method( self, value: str ) -> None:
+		self.__compression_method = value
 	
+	@staticmethod
+	def from_paths( file_paths: Iterable[ str ], image_names: Iterable[ str ] = undefined, workers: int = undefined ) -> list[ 'XImage' ]:
+		"""
+		Creates an XImage for each image file in bulk
+
+		The image headers are probed on a thread pool first & cached (see `image.probe()`), so neither the XImages, 
+		nor XMaterials made from them, have to open the files again
+
+		### @params:
+
+		`file_paths` | The paths to the image files
+
+		`image_names` | The name of each image in APE (defaults to each file's name)
+
+		`workers` | The number of threads used to probe the images
+		"""
+		file_paths = list( file_paths )
+		if image_names is undefined:
+			image_names = [ pathlib.get_file_name( _path ) for _path in file_paths ]
+
+		image.probe_all( file_paths, workers )
+		return [ XImage( _name, _path ) for _name, _path in zip( image_names, file_paths ) ]
+
 	def GenerateGDTAsset( self ) -> list[ str ]:
-		with open( f'pv_py_utils\\gdtlib\\templates\\{ self.type }' ) as f:
-			data = f.read()
+		data = self.get_template()
 
 		if self.path == '':
 			_path = ''
@@ -414,15 +491,13 @@ gloss_range		| Fallback for gloss surface type.
 		self.mtl_type		= mtl_type
 		self.radiant_usage 	= usage
 
-		# DETERMINE SURFACE TYPE
-		for _type in XMaterial.SURFACE_TYPES:
-			if _type in self.name.lower():
-				self.surface_type = _type
-		
-		# DETERMINE GLOSS SURFACE TYPE
-		for _type in XMaterial.GLOSS_SURFACE_TYPES:
-			if _type in self.name.lower():
-				self.gloss_range = _type
+		# DETERMINE SURFACE TYPE & GLOSS SURFACE TYPE
+		# The longest type in the name wins, e.g. "metalcatwalk" over "metal"
+		_surface_type, _gloss_range = classify_material( self.name )
+		if _surface_type is not undefined:
+			self.surface_type = _surface_type
+		if _gloss_range is not undefined:
+			self.gloss_range = _gloss_range
 
 		self.ximages = {
 			'revealMap' 	: XImage(),
@@ -439,7 +514,8 @@ gloss_range		| Fallback for gloss surface type.
 				self.ximages[ _ximg.pbr_type ] = _ximg
 				
 				# DETERMINE MTL TYPE
-				if image.has_alpha( _ximg.path ):
+				# Only if the alpha is actually used, an RGBA texture that's fully opaque doesn't need alpha testing
+				if image.alpha_usage( _ximg.path ) != image.OPAQUE:
 					self.mtl_type = 'lit_alphatest'
 				
 				# DETERMINE MTL CATEGORY
@@ -464,8 +540,7 @@ gloss_range		| Fallback for gloss surface type.
 
 
 	def GenerateGDTAsset( self ) -> str:
-		with open( f'pv_py_utils\\gdtlib\\templates\\{ self.type }' ) as f:
-			data = f.read()
+		data = self.get_template()
 		
 		# Texture maps
 		_reveal = self.ximages[ "revealMap" 	].name
@@ -499,18 +574,90 @@ gloss_range		| Fallback for gloss surface type.
 
 
 
+class KeywordMatcher():
+
+	def __init__( self, keywords: Iterable[ str ] ) -> None:
+		"""
+		Finds the longest keyword in a string
+
+		Placeholder keywords like "<none>" are ignored, as they're never part of an asset name
+		"""
+		self.keywords = tuple( _keyword for _keyword in keywords if not _keyword.startswith( '<' ) )
+
+		# Keywords grouped by length, longest first, so the first group with a hit has the longest match.
+		# With only a few dozen short keywords, substring checks beat a compiled regex alternation by ~3x
+		_lengths: dict[ int, list[ str ] ] = {}
+		for _keyword in self.keywords:
+			_lengths.setdefault( len( _keyword ), [] ).append( _keyword )
+		self.__groups = tuple( tuple( _lengths[ _length ] ) for _length in sorted( _lengths, reverse=true ) )
+
+	def match( self, text: str ) -> str | None:
+		"""Returns the longest keyword in `text` (the leftmost one if there's a tie), or `None` if there aren't any"""
+		for _group in self.__groups:
+			_hits = [ _keyword for _keyword in _group if _keyword in text ]
+			if _hits:
+				return _hits[ 0 ] if len( _hits ) == 1 else min( _hits, key=text.find )
+		return undefined
+
+_surface_matcher = KeywordMatcher( XMaterial.SURFACE_TYPES )
+_gloss_matcher = KeywordMatcher( XMaterial.GLOSS_SURFACE_TYPES )
+
+@lru_cache( maxsize=1 << 16 )
+def classify_material( mtl_name: str ) -> tuple[ str | None, str | None ]:
+	"""
+	Returns the ( surface type, gloss range ) in a material's name, using the longest match of each, or `None` for either if the name doesn't contain one
+
+	Results are cached, as the same names come up again & again across GDTs
+	"""
+	_name = mtl_name.lower()
+	return _surface_matcher.match( _name ), _gloss_matcher.match( _name )
+
+def classify_materials( mtl_names: Iterable[ str ], surface_type: str = '<none>', gloss_range: str = '<full>' ) -> list[ tuple[ str, str ] ]:
+	"""
+	Returns the ( surface type, gloss range ) of each material name, like `XMaterial` would determine them
+
+	### @params:
+
+	`mtl_names` | The names of the materials
+
+	`surface_type`, `gloss_range` | What to use for names that don't contain a surface type / gloss range
+	"""
+	_results = []
+	for _name in mtl_names:
+		_surface, _gloss = classify_material( _name )
+		_results.append( ( _surface if _surface is not undefined else surface_type, _gloss if _gloss is not undefined else gloss_range ) )
+	return _results
+
+
+
 # --GDT FILE
 class GDT():
 
-	def __init__( self, _gdt_path: str ) -> None:
+	def __init__( self, _gdt_path: str, use_cache: bool = false, cache_dir: str = undefined ) -> None:
 		"""
 		Object that represents a GDT file.
 
 		Has various utility functions.
 
+		The GDT is parsed into memory once. NewAsset(), Delete(), ParentTo(), etc. only edit it in memory,
+		& the GDT is written to disk (in one go) by `save_gdt()` / `CloseGDT()`, or at the end of a `with` block:
+		```
+		with GDT( path ) as gdt:
+			for asset in assets:
+				gdt.NewAsset( asset )
+		```
+
+		Opening a GDT never writes to it - it's only written once something has been modified.
+
 		Options:
 		
 		`@param` `_gdt_path` | The absolute path to the GDT
+
+		`@param` `use_cache` | Keep an on-disk cache of the parsed GDT (keyed by path, mtime, size & content hash), 
+		so opening an unchanged GDT is a stat + deserialize instead of a full parse. The cache is stored next 
+		to the GDT (as '<name>.gdt.cache'), or in `cache_dir` if it's given
+
+		`@param` `cache_dir` | Directory to store the cache in (implies `use_cache`)
 		"""
 		
 		self.n_asset_count = 0
@@ -524,60 +671,66 @@ class GDT():
 		if not pathlib.exists( self.path ):
 			raise FileNotFoundError( f"Cannot find GDT '{self.name}.gdt'" )
 
-		with open( self.path, 'r' ) as f:
-			data = f.read()
-
-		if not ( stdlib.strip_all( data, '\n', '\t', ' ', '{', '}' ) == '' ):
-			with open( self.path, 'r' ) as self.file:
-				lines = self.file.readlines()
-			self.n_asset_count = lines.count( '{' ) - 1 if len( lines ) > 0 else 0 # quick way to check asset count
-
-			while lines[ -1 ] == '\n':
-				lines = lines[ :-1]  # remove all empty lines
-			#lines = lines[ :-1 ] # remove the } at the end of the GDT in memory
-			
-			with open( self.path, 'w' ) as self.file:
-				self.file.writelines( lines )
-		else: # Wipes the file if it has no assets in, and starts writing to it
-			with open( self.path, 'w' ) as f:
-				f.write( '{\n}' )
-		
-		self.lines = self._readlines()
-		
-		# Create asset types dictionary
-		# Key: <asset_type>, Value: <asset_name>
-		self.asset_types: dict[ str : list[ str ] ] = {}
-		
-		for _type in XAsset.AssetTypes.values():
-			self.asset_types[ _type ] = []
+		self.cache_path: str | None = undefined
+		if use_cache or cache_dir is not undefined:
+			self.cache_path = GDT.get_cache_path( self.path, cache_dir )
 
-		_gdt_lines = self.lines
-		for line in _gdt_lines:
-			if not line.__contains__( '" ( "' ):
-				continue
-			
-			kvp = line.strip().split( '"' )
-			# Visualisation:
-			# kvp = ['', 'i_pv_modular_building_kit_01_c', ' ( ', 'image.gdf', ' )']
-			asset_name = kvp[ 1 ]
-			asset_type = kvp[ -2 ]
-
-			# if not IsDefined( self.asset_types.get( asset_type ) ):
-			# 	self.asset_types[ asset_type ] = []
-			
-			self.asset_types[ asset_type ].append( asset_name )
-
-			# Check for child assets
-			for child in self.__get_child_assets( asset_name ):
-				self.asset_types[ asset_type ].append( child )
-		
-		# Order lists of asset types alphabetically
-		for type in self.asset_types:
-			self.asset_types[ type ] = sorted( self.asset_types[ type ] )
+		# The in-memory document
+		# A GDTIndex of name -> GDTEntry ( type, parent, line span, key/value dict, raw lines ), as well as a parent -> children map
+		self.index: GDTIndex = load_gdt_index( self.path, self.cache_path )
+		self.n_asset_count = len( self.index )
+		self.modified = false
+		self.__asset_types = undefined
 
-		
+	@staticmethod
+	def get_cache_path( gdt_path: str, cache_dir: str = undefined ) -> str:
+		"""
+		Returns the path of the index cache for a GDT
+
+		Caches in a shared `cache_dir` are named after the GDT & a hash of its full path, so GDTs with the same name don't collide
+		"""
+		if cache_dir is undefined:
+			return gdt_path + '.cache'
+
+		os.makedirs( cache_dir, exist_ok=true )
+		path_hash = content_hash( os.path.normcase( os.path.abspath( gdt_path ) ) )[ :16 ]
+		return os.path.join( cache_dir, f'{pathlib.get_base_name( gdt_path )}.{path_hash}.gdt.cache' )
+
+	def __enter__( self ):
+		return self
+
+	def __exit__( self, exc_type, exc_value, traceback ):
+		# Don't write a half finished batch of edits to disk
+		if exc_type is undefined:
+			self.save_gdt()
+		return false
+
+	@property
+	def asset_types( self ) -> dict[ str, list[ str ] ]:
+		"""
+		Dict of asset types
+
+		Key: <asset_type>, Value: sorted list of <asset_name> (including child assets)
+		"""
+		if self.__asset_types is undefined:
+			self.__asset_types = self.index.asset_types( XAsset.AssetTypes.values() )
+		return self.__asset_types
+
+	def __on_modified( self ) -> None:
+		self.modified = true
+		self.n_asset_count = len( self.index )
+		self.__asset_types = undefined
+
+	def __add_raw( self, raw: str ) -> None:
+		"""Parses raw GDT asset text & adds the asset(s) to the document"""
+		for entry in iter_entries( [ '{\n' ] + raw.splitlines( keepends=true ) + [ '\n}\n' ], keep_lines=true ):
+			self.index.add( entry )
+		self.__on_modified()
+
+	def serialize( self ) -> str:
+		"""Returns the text of the GDT as it would be written to disk"""
+		return serialize_gdt( self.index.assets.values() )
 
-	
 	def IsEmpty( self ):
 		#return true if engine.StripAll( self.file.read(), '\n', '\t', ' ' ) in ( '{}', '' ) else false
 		return self.n_asset_count == 0
@@ -603,69 +756,30 @@ class GDT():
 			log.warning( f'Could not find {"" if type( asset ) is str else asset.type.replace( ".gdf", "" ) + " "}asset "{asset if type( asset ) is str else asset.name}" in GDT file { self.path.split( 'Black Ops III' )[ -1 ] }' )
 			return undefined
 
-		raw_data = self._read()
-		
-		if type( asset ) is not str:
-			_search_kwds = ( f'"{asset.name}" ( "{asset.type}" )', f'"{asset.name}" [' )
-		else:
-			_search_kwds = ( f'"{asset}" (', f'"{asset}" [' )
-		
-		# Slice gdt str from where it finds the asset to where it finds the next '}' after
-		for kwd in _search_kwds:
-			start_idx = raw_data.find( kwd )
+		name = asset if type( asset ) is str else asset.name
+		entry = self.index.get( name )
+
+		if not entry.is_child():
+			if not dict_return:
+				# From the asset name to the closing '}'
+				return ''.join( entry.to_lines() ).strip()
+
+			return { 'name': name } | entry.properties
 
-			if start_idx != -1: break
+		# It's got a parent - add the non-override parent xdata to the child's xdata
+		_dict = { 'name': name } | self.index.resolve( name )
+		if dict_return: return _dict
+
+		# They're expecting a str if the script reaches this point, so we need to put the dict back into the GDT format
+		__xdata = '\n'.join( f'\t\t"{key}" "{_dict[ key ]}"' for key in _dict )
 		
-		# Check if parented assets are the correct asset type
-
-		#start_idx = raw_data.find( f'"{asset}" (' )
-		#start_idx = start_idx if start_idx != -1 else raw_data.find( f'"{asset}" [' )
-		raw_data = raw_data[ start_idx: ]
-		raw_data = raw_data[ :raw_data.find( '}' ) + 1 ]
-		#print( "Raw data of asset:\n\n", raw_data )
-
-		raw_lines = raw_data.splitlines()
-		has_parent = '[' in raw_lines[ 0 ]
-
-		if has_parent or dict_return:
-			_dict = {
-				'name': asset if type( asset ) is str else asset.name
-			}
-			for line in raw_lines:
-				if any( kwd in line for kwd in ( '{', '}', '(', '[' ) ):
-					continue
-
-				kvp = line.strip().replace( '"', '' ).split()
-				if kvp.__len__() == 1:
-					_dict[ kvp[ 0 ] ] = ""
-				else:
-					_dict[ kvp[ 0 ] ] = kvp[ 1 ]
-
-			if not has_parent: return _dict
-
-			# It's got a parent, recurse
-			par_name = raw_lines[ 0 ].split( '"' )[ -2 ]
-			d_parent_xdata = self.GetAssetRaw( par_name, dict_return=true )
-			# Add non-override parent xdata to child's xdata
-			for par_key in d_parent_xdata:
-				if par_key in _dict.keys():
-					continue
-				_dict[ par_key ] = d_parent_xdata[ par_key ]
-			
-			if dict_return: return _dict
-
-			# They're expecting a str if the script reaches this point, so we need to put the dict back into the GDT format
-			__xdata = '\n'.join( f'\t\t"{key}" "{_dict[ key ]}"' for key in _dict )
-			
-			raw_data = stdlib.concat(
-				f'\t"{_dict[ 'name' ]}" [ "{par_name}" ]',
-				'\t{',
-				__xdata,
-				'\t}',
-				sep='\n'
-			)
-
-		return raw_data
+		return stdlib.concat(
+			f'\t"{name}" [ "{entry.parent}" ]',
+			'\t{',
+			__xdata,
+			'\t}',
+			sep='\n'
+		)
 
 	def GetAssetNamesByGDF( self, gdf_type: str ) -> list[ str ]:
 		"""
@@ -674,72 +788,24 @@ class GDT():
 		gdf_type | The type of asset to grab all the names of, e.g. 'material', 'image', 'xmodel', 'xanim', etc. (you can optionally suffix with .gdf)
 		"""
 		if( not gdf_type.endswith( '.gdf' ) ): gdf_type += '.gdf'
-		asset_names = []
-		gdt_lines = self._readlines()
-
-		for line in gdt_lines:
-			if f'( "{gdf_type}" )' not in line:
-				continue
 
-			split = line.strip().split()
-			name = split[0].replace( '"', '' )
-
-			"""
-			if '_' not in name and name != '': # Validation check
-				log_error( f"xasset -> GDT -> {inspect.currentframe().f_code.co_name}: Could not find underscore in asset name '{name}'" )
-				gvar.errors_occurred = true
-				continue
-			"""
-
-			asset_names.append( name )
-
-		# Search for child assets
-		for par_name in asset_names:
-			__child_names = self.__get_child_assets( par_name )
-
-			if __child_names.__len__():
-				asset_names += __child_names
-
-		return asset_names
+		# Includes child assets
+		return list( self.asset_types.get( gdf_type, [] ) )
 
 	def __get_child_assets( self, __parent: str ) -> list[ str ]:
-		_child_assets: list[ str ] = []
-		for _line in self.lines:
-			if '[ ' not in _line: continue
-
-			parent_name = _line.strip().split( '"' )[-2]
-			if parent_name == __parent:
-				child_name = _line.strip().split( '"' )[1]
-				_child_assets.append( child_name )
-
-				# Recursively check if this child is a parent
-				_child_assets += self.__get_child_assets( child_name )
-		
-		return _child_assets
-	
-	parent_recursions = 0 # Debug
+		return self.index.descendants( __parent )
 
 	def __get_parent_assets( self, __child: str ) -> list[ str ] | str:
-		_parent_assets = []
-		for _line in self._readlines():
-			if f'"{__child}" [' not in _line: continue
-
-			parent_name = _line.strip().split( '"' )[-2]
-			_parent_assets.append( parent_name )
-			# Add parent's parent to the list if the parent is a child
-			if self.asset_is_child( parent_name ):
-				self.parent_recursions += 1
-				_parent_assets += self.__get_parent_assets( parent_name )
-		
-		return _parent_assets
+		return self.index.parents( __child )
 	
 	def asset_is_child( self, _asset: str ):
-		return true if f'"{_asset}" [ ' in self._read() else false
+		entry = self.index.get( _asset )
+		return entry is not undefined and entry.is_child()
 
 	def get_asset_count( self ):
 		"""Returns `self.n_asset_count`
 		"""
-		self.n_asset_count = self._read().count( '{' ) - 1
+		self.n_asset_count = len( self.index )
 		return self.n_asset_count
 
 	def asset_exists( self, asset: XModel | XMaterial | XImage | str ):
@@ -752,11 +818,10 @@ class GDT():
 		- (NOT THE CASE ANYMORE) xasset.GDT will also not be able to check for asset type if the asset is a child
 		"""
 		if type( asset ) is str:
-			for line in self._readlines():
-				if any( kwd in line for kwd in ( f'"{asset}" (', f'"{asset}" [' ) ):
-					return true
+			return asset in self.index
 		else:
-			return stdlib.binary_search( asset.name, self.asset_types[ asset.type ] ) is not undefined
+			# Child assets resolve their type through their parents
+			return self.index.get_type( asset.name ) == asset.type
 
 		# Old new method that reads parent asset type (uses __get_parent_assets(), which is MUCH slower)
 		# Need to implement a better method by getting assets by searching for '{' & storing a dict 
@@ -805,44 +870,50 @@ class GDT():
 		"""
 		return self.asset_exists( asset )
 	
-	def Delete( self, asset: XImage | XMaterial | XModel ):
+	def Delete( self, asset: XImage | XMaterial | XModel | str ):
 		"""
 		Deletes & purges passed asset from the GDT
 
-		### !!! WARNING: THIS WILL DELETE THE ASSET PERMANENTLY
+		### !!! WARNING: THIS WILL DELETE THE ASSET PERMANENTLY (once the GDT is saved)
 
-		`@param` `asset` | An XAsset that is in the GDT
+		`@param` `asset` | An XAsset (or the name of an asset) that is in the GDT
 		"""
-		asset_raw = self.GetAssetRaw( asset )
-
-		if not asset_raw:
+		if not self.asset_exists( asset ):
 			console.error( f"Failed to delete { asset }, it does not currently exist in the GDT" )
+			return
 
-		with open( self.path ) as f:
-			raw = f.read()
-		with open( self.path, 'w' ) as f:
-			f.write( raw.replace( asset_raw, '' ) )
-		
-		# Remove asset from GDT asset types table
-		self.asset_types[ asset.type ].remove( asset.name )
-
-	
+		self.index.remove( asset if type( asset ) is str else asset.name )
+		self.__on_modified()
 
-	def ParentTo( self, asset: XAsset | XImage | XMaterial | XImage | XModel | str, new_parent: XAsset | XImage | XMaterial | XImage | XModel ):
-		"""
-		TODO
-		Parents the asset in param1 to the asset in param2 <--------------------------------------------------------- FINISH ME
+	def ParentTo( self, asset: XAsset | XImage | XMaterial | XImage | XModel | str, new_parent: XAsset | XImage | XMaterial | XImage | XModel | str ):
 		"""
+		Parents the asset in param1 to the asset in param2
 
-		if asset.type != new_parent.type:
-			console.error( f"Failed to parent {asset} to {new_parent} beause the asset types are different ({asset.type.removesuffix( '.gdf' )} vs. {new_parent.type.removesuffix( '.gdf' )}). Child assets need to be the same asset type as their parents." )
-			return
+		The asset keeps all of its properties, which become overrides of the parent's properties
+		"""
+		asset_name = asset if type( asset ) is str else asset.name
+		parent_name = new_parent if type( new_parent ) is str else new_parent.name
 
 		if not self.asset_exists( asset ):
 			console.error( f"Failed to parent {asset} to {new_parent} because {asset} does not exist in the GDT {self.name}.gdt." )
 			return
 
-		...
+		if not self.asset_exists( new_parent ):
+			console.error( f"Failed to parent {asset} to {new_parent} because {new_parent} does not exist in the GDT {self.name}.gdt." )
+			return
+
+		asset_type = self.index.get_type( asset_name )
+		parent_type = self.index.get_type( parent_name )
+		if asset_type != parent_type:
+			console.error( f"Failed to parent {asset} to {new_parent} beause the asset types are different ({str( asset_type ).removesuffix( '.gdf' )} vs. {str( parent_type ).removesuffix( '.gdf' )}). Child assets need to be the same asset type as their parents." )
+			return
+
+		if parent_name == asset_name or parent_name in self.index.descendants( asset_name ):
+			console.error( f"Failed to parent {asset} to {new_parent} because {new_parent} is already a child of {asset}." )
+			return
+
+		self.index.set_parent( asset_name, parent_name )
+		self.__on_modified()
 
 	def MakeChildOf( self, asset: XAsset | XImage | XMaterial | XImage | XModel | str, new_parent: XAsset | XImage | XMaterial | XImage | XModel | str ):
 		self.ParentTo( asset, new_parent )
@@ -856,22 +927,37 @@ class GDT():
 		`asset` | an XAsset to be written to the GDT
 		"""
 
-		if self.asset_exists( asset ):
-			log.warning( f"Tried to write { asset }', but an asset with that name already exists. Skipping..." )
-			#gvar.errors_occurred = true
-			return
+		self.NewAssets( [ asset ] )
+
+	def NewAssets( self, assets: Iterable[ XImage | XMaterial | XModel ] ) -> int:
+		"""
+		Creates new assets in the GDT in bulk
+
+		All of the assets are rendered into one buffer, which is parsed & added to the GDT in one go
 
-		gdt_data = self._read()
+		### @params:
+
+		`assets` | an iterable of XAssets to be written to the GDT
+
+		Returns the number of assets that were added (assets with names that already exist are skipped)
+		"""
+		buffer: list[ str ] = []
+		names: set[ str ] = set()
+
+		for asset in assets:
+			# Names are unique in the index, so check the name regardless of the asset type
+			if asset.name in names or self.asset_exists( asset.name ):
+				log.warning( f"Tried to write { asset }', but an asset with that name already exists. Skipping..." )
+				#gvar.errors_occurred = true
+				continue
 
-		if gdt_data.strip() == '':
-			gdt_data += '{\n}'
-		elif gdt_data.strip().endswith( '}' ):
-			gdt_data = gdt_data[ :-2 ] + '\n'
+			names.add( asset.name )
+			buffer.append( asset.GenerateGDTAsset() )
 
-		with open( self.path, 'w' ) as self.file:
-			self.file.writelines( gdt_data + asset.GenerateGDTAsset() + '\n}' )
+		if buffer:
+			self.__add_raw( '\n'.join( buffer ) )
 
-		self.n_asset_count += 1
+		return len( buffer )
 	
 	def WriteAsset( self, asset: XImage | XMaterial | XModel ) -> None:
 		"""
@@ -882,6 +968,38 @@ class GDT():
 		asset = an XAsset to be written to the GDT
 		"""
 		self.NewAsset( asset )
+
+	def Diff( self, other, resolve: bool = true ) -> GDTDiff:
+		"""
+		Returns a `GDTDiff` of the assets that were added, removed & changed in `other` compared to this GDT
+
+		### @params:
+
+		`other` | a GDT path, a `GDT`, a `GDTIndex` or a list of XAssets
+
+		`resolve` | compare inherited properties of child assets too
+		"""
+		return diff_gdts( self.index, other, resolve )
+
+	def Merge( self, other, prefer: str = 'new', remove_assets: bool = false, remove_properties: bool = false ) -> GDTDiff:
+		"""
+		Merges the assets in `other` into this GDT (e.g. a regenerated GDT into a hand-edited one) & returns the `GDTDiff`
+
+		### @params:
+
+		`other` | a GDT path, a `GDT`, a `GDTIndex` or a list of XAssets
+
+		`prefer` | 'new' to update properties that are different in `other`, 'old' to only add what's missing
+
+		`remove_assets` | delete assets that aren't in `other`
+
+		`remove_properties` | delete properties that aren't in `other`
+		"""
+		merged, diff = merge_gdts( self.index, other, prefer, remove_assets, remove_properties )
+		if diff:
+			self.index = merged
+			self.__on_modified()
+		return diff
 	
 	def _read( self ) -> str:
 		with open( self.path ) as file: __str = file.read()
@@ -893,75 +1011,102 @@ class GDT():
 
 
 
-	def __clean_up__( self ):
+	def __clean_up__( self, strip_inherited: bool = false ) -> tuple[ int, int, int ]:
 		"""
 		Cleans up and optimises the GDT:
 		- Hierarchies each image to the color map of the material to lower GDT size (APE optimisation)
 		- ... that's all it does for now lol
+
+		`strip_inherited` | Also remove the properties of each re-parented image that are the same as its color map's.
+		The image then inherits them, so later edits to the color map change it too
+
+		Runs in a single pass over the index. Returns a tuple of ( images re-parented, bytes saved by re-parenting, bytes saved by `strip_inherited` )
 		"""
+		index = self.index
+		color_maps = { name for name in index.assets if name.endswith( '_c' ) and index.get_type( name ) == 'image.gdf' }
 
-		line_array = self._readlines()
-		ximages: list[ tuple[ int, str ] ] = [] # Filter out ximages
+		reparented = 0
+		reparent_saved = 0
+		strip_saved = 0
 
-		# Get all the image asset names
-		for idx, line in enumerate( line_array ):
-			if '( "image.gdf" )' not in line:
+		for name, entry in index.assets.items():
+			# Get all the (non-child) image assets
+			if entry.is_child() or entry.type != 'image.gdf' or '_' not in name:
 				continue
 
-			name = line.split( '"' )[1]
-			if line.endswith( '_c' ): continue
-			base_name = name[ :name.rindex( '_' ) ]
-			ximages.append( ( idx, base_name ) )
+			"""
+			"i_pv_city_new_york_01_o" ( "image.gdf" )
+			                         ^ splitting here & keeping left side
+			"""
+			color_map = name[ :name.rindex( '_' ) ] + '_c'
 
-		"""
-		"i_pv_city_new_york_01_o" ( "image.gdf" )
-		                         ^ splitting here & keeping left side
-		"""
-		for _line_idx, _base in ximages:
-			
-			if not self.asset_exists( _base + '_c' ):
-				#print( "Could not find colour map for line:\n" + line_array[ _line_idx ][ :-1 ] )
+			# Extra safety measure to avoid parenting an asset to itself
+			if color_map == name or color_map not in color_maps:
 				continue
 
-			# Extra safety measure to avoid parenting an asset to itself
-			if _base + '_c' in line_array[ _line_idx ]:
+			# Or to one of its own children
+			if name in index.children and color_map in index.descendants( name ):
 				continue
-			
-			new_line = line_array[ _line_idx ].split( ' ' )[0] + f' [ "{_base + "_c"}" ]\n'
-			line_array[ _line_idx ] = new_line
-			#print( "new_line =", new_line[ :-1 ] )
-
-		with open( self.path, 'w' ) as self.file:
-			if len( line_array ) != 0:
-				self.file.writelines( line_array )
-			
-			
-
-	def save_gdt( self, optimise_gdt: bool = true ) -> None:
-		self.CloseGDT( optimise_gdt )
+
+			size = entry.size()
+			index.set_parent( name, color_map )
+			reparented += 1
+			reparent_saved += size - entry.size()
+
+			if strip_inherited:
+				size = entry.size()
+				inherited = index.resolve( color_map )
+				entry.remove_properties( [ key for key, value in entry.properties.items() if inherited.get( key ) == value ] )
+				index.invalidate( name )
+				strip_saved += size - entry.size()
+
+		if reparented:
+			self.__on_modified()
+			log.info( f'Optimised {self.name}.gdt: re-parented {reparented} images to their color maps, saving {reparent_saved} bytes'
+				+ ( f' (+{strip_saved} bytes of inherited properties stripped)' if strip_inherited else '' ) )
+
+		return reparented, reparent_saved, strip_saved
+
+	def save_gdt( self, optimise_gdt: bool = true, strip_inherited: bool = false ) -> tuple[ int, int, int ] | None:
+		return self.CloseGDT( optimise_gdt, strip_inherited )
 	
-	def CloseGDT( self, optimise_gdt: bool = true ) -> None:
-		
-		file_data = self._read()
+	def CloseGDT( self, optimise_gdt: bool = true, strip_inherited: bool = false ) -> tuple[ int, int, int ] | None:
+		"""
+		Writes the in-memory GDT to disk (only if it has been modified)
 
-		if file_data.strip() == '':
-			return
+		The GDT is written to a temporary file first, which then replaces the GDT, 
+		so the GDT is never left half written
 
-		file_data = self._readlines()
+		If `optimise_gdt` is true, returns the ( images re-parented, bytes saved by re-parenting, bytes saved by `strip_inherited` )
+		from `__clean_up__()`
+		"""
+		clean_up_stats = self.__clean_up__( strip_inherited ) if optimise_gdt else undefined
 
-		while file_data[ -1 ] == '\n':
-			print( "CloseGDT(): Last line was a new line" )
-			file_data = file_data[ :-1 ]
+		if self.modified:
+			self.__write( self.serialize() )
+			self.modified = false
 
-		if not file_data[ -1 ] == '}':
-			file_data += '}'
-		
-		file_data += '\n'
-		with open( self.path, 'w' ) as self.file:
-			self.file.writelines( file_data )
-		
-		if optimise_gdt:
-			self.__clean_up__()
+		return clean_up_stats
+
+	def __write( self, data: str ) -> None:
+		_dir = os.path.dirname( os.path.abspath( self.path ) )
+		handle, temp_path = tempfile.mkstemp( prefix=f'.{self.name}.', suffix='.tmp', dir=_dir )
+
+		try:
+			with open( handle, 'w' ) as f:
+				f.write( data )
+			# mkstemp() files are only readable by the owner, so keep the GDT's permissions
+			if pathlib.exists( self.path ):
+				os.chmod( temp_path, stat.S_IMODE( os.stat( self.path ).st_mode ) )
+			os.replace( temp_path, self.path )
+		except BaseException:
+			if pathlib.exists( temp_path ):
+				os.remove( temp_path )
+			raise
+
+		# We already know what's in the file, so keep the cache up to date without re-parsing it
+		if self.cache_path is not undefined:
+			write_index_cache( self.cache_path, self.index, self.path, os.stat( self.path ), content_hash( data ) )
 
 
 
@@ -972,6 +1117,9 @@ __all__ = [
 	'XMaterial',
 	'XModel',
 	'GDT',
+	'KeywordMatcher',
+	'classify_material',
+	'classify_materials',
 	'mw4_get_semantic'
 	]
 
@@ -1,18 +1,311 @@
-from pv_py_utils import console
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable
+import os, struct, threading
 import numpy as np, PIL.Image
 
+# PIL modes with an alpha channel
+ALPHA_MODES = ( 'RGBA', 'RGBa', 'LA', 'La', 'PA' )
+
+# Number of channels in each PIL mode
+MODE_CHANNELS = {
+	'1' : 1, 'L' : 1, 'P' : 1, 'I' : 1, 'I;16' : 1, 'F' : 1,
+	'LA' : 2, 'La' : 2, 'PA' : 2,
+	'RGB' : 3, 'YCbCr' : 3, 'LAB' : 3, 'HSV' : 3,
+	'RGBA' : 4, 'RGBa' : 4, 'RGBX' : 4, 'CMYK' : 4
+}
+
+
+
+class ImageInfo():
+	"""
+	What's known about an image without decoding it
+
+	`width`, `height` | Dimensions of the image, in pixels
+
+	`mode` | The PIL mode of the image, e.g. 'RGB', 'RGBA', 'P' (the mode PIL would open the image as)
+
+	`has_alpha` | True if the image has an alpha channel or transparency data
+
+	`channels` | The number of channels in the image
+	"""
+	__slots__ = ( 'width', 'height', 'mode', 'has_alpha', 'channels' )
+
+	def __init__( self, width: int, height: int, mode: str, has_alpha: bool = None ) -> None:
+		self.width = width
+		self.height = height
+		self.mode = mode
+		self.has_alpha = has_alpha if has_alpha is not None else mode in ALPHA_MODES
+		self.channels = MODE_CHANNELS.get( mode, len( mode ) )
+
+	@property
+	def size( self ) -> tuple[ int, int ]:
+		return self.width, self.height
+
+	def __repr__( self ):
+		return f'ImageInfo({self.width}x{self.height}, {self.mode}, has_alpha={self.has_alpha})'
+
+
+
+# Process-wide caches of absolute path -> ( mtime_ns, size, result ), shared by every XImage / XMaterial
+_cache_lock = threading.Lock()
+_probe_cache: dict[ str, tuple[ int, int, ImageInfo ] ] = {}
+# ( max_size, tolerance ) -> a cache of alpha_usage() results
+_alpha_caches: dict[ tuple[ int, int ], dict[ str, tuple[ int, int, str ] ] ] = {}
+
+def _cached( cache: dict, _img_path: str, compute: Callable[ [ str ], object ] ) -> object:
+	"""Returns `compute( _img_path )`, or the cached result if the file hasn't changed since it was computed"""
+	stat = os.stat( _img_path )
+	key = os.path.abspath( _img_path )
+
+	with _cache_lock:
+		hit = cache.get( key )
+	if hit is not None and hit[ 0 ] == stat.st_mtime_ns and hit[ 1 ] == stat.st_size:
+		return hit[ 2 ]
+
+	result = compute( _img_path )
+	with _cache_lock:
+		cache[ key ] = ( stat.st_mtime_ns, stat.st_size, result )
+	return result
+
+def clear_cache():
+	'''Forgets every cached image probe & alpha_usage() result'''
+	with _cache_lock:
+		_probe_cache.clear()
+		_alpha_caches.clear()
+
+def _probe_pil( _img_path: str ) -> ImageInfo:
+	# PIL only reads the header until the pixels are accessed
+	with PIL.Image.open( _img_path ) as img:
+		try:
+			has_transparency = img.has_transparency_data
+		except AttributeError:
+			# Older Pillow
+			has_transparency = img.mode in ALPHA_MODES or 'transparency' in img.info
+		info = ImageInfo( img.size[ 0 ], img.size[ 1 ], img.mode, has_transparency )
+		info.channels = len( img.getbands() )
+		return info
+
+
+# --HEADER PROBES
+# Each reads just enough of an image's header to build its ImageInfo without PIL, or returns None if it can't
+
+# ( bit depth, colour type ) -> PIL mode
+_PNG_MODES = {
+	( 1, 0 ) : '1', ( 2, 0 ) : 'L', ( 4, 0 ) : 'L', ( 8, 0 ) : 'L', ( 16, 0 ) : 'I;16',
+	( 8, 2 ) : 'RGB', ( 16, 2 ) : 'RGB',
+	( 1, 3 ) : 'P', ( 2, 3 ) : 'P', ( 4, 3 ) : 'P', ( 8, 3 ) : 'P',
+	( 8, 4 ) : 'LA', ( 16, 4 ) : 'RGBA',
+	( 8, 6 ) : 'RGBA', ( 16, 6 ) : 'RGBA'
+}
+
+def _probe_png( f ) -> ImageInfo | None:
+	f.seek( 8 )
+	length, chunk, width, height, depth, colour_type = struct.unpack( '>I4sIIBB', f.read( 18 ) )
+	mode = _PNG_MODES.get( ( depth, colour_type ) )
+	if chunk != b'IHDR' or mode is None:
+		return None
+
+	# A tRNS chunk (transparency for L / RGB / P images) can only come before the pixel data
+	has_transparency = mode in ALPHA_MODES
+	f.seek( 8 + 8 + length + 4 )
+	while not has_transparency:
+		header = f.read( 8 )
+		if len( header ) < 8:
+			break
+		length, chunk = struct.unpack( '>I4s', header )
+		if chunk in ( b'IDAT', b'IEND' ):
+			break
+		has_transparency = chunk == b'tRNS'
+		f.seek( length + 4, os.SEEK_CUR )
+
+	return ImageInfo( width, height, mode, has_transparency )
+
+def _probe_tga( f ) -> ImageInfo | None:
+	header = f.read( 18 )
+	colour_map_type, image_type = header[ 1 ], header[ 2 ]
+	map_depth = header[ 7 ]
+	width, height = struct.unpack( '<HH', header[ 12:16 ] )
+	depth = header[ 16 ]
+	if colour_map_type not in ( 0, 1 ) or not width or not height or depth not in ( 1, 8, 16, 24, 32 ):
+		return None
+
+	if image_type in ( 3, 11 ):
+		mode = { 1 : '1', 16 : 'LA' }.get( depth, 'L' )
+	elif image_type in ( 1, 9 ):
+		if not colour_map_type:
+			return ImageInfo( width, height, 'L' )
+		# 16 & 32 bit palettes have alpha
+		return ImageInfo( width, height, 'P', map_depth in ( 16, 32 ) )
+	elif image_type in ( 2, 10 ):
+		mode = 'RGB' if depth == 24 else 'RGBA'
+	else:
+		return None
+
+	return ImageInfo( width, height, mode )
+
+# DDS pixel format flags
+_DDPF_ALPHAPIXELS = 0x1
+_DDPF_FOURCC = 0x4
+_DDPF_PALETTEINDEXED8 = 0x20
+_DDPF_RGB = 0x40
+_DDPF_LUMINANCE = 0x20000
+
+_DDS_FOURCC_MODES = {
+	b'DXT1' : 'RGBA', b'DXT3' : 'RGBA', b'DXT5' : 'RGBA',
+	b'BC4U' : 'L', b'ATI1' : 'L',
+	b'BC5S' : 'RGB', b'BC5U' : 'RGB', b'ATI2' : 'RGB'
+}
+
+# DXGI_FORMAT -> PIL mode, for DX10 DDS files
+_DXGI_MODES = {
+	27 : 'RGBA', 28 : 'RGBA', 29 : 'RGBA',	# R8G8B8A8
+	70 : 'RGBA', 71 : 'RGBA', 72 : 'RGBA',	# BC1
+	73 : 'RGBA', 74 : 'RGBA', 75 : 'RGBA',	# BC2
+	76 : 'RGBA', 77 : 'RGBA', 78 : 'RGBA',	# BC3
+	79 : 'L', 80 : 'L', 81 : 'L',			# BC4
+	82 : 'RGB', 83 : 'RGB', 84 : 'RGB',		# BC5
+	94 : 'RGB', 95 : 'RGB', 96 : 'RGB',		# BC6H
+	97 : 'RGBA', 98 : 'RGBA', 99 : 'RGBA'	# BC7
+}
+
+def _probe_dds( f ) -> ImageInfo | None:
+	header = f.read( 128 )
+	height, width = struct.unpack( '<II', header[ 12:20 ] )
+	flags, fourcc, bit_count = struct.unpack( '<I4sI', header[ 80:92 ] )
+
+	if flags & _DDPF_RGB:
+		mode = 'RGBA' if flags & _DDPF_ALPHAPIXELS else 'RGB'
+	elif flags & _DDPF_LUMINANCE:
+		mode = 'LA' if bit_count == 16 and flags & _DDPF_ALPHAPIXELS else 'L'
+	elif flags & _DDPF_PALETTEINDEXED8:
+		return ImageInfo( width, height, 'P', True )
+	elif flags & _DDPF_FOURCC and fourcc == b'DX10':
+		mode = _DXGI_MODES.get( struct.unpack( '<I', f.read( 4 ) )[ 0 ] )
+	elif flags & _DDPF_FOURCC:
+		mode = _DDS_FOURCC_MODES.get( fourcc )
+	else:
+		mode = None
+
+	return ImageInfo( width, height, mode ) if mode is not None else None
+
+# TIFF tags
+_TIFF_WIDTH = 256
+_TIFF_HEIGHT = 257
+_TIFF_BITS_PER_SAMPLE = 258
+_TIFF_PHOTOMETRIC = 262
+_TIFF_SAMPLES_PER_PIXEL = 277
+_TIFF_EXTRA_SAMPLES = 338
+
+# TIFF field type -> struct format of one value
+_TIFF_TYPES = { 1 : 'B', 3 : 'H', 4 : 'I', 6 : 'b', 8 : 'h', 9 : 'i' }
+
+def _probe_tiff( f ) -> ImageInfo | None:
+	order = '<' if f.read( 2 ) == b'II' else '>'
+	f.seek( 4 )
+	f.seek( struct.unpack( order + 'I', f.read( 4 ) )[ 0 ] )
+
+	tags = {}
+	count, = struct.unpack( order + 'H', f.read( 2 ) )
+	entries = f.read( count * 12 )
+	for idx in range( count ):
+		tag, field_type, value_count = struct.unpack_from( order + 'HHI', entries, idx * 12 )
+		fmt = _TIFF_TYPES.get( field_type )
+		# Only the first value of each tag is needed, which is inline unless the values don't fit in 4 bytes
+		if fmt is not None and value_count * struct.calcsize( fmt ) <= 4:
+			tags[ tag ] = struct.unpack_from( order + fmt, entries, idx * 12 + 8 )[ 0 ]
+		elif fmt is not None:
+			offset, = struct.unpack_from( order + 'I', entries, idx * 12 + 8 )
+			position = f.tell()
+			f.seek( offset )
+			tags[ tag ] = struct.unpack( order + fmt, f.read( struct.calcsize( fmt ) ) )[ 0 ]
+			f.seek( position )
+
+	width, height = tags.get( _TIFF_WIDTH ), tags.get( _TIFF_HEIGHT )
+	samples = tags.get( _TIFF_SAMPLES_PER_PIXEL, 1 )
+	bits = tags.get( _TIFF_BITS_PER_SAMPLE, 1 )
+	photometric = tags.get( _TIFF_PHOTOMETRIC )
+	extra = tags.get( _TIFF_EXTRA_SAMPLES, 0 )
+	if not width or not height or bits not in ( 1, 8 ):
+		return None
+
+	# 1 = associated (premultiplied) alpha, 2 = unassociated alpha
+	if photometric in ( 0, 1 ) and samples == 1:
+		mode = '1' if bits == 1 else 'L'
+	elif photometric in ( 0, 1 ) and samples == 2 and bits == 8:
+		mode = 'La' if extra == 1 else 'LA'
+	elif photometric == 2 and samples == 3 and bits == 8:
+		mode = 'RGB'
+	elif photometric == 2 and samples == 4 and bits == 8:
+		mode = { 1 : 'RGBa', 2 : 'RGBA' }.get( extra, 'RGBX' )
+	elif photometric == 3 and samples == 1:
+		mode = 'P'
+	else:
+		return None
+
+	return ImageInfo( width, height, mode )
+
+# ( magic bytes, probe ) for each format that can be identified by its first bytes
+_HEADER_PROBES = (
+	( b'\x89PNG\r\n\x1a\n', _probe_png ),
+	( b'DDS ', _probe_dds ),
+	( b'II*\x00', _probe_tiff ),
+	( b'MM\x00*', _probe_tiff )
+)
+
+def probe_header( _img_path: str ) -> ImageInfo | None:
+	'''
+	Returns the ImageInfo of a PNG, TGA, DDS or TIFF image by parsing its header directly, without PIL or decoding any pixels
+
+	Returns None if the image isn't one of those formats, or its header can't be parsed
+	'''
+	with open( _img_path, 'rb' ) as f:
+		magic = f.read( 8 )
+		f.seek( 0 )
+		try:
+			for _magic, _header_probe in _HEADER_PROBES:
+				if magic.startswith( _magic ):
+					return _header_probe( f )
+			# TGAs don't have any magic bytes
+			if _img_path.lower().endswith( '.tga' ):
+				return _probe_tga( f )
+		except ( struct.error, IndexError ):
+			return None
+	return None
+
+def _probe( _img_path: str ) -> ImageInfo:
+	info = probe_header( _img_path )
+	return info if info is not None else _probe_pil( _img_path )
+
+def probe( _img_path: str ) -> ImageInfo:
+	'''
+	Returns the ImageInfo of an image, reading only its header (cached by path & mtime)
+
+	PNG, TGA, DDS & TIFF headers are parsed directly (see `probe_header()`), other formats are opened with PIL
+	'''
+	return _cached( _probe_cache, _img_path, _probe )
+
+def probe_all( _img_paths: Iterable[ str ], workers: int = None ) -> list[ ImageInfo | None ]:
+	'''
+	Probes the headers of many images on a thread pool, filling the cache
+
+	Returns the ImageInfo of each image (in order), or None for images that couldn't be read
+	'''
+	def _try_probe( _img_path: str ) -> ImageInfo | None:
+		try:
+			return probe( _img_path )
+		except ( OSError, ValueError ):
+			return None
+
+	with ThreadPoolExecutor( max_workers=workers ) as pool:
+		return list( pool.map( _try_probe, _img_paths ) )
+
 def get_dimensions( _img_path: str ):
 	#return imread( _img_path ).shape[ :2 ]
-	return PIL.Image.open( _img_path ).size
+	return probe( _img_path ).size
 
 def has_alpha( _img_path: str ):
 	'''Returns True if image path has alpha channel'''
-	try:
-		return PIL.Image.open( _img_path ).has_transparency_data
-	except AttributeError:
-		console.log( 'engine.ImageHasAlpha(): Falling back to slower method for transparency deduction' )
-	
-	return np.array( PIL.Image.open( _img_path ) ).shape[ -1 ] == 4
+	return probe( _img_path ).has_alpha
 	
 	# The below code works fine, except it's really
 	# expensive & slows the whole program down by 50-100x
@@ -34,3 +327,65 @@ def has_alpha( _img_path: str ):
 			return True
 
 	return False
+
+
+
+# --ALPHA USAGE
+OPAQUE = 'opaque'	# No alpha channel, or every pixel is fully opaque
+BINARY = 'binary'	# Every pixel is either fully opaque or fully transparent (alpha testing is enough)
+BLENDED = 'blended'	# Some pixels are partially transparent
+
+# Rows of the alpha band scanned at once. Scanning stops at the first chunk with partial transparency
+ALPHA_SCAN_ROWS = 256
+
+def _alpha_band( img: PIL.Image.Image, max_size: int ) -> np.ndarray:
+	if max_size:
+		# Only JPEGs (no alpha anyway) actually decode at a lower resolution, but it's free to ask
+		img.draft( img.mode, ( max_size, max_size ) )
+
+	if img.mode not in ALPHA_MODES:
+		# Palette alpha / tRNS transparency
+		img = img.convert( 'RGBA' )
+	alpha = np.asarray( img.getchannel( len( img.getbands() ) - 1 ) )
+
+	if max_size and max( alpha.shape ) > max_size:
+		# Nearest neighbour sampling, so a binary alpha band stays binary
+		step = -( -max( alpha.shape ) // max_size )
+		alpha = alpha[ ::step, ::step ]
+	return alpha
+
+def _alpha_usage( _img_path: str, max_size: int, tolerance: int ) -> str:
+	if not probe( _img_path ).has_alpha:
+		return OPAQUE
+
+	with PIL.Image.open( _img_path ) as img:
+		alpha = _alpha_band( img, max_size )
+
+	usage = OPAQUE
+	for start in range( 0, alpha.shape[ 0 ], ALPHA_SCAN_ROWS ):
+		chunk = alpha[ start : start + ALPHA_SCAN_ROWS ]
+		if chunk.min() >= 255 - tolerance:
+			continue
+
+		# ( a - tolerance - 1 ) wraps around for a <= tolerance, so this is tolerance < a < 255 - tolerance
+		if np.any( ( chunk - np.uint8( tolerance + 1 ) ) < 254 - 2 * tolerance ):
+			return BLENDED
+		usage = BINARY
+
+	return usage
+
+def alpha_usage( _img_path: str, max_size: int = 0, tolerance: int = 0 ) -> str:
+	'''
+	Returns how an image uses its alpha channel: OPAQUE, BINARY or BLENDED (cached by path & mtime)
+
+	Unlike has_alpha(), this decodes the image, but only if it has an alpha channel / transparency at all
+
+	### @params
+	`max_size` | Only scan the alpha band at up to this many pixels along each side (0 scans every pixel). 
+	Faster, but small partially transparent areas can be missed
+
+	`tolerance` | Alpha values within this much of 0 / 255 count as fully transparent / opaque (e.g. to ignore compression noise)
+	'''
+	with _cache_lock:
+		cache = _alpha_caches.setdefault( ( max_size, tolerance ), {} )
+	return _cached( cache, _img_path, lambda _path: _alpha_usage( _path, max_size, tolerance ) )
@@ -0,0 +1,14 @@
+import importlib.util
+import os
+import sys
+
+# The package imports itself as pv_py_utils, which isn't the name of the checkout's directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if 'pv_py_utils' not in sys.modules:
+    spec = importlib.util.spec_from_file_location(
+        'pv_py_utils', os.path.join(ROOT, '__init__.py'),
+        submodule_search_locations=[ROOT])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules['pv_py_utils'] = module
+    spec.loader.exec_module(module)
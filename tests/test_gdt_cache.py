@@ -0,0 +1,134 @@
+import marshal
+import os
+
+import pytest
+
+from pv_py_utils.gdtlib import parser
+from pv_py_utils.gdtlib.parser import (INDEX_CACHE_VERSION, load_gdt_index,
+                                       read_index_cache)
+
+GDT_TEXT = '''{
+	"P" ( "image.gdf" )
+	{
+		"a" "1"
+	}
+	"C" [ "P" ]
+	{
+		"b" "1"
+	}
+}
+'''
+
+
+@pytest.fixture
+def gdt(tmp_path):
+    path = tmp_path / 'test.gdt'
+    path.write_text(GDT_TEXT)
+    return str(path), str(tmp_path / 'test.gdt.cache')
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    '''
+    Counts the full parses done by load_gdt_index()
+    '''
+    calls = []
+    parse_gdt = parser.parse_gdt
+
+    def counting_parse_gdt(*args, **kwargs):
+        calls.append(args)
+        return parse_gdt(*args, **kwargs)
+    monkeypatch.setattr(parser, 'parse_gdt', counting_parse_gdt)
+    return calls
+
+
+def snapshot(index):
+    return {name: (entry.type, entry.parent, entry.properties)
+            for name, entry in index.assets.items()}
+
+
+def test_unchanged_gdt_is_loaded_from_the_cache(gdt, parses):
+    path, cache_path = gdt
+    first = load_gdt_index(path, cache_path)
+    assert len(parses) == 1
+    assert read_index_cache(cache_path) is not None
+
+    second = load_gdt_index(path, cache_path)
+    assert len(parses) == 1
+    assert snapshot(second) == snapshot(first)
+    assert second.resolve('C') == {'a': '1', 'b': '1'}
+
+
+def test_touched_gdt_reuses_the_cache_by_hash(gdt, parses):
+    path, cache_path = gdt
+    load_gdt_index(path, cache_path)
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    index = load_gdt_index(path, cache_path)
+    assert len(parses) == 1
+    assert snapshot(index)['P'][2] == {'a': '1'}
+    # The cache is updated with the new mtime
+    assert read_index_cache(cache_path)['mtime_ns'] == os.stat(path).st_mtime_ns
+
+
+def test_changed_content_invalidates_the_cache(gdt, parses):
+    path, cache_path = gdt
+    load_gdt_index(path, cache_path)
+    stat = os.stat(path)
+
+    # Same size, so only the content hash tells the versions apart
+    with open(path, 'w') as f:
+        f.write(GDT_TEXT.replace('"a" "1"', '"a" "2"'))
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert os.stat(path).st_size == stat.st_size
+
+    index = load_gdt_index(path, cache_path)
+    assert len(parses) == 2
+    assert index.resolve('C') == {'a': '2', 'b': '1'}
+    assert snapshot(load_gdt_index(path, cache_path)) == snapshot(index)
+    assert len(parses) == 2
+
+
+@pytest.mark.parametrize('data', [
+    b'',
+    b'not a marshal stream',
+    marshal.dumps(['not', 'a', 'dict']),
+    marshal.dumps({'version': (INDEX_CACHE_VERSION - 1, marshal.version)}),
+    # The right version, but no rows
+    marshal.dumps({'version': (INDEX_CACHE_VERSION, marshal.version)}),
+])
+def test_corrupt_or_stale_cache_falls_back_to_a_parse(gdt, parses, data):
+    path, cache_path = gdt
+    expected = snapshot(load_gdt_index(path))
+    with open(cache_path, 'wb') as f:
+        f.write(data)
+
+    assert read_index_cache(cache_path) is None
+    assert snapshot(load_gdt_index(path, cache_path)) == expected
+    assert len(parses) == 2
+    # The bad cache is replaced with a good one
+    assert read_index_cache(cache_path) is not None
+
+
+def test_cache_of_another_gdt_is_ignored(gdt, tmp_path, parses):
+    path, cache_path = gdt
+    other = tmp_path / 'other.gdt'
+    other.write_text(GDT_TEXT.replace('"a" "1"', '"a" "3"'))
+    load_gdt_index(str(other), cache_path)
+
+    index = load_gdt_index(path, cache_path)
+    assert len(parses) == 2
+    assert index.resolve('P') == {'a': '1'}
+
+
+def test_truncated_cache_falls_back_to_a_parse(gdt, parses):
+    path, cache_path = gdt
+    expected = snapshot(load_gdt_index(path, cache_path))
+    with open(cache_path, 'rb') as f:
+        data = f.read()
+    with open(cache_path, 'wb') as f:
+        f.write(data[:len(data) // 2])
+
+    assert snapshot(load_gdt_index(path, cache_path)) == expected
+    assert len(parses) == 2
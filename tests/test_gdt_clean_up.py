@@ -0,0 +1,51 @@
+from pv_py_utils.gdtlib.xasset import GDT
+
+GDT_TEXT = '''{
+	"i_wall_c" ( "image.gdf" )
+	{
+		"compressionMethod" "compressed high color"
+		"semanticType" "diffuseMap"
+	}
+	"i_wall_n" ( "image.gdf" )
+	{
+		"compressionMethod" "compressed high color"
+		"semanticType" "normalMap"
+	}
+}
+'''
+
+
+def write_gdt(tmp_path):
+    path = tmp_path / 'test.gdt'
+    path.write_text(GDT_TEXT)
+    return str(path)
+
+
+def test_clean_up_keeps_own_properties(tmp_path):
+    path = write_gdt(tmp_path)
+    gdt = GDT(path)
+    reparented, reparent_saved, strip_saved = gdt.save_gdt()
+
+    assert reparented == 1
+    assert strip_saved == 0
+    assert reparent_saved == len(GDT_TEXT) - len(open(path).read())
+
+    gdt = GDT(path)
+    assert gdt.index.get('i_wall_n').parent == 'i_wall_c'
+    assert gdt.index.get('i_wall_n').properties == {
+        'compressionMethod': 'compressed high color',
+        'semanticType': 'normalMap'}
+
+
+def test_clean_up_strip_inherited_is_opt_in(tmp_path):
+    path = write_gdt(tmp_path)
+    gdt = GDT(path)
+    reparented, reparent_saved, strip_saved = gdt.save_gdt(strip_inherited=True)
+
+    assert reparented == 1
+    assert strip_saved > 0
+    assert reparent_saved + strip_saved == len(GDT_TEXT) - len(open(path).read())
+
+    gdt = GDT(path)
+    assert gdt.index.get('i_wall_n').properties == {'semanticType': 'normalMap'}
+    assert gdt.index.resolve('i_wall_n')['compressionMethod'] == 'compressed high color'
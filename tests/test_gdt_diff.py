@@ -0,0 +1,78 @@
+from pv_py_utils.gdtlib import diff_gdts, merge_gdts, parse_gdt, serialize_gdt
+
+
+def make_index(text):
+    return parse_gdt(text.splitlines(keepends=True), keep_lines=True)
+
+
+OLD = '''{
+	"P" ( "image.gdf" )
+	{
+		"a" "1"
+	}
+	"C" [ "P" ]
+	{
+		"b" "1"
+	}
+}
+'''
+
+
+def test_merge_keeps_inherited_properties_inherited():
+    new = OLD.replace('"a" "1"', '"a" "2"')
+    merged, diff = merge_gdts(make_index(OLD), make_index(new))
+
+    # The change to P is inherited by C, so it's reported for both...
+    assert diff.changed['P'].changed == {'a': ('1', '2')}
+    assert diff.changed['C'].changed == {'a': ('1', '2')}
+
+    # ...but only written into P
+    assert merged.get('P').properties == {'a': '2'}
+    assert merged.get('C').properties == {'b': '1'}
+    assert merged.resolve('C') == {'a': '2', 'b': '1'}
+    assert serialize_gdt(merged.assets.values()) == new
+
+
+def test_merge_child_own_property_change():
+    new = OLD.replace('"b" "1"', '"b" "2"\n\t\t"c" "3"')
+    merged, _ = merge_gdts(make_index(OLD), make_index(new))
+
+    assert merged.get('P').properties == {'a': '1'}
+    assert merged.get('C').properties == {'b': '2', 'c': '3'}
+
+
+HEADER_OLD = '''{
+	"X" ( "xmodel.gdf" )
+	{
+		"filename" "a"
+	}
+}
+'''
+
+HEADER_NEW = '''{
+	"X" ( "image.gdf" )
+	{
+		"baseImage" "b"
+	}
+}
+'''
+
+
+def test_merge_header_change_prefer_old_keeps_old_asset():
+    merged, diff = merge_gdts(make_index(HEADER_OLD), make_index(HEADER_NEW),
+                              prefer='old')
+
+    assert diff.changed['X'].header_changed()
+    assert merged.get('X').type == 'xmodel.gdf'
+    assert merged.get('X').properties == {'filename': 'a'}
+
+
+def test_merge_header_change_prefer_new_takes_new_asset():
+    merged, _ = merge_gdts(make_index(HEADER_OLD), make_index(HEADER_NEW))
+
+    assert merged.get('X').type == 'image.gdf'
+    assert merged.get('X').properties == {'baseImage': 'b'}
+
+
+def test_diff_unchanged():
+    assert not diff_gdts(make_index(OLD), make_index(OLD))
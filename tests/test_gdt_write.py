@@ -0,0 +1,84 @@
+import os
+import stat
+
+import pytest
+
+from pv_py_utils.gdtlib.parser import iter_assets, load_gdt_index, write_gdt
+from pv_py_utils.gdtlib.xasset import GDT
+
+GDT_TEXT = '''{
+	"i_wall_c" ( "image.gdf" )
+	{
+		"semanticType" "diffuseMap"
+	}
+	"i_wall_n" ( "image.gdf" )
+	{
+		"semanticType" "normalMap"
+	}
+}
+'''
+
+
+@pytest.fixture
+def gdt_path(tmp_path):
+    path = tmp_path / 'test.gdt'
+    path.write_text(GDT_TEXT)
+    os.chmod(path, 0o640)
+    return str(path)
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def fail_replace(src, dst):
+    raise OSError('replace failed')
+
+
+def test_save_gdt_keeps_the_file_mode(gdt_path, tmp_path):
+    gdt = GDT(gdt_path)
+    gdt.save_gdt()
+
+    assert mode(gdt_path) == 0o640
+    assert os.listdir(tmp_path) == ['test.gdt']
+    assert load_gdt_index(gdt_path).get('i_wall_n').parent == 'i_wall_c'
+
+
+def test_failed_save_gdt_leaves_the_gdt_alone(gdt_path, tmp_path,
+                                              monkeypatch):
+    gdt = GDT(gdt_path)
+    monkeypatch.setattr(os, 'replace', fail_replace)
+    with pytest.raises(OSError):
+        gdt.save_gdt()
+
+    with open(gdt_path) as f:
+        assert f.read() == GDT_TEXT
+    assert os.listdir(tmp_path) == ['test.gdt']
+
+
+def test_write_gdt_rewrites_the_gdt_in_place(gdt_path, tmp_path):
+    entries = list(iter_assets(gdt_path))
+    assert write_gdt(gdt_path, reversed(entries)) == 2
+
+    assert mode(gdt_path) == 0o640
+    assert os.listdir(tmp_path) == ['test.gdt']
+    assert list(load_gdt_index(gdt_path).assets) == ['i_wall_n', 'i_wall_c']
+
+
+def test_write_gdt_streams_from_the_gdt_it_replaces(gdt_path):
+    assert write_gdt(gdt_path, iter_assets(gdt_path)) == 2
+    with open(gdt_path) as f:
+        assert f.read() == GDT_TEXT
+
+
+def test_failed_write_gdt_leaves_the_gdt_alone(gdt_path, tmp_path):
+    def entries():
+        yield from iter_assets(gdt_path)
+        raise ValueError('bad entry')
+
+    with pytest.raises(ValueError):
+        write_gdt(gdt_path, entries())
+
+    with open(gdt_path) as f:
+        assert f.read() == GDT_TEXT
+    assert os.listdir(tmp_path) == ['test.gdt']
@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from pv_py_utils.PyCoD import _lz4
+
+
+def random_bytes(size, seed=0, alphabet=None):
+    rng = random.Random(seed)
+    if alphabet is None:
+        return bytes(rng.getrandbits(8) for _ in range(size))
+    return bytes(rng.choice(alphabet) for _ in range(size))
+
+
+def decode(compressed, size):
+    return bytes(_lz4.uncompress_fast(bytes(compressed), 0, size))
+
+
+@pytest.mark.parametrize('level', [1, 2, 4])
+def test_compress_matches_past_the_chain_window(level):
+    # Repeats just inside & just outside MAX_DISTANCE, so positions more
+    #  than one window apart share chain entries
+    block = random_bytes(_lz4.MAX_DISTANCE + 1000, seed=1)
+    data = block + block[:3000] + random_bytes(100, seed=2) + block[-3000:]
+    compressed = _lz4.compress_matches(data, level)
+    # Only the repeat inside MAX_DISTANCE can be matched
+    assert len(compressed) < len(data) - 2500
+    assert decode(compressed, len(data)) == data
+
+
+PAYLOADS = {
+    'empty': b'',
+    'one byte': b'x',
+    'shorter than MF_LIMIT': b'abcdabcdab',
+    'MF_LIMIT': b'abcdabcdabcd',
+    'just over MF_LIMIT': b'abcdabcdabcda',
+    'run': b'a' * 1000,
+    # Matches that overlap their own output (offset < length)
+    'overlapping': b'ab' * 700 + b'abc' * 300 + b'0123456' * 200,
+    'text': b'VERT 12\nOFFSET 1.0 2.0 3.0\nBONES 1\nBONE 0 1.0\n\n' * 60,
+    'low entropy': random_bytes(4000, seed=3, alphabet=b'abcd'),
+    'random': random_bytes(3000, seed=4),
+}
+
+
+@pytest.mark.parametrize('name', PAYLOADS)
+@pytest.mark.parametrize('level', range(_lz4.MIN_LEVEL, _lz4.MAX_LEVEL + 1))
+def test_compress_matches_round_trip(name, level):
+    data = PAYLOADS[name]
+    compressed = _lz4.compress_matches(data, level)
+    assert decode(compressed, len(data)) == data
+    assert bytes(_lz4.uncompress_bytewise(bytes(compressed), 0)) == data
+
+
+@pytest.mark.parametrize('name', PAYLOADS)
+def test_uncompress_fast_size_prefix(name):
+    data = PAYLOADS[name]
+    compressed = _lz4.compress_matches(data)
+    prefixed = len(data).to_bytes(4, 'little') + bytes(compressed)
+    assert bytes(_lz4.uncompress_fast(prefixed)) == data
+
+
+@pytest.mark.parametrize('name', PAYLOADS)
+@pytest.mark.parametrize('level', range(_lz4.MIN_LEVEL, _lz4.MAX_LEVEL + 1))
+def test_compress_matches_decodes_with_lz4(name, level):
+    lz4_block = pytest.importorskip('lz4.block')
+    data = PAYLOADS[name]
+    compressed = bytes(_lz4.compress_matches(data, level))
+    assert lz4_block.decompress(compressed, uncompressed_size=len(data)) == data
+
+
+@pytest.mark.parametrize('name', PAYLOADS)
+@pytest.mark.parametrize('level', range(_lz4.MIN_LEVEL, _lz4.MAX_LEVEL + 1))
+def test_uncompress_fast_decodes_lz4(name, level):
+    lz4_block = pytest.importorskip('lz4.block')
+    data = PAYLOADS[name]
+    if level == _lz4.MIN_LEVEL:
+        compressed = lz4_block.compress(data, store_size=False)
+    else:
+        compressed = lz4_block.compress(data, mode='high_compression',
+                                        compression=level, store_size=False)
+    assert decode(compressed, len(data)) == data
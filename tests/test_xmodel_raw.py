@@ -0,0 +1,88 @@
+import pytest
+
+from pv_py_utils.PyCoD import xmodel
+from pv_py_utils.PyCoD.benchmark import synthetic_model
+
+COMMENT = '// A comment line\n'
+
+
+def snapshot(model):
+    '''
+    Everything the parsers load, as plain Python values
+    '''
+    bones = [(bone.name, bone.parent, bone.offset, bone.matrix, bone.scale)
+             for bone in model.bones]
+    materials = [(material.name, material.type, material.images,
+                  material.color)
+                 for material in model.materials]
+    meshes = []
+    for mesh in model.meshes:
+        verts = [(vert.offset, vert.weights) for vert in mesh.verts]
+        faces = [(face.mesh_id, face.material_id,
+                  [(ind.vertex, ind.normal, ind.color, ind.uv)
+                   for ind in face.indices])
+                 for face in mesh.faces]
+        meshes.append((mesh.name, verts, faces, mesh.bone_groups,
+                       mesh.material_groups))
+    return model.version, bones, materials, meshes
+
+
+def write_model(tmp_path, version, comments=False, **kwargs):
+    model = synthetic_model(**kwargs)
+    model.meshes = [mesh.to_mesh() for mesh in model.meshes]
+    path = str(tmp_path / ('model_v%d.xmodel_export' % version))
+    model.WriteFile_Raw(path, version=version)
+
+    if comments:
+        with open(path) as file:
+            text = file.read()
+        for keyword in ('NUMVERTS', 'NUMFACES', 'NUMOBJECTS', 'NUMMATERIALS'):
+            text = text.replace('\n' + keyword, '\n' + COMMENT + keyword, 1)
+        with open(path, 'w') as file:
+            file.write(text)
+    return path
+
+
+@pytest.mark.parametrize('version', [5, 6, 7])
+@pytest.mark.parametrize('split_meshes', [True, False])
+@pytest.mark.parametrize('comments', [False, True])
+def test_fast_matches_legacy(tmp_path, version, split_meshes, comments):
+    path = write_model(tmp_path, version, comments, vert_count=200,
+                       mesh_count=3, bone_count=4)
+    legacy = xmodel.Model.FromFile_Raw(path, split_meshes, fast=False)
+    fast = xmodel.Model.FromFile_Raw(path, split_meshes, fast=True)
+    assert snapshot(fast) == snapshot(legacy)
+
+
+def test_fast_matches_legacy_tri16_vert32(tmp_path):
+    # > 255 meshes (TRI16) & > 0xFFFF verts (VERT32)
+    path = write_model(tmp_path, 7, True, vert_count=66000,
+                       face_count=600, mesh_count=300, bone_count=2)
+    with open(path) as file:
+        text = file.read()
+    assert 'NUMVERTS32' in text and '\nTRI16 ' in text
+
+    legacy = xmodel.Model.FromFile_Raw(path, fast=False)
+    fast = xmodel.Model.FromFile_Raw(path, fast=True)
+    assert snapshot(fast) == snapshot(legacy)
+
+
+def test_version_5_has_no_vertex_colors(tmp_path):
+    path = write_model(tmp_path, 5, vert_count=30, mesh_count=1,
+                       bone_count=1)
+    for fast in (False, True):
+        model = xmodel.Model.FromFile_Raw(path, fast=fast)
+        assert all(ind.color is None for face in model.meshes[0].faces
+                   for ind in face.indices)
+
+
+def test_legacy_parser_is_the_default(tmp_path, monkeypatch):
+    from pv_py_utils.PyCoD import _raw
+
+    def load_model(*args):
+        raise AssertionError('The bulk parser was used')
+    monkeypatch.setattr(_raw, 'load_model', load_model)
+
+    path = write_model(tmp_path, 6, vert_count=30, mesh_count=1,
+                       bone_count=1)
+    xmodel.Model.FromFile_Raw(path)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from pv_py_utils.PyCoD.benchmark import synthetic_model
+
+
+def make_model(version):
+    model = synthetic_model(vert_count=300, mesh_count=2, bone_count=4)
+    model.version = version
+    for mesh in model.meshes:
+        # Unnormalised & zero normals, and colors outside [0, 1]
+        mesh.normals *= 3.0
+        mesh.normals[0, 0] = (0.0, 0.0, 0.0)
+        mesh.colors = mesh.colors * 4.0 - 2.0
+    return model
+
+
+def read_body(path):
+    with open(path) as file:
+        # Skip the export timestamp
+        file.readline()
+        return file.read()
+
+
+@pytest.mark.parametrize('version', [5, 6])
+@pytest.mark.parametrize('array_meshes', [False, True])
+def test_buffered_matches_unbuffered(tmp_path, version, array_meshes):
+    model = make_model(version)
+    if not array_meshes:
+        model.meshes = [mesh.to_mesh() for mesh in model.meshes]
+
+    unbuffered = str(tmp_path / 'unbuffered.xmodel_export')
+    buffered = str(tmp_path / 'buffered.xmodel_export')
+    model.WriteFile_Raw(unbuffered, version=version, buffered=False)
+    model.WriteFile_Raw(buffered, version=version, buffered=True)
+
+    assert read_body(buffered) == read_body(unbuffered)
+
+
+@pytest.mark.parametrize('version', [5, 6])
+def test_array_mesh_matches_mesh(tmp_path, version):
+    array_model = make_model(version)
+    object_model = make_model(version)
+    object_model.meshes = [mesh.to_mesh() for mesh in object_model.meshes]
+
+    array_path = str(tmp_path / 'array.xmodel_export')
+    object_path = str(tmp_path / 'object.xmodel_export')
+    array_model.WriteFile_Raw(array_path, version=version)
+    object_model.WriteFile_Raw(object_path, version=version, buffered=False)
+
+    body = read_body(object_path)
+    assert read_body(array_path) == body
+    if version != 5:
+        # The out of range colors are written as they are (not clipped)
+        colors = np.concatenate([mesh.colors.reshape(-1, 4)
+                                 for mesh in array_model.meshes])
+        written = np.loadtxt([line[6:] for line in body.splitlines()
+                              if line.startswith('COLOR ')])
+        assert np.array_equal(written[:len(colors)], np.round(colors, 6))